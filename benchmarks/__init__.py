@@ -0,0 +1,3 @@
+"""
+Synthetic large-input benchmarks for the qcri parsers and import.
+"""
@@ -0,0 +1,366 @@
+"""
+Fake Quality Center
+
+An in-memory stand-in for the OTA TDConnection COM object, covering the
+calls qcri.application.qualitycenter makes. Every COM-style call is counted
+in FakeConnection.calls and can be given a fixed latency, so benchmarks can
+measure round-trips and simulate a remote server on any platform.
+"""
+
+import itertools
+import time
+from collections import Counter
+
+from qcri.application.qualitycenter import com_error
+
+
+class FakeList(list):
+    """
+    An OTA List: 1-based when called.
+    """
+
+    def __call__(self, index):
+        return self[index - 1]
+
+    @property
+    def Count(self):  # pylint: disable=I0011, invalid-name
+        return len(self)
+
+
+class FakeFilter(object):
+    """
+    A TDFilter over a factory.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._fields = {}
+
+    def __setitem__(self, field, value):
+        self._fields[field] = value
+
+    def __getitem__(self, field):
+        return self._fields.get(field, '')
+
+    def Clear(self):
+        self._fields.clear()
+
+    @property
+    def Text(self):
+        return '\n'.join('{}={}'.format(k, v)
+                         for k, v in sorted(self._fields.items()))
+
+    def NewList(self):
+        return self._factory.NewList(self.Text)
+
+
+class FakeEntity(object):
+    """
+    Any OTA entity with fields, Post and Refresh.
+    """
+
+    _NAME_FIELD = None
+
+    def __init__(self, conn, name=None):
+        self._conn = conn
+        self.ID = next(conn.ids)
+        self.fields = {}
+        conn.entities[self.ID] = self
+        if name is not None and self._NAME_FIELD:
+            self.fields[self._NAME_FIELD] = name
+
+    def SetField(self, field, value):
+        self.fields[field] = value
+
+    def Field(self, field):
+        return self.fields.get(field, '')
+
+    def Post(self):
+        self._conn.call('Post')
+
+    def Refresh(self):
+        self._conn.call('Refresh')
+
+    @property
+    def Name(self):
+        return self.fields.get(self._NAME_FIELD, '')
+
+    @Name.setter
+    def Name(self, value):
+        self.fields[self._NAME_FIELD] = value
+
+    @property
+    def Status(self):
+        return self.fields.get('RN_STATUS', '')
+
+    @Status.setter
+    def Status(self, value):
+        self.fields['RN_STATUS'] = value
+
+
+class FakeFactory(object):
+    """
+    An OTA factory creating entities of item_class.
+    """
+
+    def __init__(self, conn, item_class, parent=None, **defaults):
+        self._conn = conn
+        self._item_class = item_class
+        self._parent = parent
+        self._defaults = defaults
+        self.items = []
+
+    @property
+    def Filter(self):
+        return FakeFilter(self)
+
+    def NewList(self, text=''):
+        self._conn.call('NewList')
+        wanted = {}
+        for line in text.splitlines():
+            field, _, value = line.partition('=')
+            wanted[field] = value.strip('"')
+        return FakeList(
+            item for item in self.items
+            if all(str(item.Field(k)) == v for k, v in wanted.items()))
+
+    def AddItem(self, data):
+        self._conn.call('AddItem')
+        item = self._item_class(self._conn, self._parent, data)
+        item.fields.update(self._defaults)
+        self.items.append(item)
+        return item
+
+    def Item(self, item_id):
+        self._conn.call('Item')
+        for item in self.items:
+            if item.ID == item_id:
+                return item
+        raise com_error('item not found: {}'.format(item_id))
+
+    def RemoveItem(self, item_id):
+        self._conn.call('RemoveItem')
+        self.items = [item for item in self.items if item.ID != item_id]
+        # ids are unique across entities
+        self._conn.runs[:] = [run for run in self._conn.runs
+                              if run.ID != item_id]
+
+
+class FakeItem(FakeEntity):
+    """
+    An entity without behavior of its own: steps, bugs, bug links.
+    """
+
+    def __init__(self, conn, parent, data):
+        FakeEntity.__init__(self, conn)
+
+
+class FakeRun(FakeEntity):
+    _NAME_FIELD = 'RN_RUN_NAME'
+
+    def __init__(self, conn, instance, name):
+        FakeEntity.__init__(self, conn, name)
+        self.fields['RN_TESTCYCL_ID'] = instance.ID
+        self.fields['RN_CYCLE_ID'] = instance.fields['TC_CYCLE_ID']
+        self.StepFactory = FakeFactory(conn, FakeItem, self)
+        conn.runs.append(self)
+
+
+class FakeTestInstance(FakeEntity):
+    _NAME_FIELD = 'TSC_NAME'
+
+    def __init__(self, conn, testset, testplan):
+        FakeEntity.__init__(self, conn, testplan.Name)
+        self.fields['TC_CYCLE_ID'] = testset.ID
+        self.fields['TC_TEST_ID'] = testplan.ID
+        self.RunFactory = FakeFactory(conn, FakeRun, self)
+        self.BugLinkFactory = FakeFactory(conn, FakeItem, self)
+
+    @property
+    def TestName(self):
+        return self.Name
+
+
+class FakeTestSet(FakeEntity):
+    _NAME_FIELD = 'CY_CYCLE'
+
+    def __init__(self, conn, folder, data):
+        FakeEntity.__init__(self, conn)
+        self.fields['CY_FOLDER_ID'] = folder.NodeID
+        self.TsTestFactory = FakeFactory(conn, FakeTestInstance, self)
+
+
+class FakeTest(FakeEntity):
+    _NAME_FIELD = 'TS_NAME'
+
+    def __init__(self, conn, folder, name):
+        FakeEntity.__init__(self, conn, name)
+        # OTA returns the folder node, not its id
+        self.fields['TS_SUBJECT'] = folder
+
+
+class FakeAttachment(FakeEntity):
+
+    def __init__(self, conn, owner, data):
+        FakeEntity.__init__(self, conn)
+        self.FileName = None
+        self.Type = None
+
+
+class FakeNode(object):
+    """
+    A folder of the test lab or the test plan tree.
+    """
+
+    def __init__(self, conn, name, path, parent=None):
+        self._conn = conn
+        self.NodeID = next(conn.ids)
+        self.Name = name
+        self.Path = path
+        self.Father = parent
+        self.children = []
+        self.TestSetFactory = FakeFactory(conn, FakeTestSet, self)
+        self.TestFactory = FakeFactory(conn, FakeTest, self)
+        self.Attachments = FakeFactory(conn, FakeAttachment, self)
+
+    @property
+    def SubNodes(self):
+        self._conn.call('SubNodes')
+        return FakeList(self.children)
+
+    def AddNode(self, name):
+        self._conn.call('AddNode')
+        child = FakeNode(self._conn, name, self.Path + '\\' + name, self)
+        self.children.append(child)
+        self._conn.nodes[child.Path.lower()] = child
+        return child
+
+    def Post(self):
+        self._conn.call('Post')
+
+
+class FakeTreeManager(object):
+    """
+    A tree manager rooted at 'Root' (test lab) or 'Subject' (test plan).
+    """
+
+    def __init__(self, conn, root_name):
+        self._conn = conn
+        self.Root = FakeNode(conn, root_name, root_name)
+        conn.nodes[root_name.lower()] = self.Root
+
+    def NodeByPath(self, path):
+        self._conn.call('NodeByPath')
+        try:
+            return self._conn.nodes[path.lower()]
+        except KeyError:
+            raise com_error('node not found: {}'.format(path))
+
+    def NodeById(self, node_id):
+        self._conn.call('NodeById')
+        for node in self._conn.nodes.values():
+            if node.NodeID == node_id:
+                return node
+        raise com_error('node not found: {}'.format(node_id))
+
+
+class FakeConnection(object):
+    """
+    A connected TDConnection. latency is slept on every call.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self.ids = itertools.count(1)
+        self.nodes = {}
+        self.entities = {}
+        self.runs = []
+        self.Connected = True
+        self.TestSetTreeManager = FakeTreeManager(self, 'Root')
+        self.TreeManager = FakeTreeManager(self, 'Subject')
+        self.BugFactory = FakeFactory(self, FakeItem)
+        self.RunFactory = _RunFactory(self)
+        self.TestSetFactory = _EntityFactory(self, FakeTestSet)
+        self.TestFactory = _EntityFactory(self, FakeTest)
+        self.faults = []
+
+    def inject(self, name, message='transient failure', after=0, count=1):
+        """
+        Make the calls to name fail with com_error(message) count times,
+        starting after that many more calls to it succeed.
+        """
+        self.faults.append([name, message, after, count])
+
+    def call(self, name):
+        """
+        Count a round-trip to the server.
+        """
+        self.calls[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        for fault in self.faults:
+            if fault[0] != name or not fault[3]:
+                continue
+            if fault[2]:
+                fault[2] -= 1
+                continue
+            fault[3] -= 1
+            raise com_error(fault[1])
+
+    def InitConnectionEx(self, url):
+        self.call('InitConnectionEx')
+
+    def Login(self, username, password):
+        self.call('Login')
+
+    def Connect(self, domain, project):
+        self.call('Connect')
+        self.Connected = True
+
+    @property
+    def round_trips(self):
+        return sum(self.calls.values())
+
+    def Disconnect(self):
+        self.Connected = False
+
+    def Logout(self):
+        self.call('Logout')
+
+    def ReleaseConnection(self):
+        pass
+
+
+class _RunFactory(FakeFactory):
+    """
+    The connection-wide RunFactory, listing the runs of all test sets.
+    """
+
+    def __init__(self, conn):
+        FakeFactory.__init__(self, conn, FakeRun)
+
+    @property
+    def items(self):
+        return self._conn.runs
+
+    @items.setter
+    def items(self, value):
+        pass
+
+
+class _EntityFactory(object):
+    """
+    A connection-wide factory, fetching any entity of item_class by id.
+    """
+
+    def __init__(self, conn, item_class):
+        self._conn = conn
+        self._item_class = item_class
+
+    def Item(self, item_id):
+        self._conn.call('Item')
+        item = self._conn.entities.get(item_id)
+        if not isinstance(item, self._item_class):
+            raise com_error('item not found: {}'.format(item_id))
+        return item
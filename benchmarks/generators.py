@@ -0,0 +1,239 @@
+"""
+Synthetic Test Results
+
+Writers for large Robot Framework, UFT and Selenium IDE results, shaped
+like the files in samples/ but at a configurable scale:
+
+    tests  - number of tests
+    steps  - steps (keywords) per test
+    depth  - nesting of Robot suites / UFT actions
+
+Every fifth test fails in its last step.
+
+make_results and make_dated_results build parsed results, as returned by
+importer.parse_results, for importing into a FakeConnection.
+"""
+
+import os
+import zipfile
+from datetime import datetime, timedelta
+from xml.sax.saxutils import escape
+
+
+_START = datetime(2016, 12, 5, 14, 0, 0)
+_XLSX_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_XLSX_REL_NS = ('http://schemas.openxmlformats.org/officeDocument/2006/'
+                'relationships')
+_XLSX_PKG_REL_NS = ('http://schemas.openxmlformats.org/package/2006/'
+                    'relationships')
+
+
+def _failed(test_index, step_index, steps):
+    return test_index % 5 == 4 and step_index == steps - 1
+
+
+def write_robot(folder, tests=100, steps=10, depth=2):
+    """
+    Write a Robot Framework output.xml to folder and return its path.
+    Tests are spread over 'depth' levels of nested suites.
+    """
+    filename = os.path.join(folder, 'output.xml')
+    clock = [_START]
+
+    def stamp(millis=10):
+        clock[0] += timedelta(milliseconds=millis)
+        return clock[0].strftime('%Y%m%d %H:%M:%S.%f')[:-3]
+
+    with open(filename, 'w') as out:
+        out.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        out.write('<robot generator="Robot 3.0.1" generated="{}">\n'.format(
+            stamp()))
+        for level in range(depth):
+            out.write('<suite id="s1{}" name="Level{}" source="level{}">\n'
+                      .format('-s1' * level, level, level))
+        for i in range(tests):
+            out.write('<test id="s1-t{0}" name="Test {0}">\n'.format(i))
+            test_start = stamp()
+            status = 'PASS'
+            for j in range(steps):
+                step_status = 'FAIL' if _failed(i, j, steps) else 'PASS'
+                if step_status == 'FAIL':
+                    status = 'FAIL'
+                out.write(
+                    '<kw name="Library.Keyword {}">\n'
+                    '<arguments><arg>value {}</arg><arg>other</arg>'
+                    '</arguments>\n'
+                    '<msg timestamp="{}" level="INFO">message</msg>\n'
+                    '<status status="{}" starttime="{}" endtime="{}">'
+                    '</status>\n</kw>\n'.format(
+                        j, j, stamp(0), step_status, stamp(0), stamp()))
+            out.write('<tags><tag>{}</tag></tags>\n'.format(
+                'smoke' if i % 2 else 'regression'))
+            out.write('<status status="{}" starttime="{}" endtime="{}" '
+                      'critical="yes"></status>\n</test>\n'.format(
+                          status, test_start, stamp()))
+        for _ in range(depth):
+            out.write('<status status="FAIL" starttime="{0}" endtime="{0}">'
+                      '</status>\n</suite>\n'.format(stamp()))
+        out.write('<statistics></statistics>\n<errors></errors>\n</robot>\n')
+    return filename
+
+
+def write_uft(folder, tests=100, steps=10, depth=1):
+    """
+    Write a UFT Results.xml and its Default.xlsx DataTable to folder and
+    return the path of Results.xml. Each iteration nests its steps in
+    'depth' actions.
+    """
+    filename = os.path.join(folder, 'Results.xml')
+    clock = [_START]
+
+    def stamp():
+        clock[0] += timedelta(seconds=1)
+        return '{d.month}/{d.day}/{d.year} - {d:%H:%M:%S}'.format(d=clock[0])
+
+    rows = [['test', 'subject', 'description', 'suite']]
+    with open(filename, 'w') as out:
+        out.write('<?xml version="1.0"?>\n<Report ver="2.0" tmZone="UTC">\n'
+                  '<General productName="HP Unified Functional Testing" '
+                  'productVer="12.53" os="Windows" host="bench">'
+                  '<DocLocation><![CDATA[bench]]></DocLocation></General>\n'
+                  '<Doc rID="T1" productName="HP Unified Functional Testing">'
+                  '\n<DName><![CDATA[Benchmark]]></DName>\n'
+                  '<DT rID="T2"><NodeArgs eType="Table" icon="2" nRep="4">'
+                  '<Disp><![CDATA[Run-Time Data Table]]></Disp>'
+                  '<BtmPane vType="Table"><Path><![CDATA[Default.xlsx]]>'
+                  '</Path></BtmPane></NodeArgs></DT>\n')
+        for i in range(tests):
+            rows.append(['Test {}'.format(i), 'main/sub{}'.format(i % 10),
+                         'description {}'.format(i), 'suite{}'.format(i % 3)])
+            out.write('<DIter rID="I{0}" iterID="{1}">\n'.format(i, i + 1))
+            start = stamp()
+            status = 'Passed'
+            for level in range(depth):
+                out.write('<Action rID="A{}-{}"><AName><![CDATA[Action{}]]>'
+                          '</AName>\n'.format(i, level, level + 1))
+            for j in range(steps):
+                step_status = 'Failed' if _failed(i, j, steps) else 'Passed'
+                if step_status == 'Failed':
+                    status = 'Failed'
+                out.write(
+                    '<Step rID="S{0}-{1}"><Obj><![CDATA[step {1}]]></Obj>'
+                    '<Details><![CDATA[details {1}]]></Details>'
+                    '<Time><![CDATA[{2}]]></Time><TimeTick>0</TimeTick>'
+                    '<NodeArgs eType="User" icon="11" nRep="1" status="{3}">'
+                    '<Disp><![CDATA[step {1}]]></Disp></NodeArgs></Step>\n'
+                    .format(i, j, stamp(), step_status))
+            end = stamp()
+            for _ in range(depth):
+                out.write('<Summary sTime="{}" eTime="{}" passed="1" '
+                          'failed="0" warnings="0"></Summary>'
+                          '<NodeArgs eType="StartAction" icon="4" nRep="7" '
+                          'status="{}"><Disp><![CDATA[Summary]]></Disp>'
+                          '</NodeArgs></Action>\n'.format(start, end, status))
+            out.write('<NodeArgs eType="StartIteration" icon="3" nRep="6" '
+                      'status="{}"><Disp><![CDATA[Iteration {}]]></Disp>'
+                      '</NodeArgs></DIter>\n'.format(status, i + 1))
+        out.write('</Doc>\n</Report>\n')
+    write_xlsx(os.path.join(folder, 'Default.xlsx'), {'Global': rows})
+    return filename
+
+
+def write_selenium(folder, tests=100, steps=10, suites=1):
+    """
+    Write a Selenium IDE Test Results report with 'suites' suites to folder
+    and return its path.
+    """
+    filename = os.path.join(folder, 'results.html')
+    with open(filename, 'w') as out:
+        out.write('<!DOCTYPE html>\n<html>\n<head><meta charset="UTF-8">'
+                  '<title>Test Suite results</title></head>\n<body>\n')
+        for i in range(tests):
+            if i % max(1, tests // suites) == 0:
+                out.write('<table id="suiteSummaryTable"><thead><tr>'
+                          '<td colspan="3">Test Suite: Suite {}</td></tr>'
+                          '</thead></table>\n'.format(i))
+            out.write('<table class="test_case"><thead><tr><td colspan="4">'
+                      'Test case: Test {}</td></tr></thead><tbody>\n'
+                      .format(i))
+            for j in range(steps):
+                fail = ('[error] did not match' if _failed(i, j, steps)
+                        else '')
+                out.write('<tr><td>type</td><td>id=field{}</td>'
+                          '<td>value</td><td>{}</td></tr>\n'.format(j, fail))
+            out.write('</tbody></table>\n')
+        out.write('</body>\n</html>\n')
+    return filename
+
+
+def make_results(count=3, steps=2):
+    """
+    Returns parsed results of count passing tests of steps steps, in one
+    suite.
+    """
+    tests = [{
+        'name': 'test {}'.format(i),
+        'status': 'Passed',
+        'subject': 'subject',
+        'suite': 'suite',
+        'steps': [{'name': 'step {}'.format(j), 'status': 'Passed'}
+                  for j in range(steps)]
+    } for i in range(count)]
+    return {'filename': 'output.xml', 'attach_list': [], 'tests': tests}
+
+
+def make_dated_results(count=3):
+    """
+    Returns make_results with each test executed a second after the last,
+    so that upserted runs can be matched.
+    """
+    results = make_results(count)
+    for idx, test in enumerate(results['tests']):
+        test['exec_date'] = '2016-12-05'
+        test['exec_time'] = '14:00:0{}'.format(idx)
+    return results
+
+
+def write_xlsx(filename, sheets):
+    """
+    Write a minimal .xlsx workbook. sheets maps sheet names to lists of rows
+    of strings.
+    """
+    strings = []
+    with zipfile.ZipFile(filename, 'w', zipfile.ZIP_DEFLATED) as xlsx:
+        names = list(sheets)
+        xlsx.writestr('xl/workbook.xml', (
+            '<workbook xmlns="{}" xmlns:r="{}"><sheets>{}</sheets></workbook>'
+        ).format(_XLSX_NS, _XLSX_REL_NS, ''.join(
+            '<sheet name="{}" sheetId="{}" r:id="rId{}"/>'.format(
+                escape(name), idx, idx) for idx, name in enumerate(names, 1))))
+        xlsx.writestr('xl/_rels/workbook.xml.rels', (
+            '<Relationships xmlns="{}">{}</Relationships>').format(
+                _XLSX_PKG_REL_NS, ''.join(
+                    '<Relationship Id="rId{0}" '
+                    'Target="worksheets/sheet{0}.xml"/>'.format(idx)
+                    for idx in range(1, len(names) + 1))))
+        for idx, name in enumerate(names, 1):
+            sheet_rows = []
+            for rowx, row in enumerate(sheets[name], 1):
+                cells = []
+                for colx, value in enumerate(row):
+                    cells.append('<c r="{}{}" t="s"><v>{}</v></c>'.format(
+                        _column_letters(colx), rowx, len(strings)))
+                    strings.append('<si><t>{}</t></si>'.format(escape(value)))
+                sheet_rows.append('<row r="{}">{}</row>'.format(
+                    rowx, ''.join(cells)))
+            xlsx.writestr('xl/worksheets/sheet{}.xml'.format(idx), (
+                '<worksheet xmlns="{}"><sheetData>{}</sheetData></worksheet>'
+            ).format(_XLSX_NS, ''.join(sheet_rows)))
+        xlsx.writestr('xl/sharedStrings.xml', '<sst xmlns="{}">{}</sst>'
+                      .format(_XLSX_NS, ''.join(strings)))
+
+
+def _column_letters(colx):
+    letters = ''
+    colx += 1
+    while colx:
+        colx, rem = divmod(colx - 1, 26)
+        letters = chr(ord('A') + rem) + letters
+    return letters
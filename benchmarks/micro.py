@@ -0,0 +1,119 @@
+"""
+Micro Benchmarks
+
+Time the hot helpers of the parsers against the straightforward code they
+replace:
+
+    timestamps - timestamps.decode_robot against datetime.strptime
+    records    - the memory of StepResult records against dicts
+
+Usage:
+
+    python -m benchmarks.micro --count 20000 timestamps
+"""
+
+from __future__ import print_function
+
+import argparse
+import timeit
+import tracemalloc
+from datetime import datetime
+
+
+ROBOT_FORMAT = '%Y%m%d %H:%M:%S.%f'
+
+
+def main(argv=None):
+    """
+    Run the micro benchmarks and print their results.
+    """
+    ap = argparse.ArgumentParser(description='Time the qcri helpers.')
+    ap.add_argument('--count', type=int, default=20000)
+    ap.add_argument('benchmarks', nargs='*',
+                    help='any of {}, all by default'.format(
+                        ', '.join(sorted(BENCHMARKS))))
+    args = ap.parse_args(argv)
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            ap.error('unknown benchmark: {}'.format(name))
+    for name in args.benchmarks or sorted(BENCHMARKS):
+        print(BENCHMARKS[name](args.count))
+
+
+def robot_stamps(count):
+    """
+    Returns count Robot Framework timestamps, a keyword every ~10ms so
+    that they repeat at second resolution.
+    """
+    return ['20161205 {:02d}:{:02d}:{:02d}.{:03d}'.format(
+        14 + i // 360000, (i // 6000) % 60, (i // 100) % 60, (i % 100) * 10)
+            for i in range(count)]
+
+
+def bench_timestamps(count):
+    """
+    Returns the seconds taken to decode count Robot Framework timestamps
+    with strptime and with decode_robot.
+    """
+    from qcri.application import timestamps
+
+    stamps = robot_stamps(count)
+    slow = min(timeit.repeat(
+        lambda: [_strptime_robot(s) for s in stamps], number=1, repeat=3))
+    fast = min(timeit.repeat(
+        lambda: [timestamps.decode_robot(s) for s in stamps],
+        number=1, repeat=3))
+    return '{} robot stamps: strptime {:.3f}s, decode_robot {:.3f}s'.format(
+        count, slow, fast)
+
+
+def bench_records(count):
+    """
+    Returns the memory allocated by count steps as dicts and as StepResult
+    records.
+    """
+    from qcri.application.records import StepResult
+
+    dicts = _allocated(_step_dict, count)
+    records = _allocated(lambda i: StepResult(**_step_dict(i)), count)
+    return '{} steps: dicts {} KiB, records {} KiB'.format(
+        count, dicts // 1024, records // 1024)
+
+
+def _allocated(factory, count):
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        items = [factory(i) for i in range(count)]
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del items
+    return after - before
+
+
+def _step_dict(i):
+    return {
+        'name': 'Keyword {}'.format(i % 50),
+        'status': 'PASS'.replace('PASS', 'Passed'),
+        'description': '',
+        'expected': '',
+        'actual': '',
+        'exec_date': '2016-12-05',
+        'exec_time': '14:32:01'
+    }
+
+
+def _strptime_robot(stamp):
+    stamped = datetime.strptime(stamp, ROBOT_FORMAT)
+    return stamped.strftime('%Y-%m-%d'), stamped.strftime('%H:%M:%S')
+
+
+BENCHMARKS = {
+    'timestamps': bench_timestamps,
+    'records': bench_records
+}
+
+
+if __name__ == '__main__':
+    main()
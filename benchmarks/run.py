@@ -0,0 +1,182 @@
+"""
+Parser and Import Benchmarks
+
+Generates synthetic results at the requested scale and times each phase,
+each in a fresh process so that its peak RSS is its own:
+
+    get_parsers    - sniffing and validating the candidate parsers
+    parse_results  - a full parse to a list of tests
+    import_results - a streamed parse uploaded to a fake QC backend
+
+Usage:
+
+    python -m benchmarks.run --tests 1000 --steps 20 --depth 2 --out bench.json
+
+The JSON written to --out holds the environment, the scale and one record
+per format and phase with seconds, tests per second, QC round-trips and
+peak RSS in KiB.
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from benchmarks import generators
+
+
+FORMATS = ('robotframework', 'uftrunreport', 'seleniumtestresults')
+PHASES = ('get_parsers', 'parse_results', 'import_results')
+
+_WRITERS = {
+    'robotframework': lambda d, s: generators.write_robot(
+        d, s['tests'], s['steps'], s['depth']),
+    'uftrunreport': lambda d, s: generators.write_uft(
+        d, s['tests'], s['steps'], s['depth']),
+    'seleniumtestresults': lambda d, s: generators.write_selenium(
+        d, s['tests'], s['steps'], s['depth'])
+}
+
+
+def main(argv=None):
+    """
+    Run the benchmarks and write the JSON report.
+    """
+    ap = argparse.ArgumentParser(description='Benchmark the qcri parsers.')
+    ap.add_argument('--tests', type=int, default=1000)
+    ap.add_argument('--steps', type=int, default=20)
+    ap.add_argument('--depth', type=int, default=2,
+                    help='suite / action nesting, suites for Selenium')
+    ap.add_argument('--latency', type=float, default=0.0,
+                    help='seconds added to each fake QC call')
+    ap.add_argument('--formats', nargs='+', choices=FORMATS, default=FORMATS)
+    ap.add_argument('--phases', nargs='+', choices=PHASES, default=PHASES)
+    ap.add_argument('--out', help='write the JSON report here')
+    args = ap.parse_args(argv)
+
+    scale = {
+        'tests': args.tests,
+        'steps': args.steps,
+        'depth': args.depth,
+        'latency': args.latency
+    }
+    report = run(scale, args.formats, args.phases)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.out:
+        with open(args.out, 'w') as filed:
+            filed.write(text)
+    print(text)
+
+
+def run(scale, formats=FORMATS, phases=PHASES):
+    """
+    Returns the benchmark report for the given scale.
+    """
+    tempdir = tempfile.mkdtemp(prefix='qcri-bench-')
+    records = []
+    try:
+        for fmt in formats:
+            folder = os.path.join(tempdir, fmt)
+            os.mkdir(folder)
+            filename = _WRITERS[fmt](folder, scale)
+            size = os.path.getsize(filename)
+            for phase in phases:
+                record = _in_child(_measure, fmt, phase, filename, scale)
+                record.update(format=fmt, phase=phase, file_bytes=size)
+                records.append(record)
+                print('{:<20} {:<15} {:>8.3f}s {:>10} KiB'.format(
+                    fmt, phase, record['seconds'],
+                    record['peak_rss_kib']), file=sys.stderr)
+    finally:
+        shutil.rmtree(tempdir)
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'scale': scale,
+        'results': records
+    }
+
+
+def _measure(fmt, phase, filename, scale):
+    from qcri.application import importer
+    from qcri.application import registry
+    from benchmarks.fakeqc import FakeConnection
+
+    cfg = importer.load_config('no-such-qcri.cfg')
+    tests = steps = round_trips = 0
+    start = time.time()
+    if phase == 'get_parsers':
+        parsers = importer.get_parsers(filename, cfg)
+        if [p.__name__ for p in parsers] != ['qcri.parsers.' + fmt]:
+            raise AssertionError('unexpected parsers: {}'.format(parsers))
+    else:
+        parser = registry.get_registry()[fmt].load()
+        if phase == 'parse_results':
+            results = importer.parse_results(parser, filename, cfg)
+            for test in results['tests']:
+                tests += 1
+                steps += len(test['steps'])
+        else:
+            qcc = FakeConnection(scale['latency'])
+            results = importer.parse_results(
+                parser, filename, cfg, stream=True)
+            importer.import_results(qcc, 'bench', results)
+            tests = len(qcc.runs)
+            steps = sum(len(run.StepFactory.items) for run in qcc.runs)
+            round_trips = qcc.round_trips
+    seconds = time.time() - start
+    return {
+        'seconds': round(seconds, 4),
+        'tests': tests,
+        'steps': steps,
+        'tests_per_second': round(tests / seconds, 1) if tests else None,
+        'round_trips': round_trips,
+        'peak_rss_kib': _peak_rss_kib()
+    }
+
+
+def _peak_rss_kib():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KiB elsewhere
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def _child(queue, func, args):
+    try:
+        queue.put((True, func(*args)))
+    except Exception as ex:  # pylint: disable=I0011, broad-except
+        queue.put((False, repr(ex)))
+
+
+def _in_child(func, *args):
+    """
+    Run func in a freshly spawned process and return its result.
+    """
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_child, args=(queue, func, args))
+    proc.start()
+    ok, result = queue.get()
+    proc.join()
+    if not ok:
+        raise RuntimeError(result)
+    return result
+
+
+if __name__ == '__main__':
+    main()
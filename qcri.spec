@@ -9,7 +9,8 @@ a = Analysis(['qcri\main.py'],
              hiddenimports=[
                  'qcri.parsers.robotframework',
                  'qcri.parsers.uftrunreport',
-                 'qcri.parsers.seleniumtestresults'
+                 'qcri.parsers.seleniumtestresults',
+                 'qcri.parsers.junit'
              ],
              hookspath=[],
              runtime_hooks=[],
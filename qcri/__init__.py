@@ -2,11 +2,34 @@
 QCRI
 """
 
-from qcri.application.qualitycenter import (
-    connect,
-    disconnect,
-    get_bugs)
+# qualitycenter needs COM, so it is only imported when a connection is made.
+from qcri.application.filters import TestFilter
 from qcri.application.importer import (
     get_parsers,
     import_results,
-    parse_results)
+    parse_results,
+    parse_shards)
+
+
+def connect(url='', domain='', project='', username='', password=''):
+    """
+    Return a connection to Quality Center using the given credentials.
+    """
+    from qcri.application import qualitycenter
+    return qualitycenter.connect(url, domain, project, username, password)
+
+
+def disconnect(qcc):
+    """
+    Make sure the quality center connection is closed
+    """
+    from qcri.application import qualitycenter
+    return qualitycenter.disconnect(qcc)
+
+
+def get_bugs(qcc):
+    """
+    Return a list of dicts containing bug info.
+    """
+    from qcri.application import qualitycenter
+    return qualitycenter.get_bugs(qcc)
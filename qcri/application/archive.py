@@ -0,0 +1,62 @@
+"""
+Archive
+
+Zips the files of a test report to attach to Quality Center.
+
+OTA attachments are uploaded from a file, so write_archive makes the
+archive straight into that file and the report is written once.
+"""
+
+import fnmatch
+import logging
+import os
+import zipfile
+
+
+LOG = logging.getLogger(__name__)
+
+# what making an archive may raise, besides a bug: unreadable files and
+# folders, and files zip can't hold, such as dated before 1980
+ERRORS = (IOError, OSError, ValueError, zipfile.BadZipfile,
+          zipfile.LargeZipFile)
+
+
+def find_files(pardir, patterns):
+    """
+    Yields (path, name in the archive) of the files in pardir matching one
+    of patterns, and of the files in the folders that match.
+    """
+    for root, dirnames, filenames in os.walk(pardir):
+        for filename in filenames:
+            if _matches(filename, patterns):
+                yield os.path.join(root, filename), filename
+        matched = [name for name in dirnames if _matches(name, patterns)]
+        for dirname in matched:
+            folder = os.path.join(root, dirname)
+            for subroot, _, subfiles in os.walk(folder):
+                for filename in subfiles:
+                    path = os.path.join(subroot, filename)
+                    yield path, os.path.relpath(path, root)
+        # already added whole
+        dirnames[:] = [name for name in dirnames if name not in matched]
+
+
+def write_archive(fileobj, pardir, patterns):
+    """
+    Zip the files of find_files into fileobj, a file name or a seekable
+    binary file. Returns the number of files added.
+    """
+    count = 0
+    zipf = zipfile.ZipFile(fileobj, 'w', zipfile.ZIP_DEFLATED)
+    try:
+        for path, arcname in find_files(pardir, patterns):
+            LOG.debug('adding to archive: %s', path)
+            zipf.write(path, arcname)
+            count += 1
+    finally:
+        zipf.close()
+    return count
+
+
+def _matches(name, patterns):
+    return any(fnmatch.fnmatch(name, pattern) for pattern in patterns)
@@ -0,0 +1,139 @@
+"""
+Executor
+
+Runs Quality Center operations on one long-lived thread.
+
+A COM object belongs to the apartment of the thread that created it; other
+threads either can't call it or have every call marshalled to it. The
+executor thread initializes COM once, creates the connection and makes
+every call on it, while the GUI and API callers submit work and get a
+future back, so concurrent actions are serialized instead of racing on one
+connection.
+
+    from qcri.application import executor
+    qcc = executor.call(qualitycenter.connect, url, domain, project,
+                        username, password)
+    future = executor.submit(qualitycenter.get_bugs, qcc)
+"""
+
+import logging
+import threading
+from concurrent.futures import Future
+from sys import version_info
+
+if version_info.major == 2:
+    import Queue as queue  # pylint: disable=I0011, import-error
+else:
+    import queue
+
+
+LOG = logging.getLogger(__name__)
+
+
+class ComExecutor(object):
+    """
+    Runs the functions submitted to it, in order, on a thread of its own
+    with COM initialized. The thread is started by the first submit.
+    """
+
+    def __init__(self, name='qcri-qc'):
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Schedule func(*args, **kwargs), returns its future.
+        """
+        future = Future()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, args=(self._queue,), name=self.name)
+                self._thread.daemon = True
+                self._thread.start()
+            self._queue.put((future, func, args, kwargs))
+        return future
+
+    def call(self, func, *args, **kwargs):
+        """
+        Returns func(*args, **kwargs), run on the executor thread. Called
+        from that thread, e.g. by submitted work, func runs right away.
+        """
+        if self.on_thread():
+            return func(*args, **kwargs)
+        return self.submit(func, *args, **kwargs).result()
+
+    def on_thread(self):
+        """
+        True if called from the executor thread.
+        """
+        return threading.current_thread() is self._thread
+
+    def shutdown(self, wait=True):
+        """
+        Stop the thread once the work submitted so far is done. A later
+        submit starts a new one.
+        """
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._thread = None
+            self._queue.put(None)
+            self._queue = queue.Queue()
+        if wait and thread is not threading.current_thread():
+            thread.join()
+
+    @staticmethod
+    def _run(work):
+        from qcri.application import qualitycenter
+        qualitycenter.init_thread()
+        try:
+            while True:
+                item = work.get()
+                if item is None:
+                    return
+                future, func, args, kwargs = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    result = func(*args, **kwargs)
+                except BaseException as ex:  # pylint: disable=I0011, broad-except
+                    future.set_exception(ex)
+                else:
+                    future.set_result(result)
+        finally:
+            qualitycenter.uninit_thread()
+
+
+_EXECUTOR = ComExecutor()
+
+
+def get_executor():
+    """
+    Returns the executor shared by the application.
+    """
+    return _EXECUTOR
+
+
+def submit(func, *args, **kwargs):
+    """
+    Schedule func on the shared executor, see ComExecutor.submit.
+    """
+    return _EXECUTOR.submit(func, *args, **kwargs)
+
+
+def call(func, *args, **kwargs):
+    """
+    Run func on the shared executor and wait, see ComExecutor.call.
+    """
+    return _EXECUTOR.call(func, *args, **kwargs)
+
+
+def shutdown(wait=True):
+    """
+    Stop the shared executor, see ComExecutor.shutdown.
+    """
+    _EXECUTOR.shutdown(wait)
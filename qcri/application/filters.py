@@ -0,0 +1,202 @@
+"""
+Filters
+
+Select the tests of a result file while it is parsed, so the tests left
+out are never turned into records.
+
+A TestFilter is given to the parsers as options['filters'] by
+importer.parse_results. Every criterion is a list of case-insensitive
+fnmatch patterns, and an empty one selects everything:
+
+    include_tags  - Robot Framework tags, a test needs one of them
+    exclude_tags  - Robot Framework tags, a test with one is left out
+    suites        - suite paths, 'Top/Sub/Suite'; a pattern without a slash
+                    matches a suite name at any depth. A suite selects its
+                    subsuites.
+    statuses      - test statuses, e.g. Failed
+    names         - test names
+    exclude_names - test names left out
+    columns       - {column: pattern} of UFT DataTable cells
+
+The parsers check what they can before building a test: Robot Framework
+skips the suites that can't be selected, UFT skips the DataTable rows.
+parse_results checks names, statuses and suites again on whatever a parser
+returns, so parsers that don't know about filters are filtered too.
+"""
+
+import fnmatch
+
+
+SECTION = 'filters'
+
+_LIST_OPTIONS = ('include_tags', 'exclude_tags', 'suites', 'statuses',
+                 'names', 'exclude_names')
+
+
+class TestFilter(object):
+    """
+    The criteria a test must meet to be parsed, see the module docstring.
+    """
+
+    # not a test case, for test runners collecting Test* classes
+    __test__ = False
+
+    def __init__(self, include_tags=(), exclude_tags=(), suites=(),
+                 statuses=(), names=(), exclude_names=(), columns=None):
+        self.include_tags = _lower(include_tags)
+        self.exclude_tags = _lower(exclude_tags)
+        self.suites = [pattern.strip('/').split('/')
+                       for pattern in _lower(suites)]
+        self.statuses = _lower(statuses)
+        self.names = _lower(names)
+        self.exclude_names = _lower(exclude_names)
+        self.columns = dict((column, pattern.lower()) for column, pattern
+                            in (columns or {}).items())
+
+    def __bool__(self):
+        return bool(self.include_tags or self.exclude_tags or self.suites or
+                    self.statuses or self.names or self.exclude_names or
+                    self.columns)
+
+    __nonzero__ = __bool__
+
+    def may_contain(self, path):
+        """
+        False if neither the suite at path, 'Top/Sub', nor its subsuites
+        can be selected, so it needn't be read.
+        """
+        if not self.suites:
+            return True
+        parts = path.lower().split('/')
+        for pattern in self.suites:
+            if len(pattern) == 1:
+                # a name, may be anywhere below
+                return True
+            depth = min(len(parts), len(pattern))
+            if _match_parts(parts[:depth], pattern[:depth]):
+                return True
+        return False
+
+    def suite_selected(self, path):
+        """
+        True if the tests of the suite at path are selected by suites.
+        """
+        if not self.suites:
+            return True
+        parts = path.lower().split('/')
+        for pattern in self.suites:
+            if len(pattern) == 1:
+                if _matches_any_of(parts, pattern[0]):
+                    return True
+            elif (len(parts) >= len(pattern) and
+                  _match_parts(parts[:len(pattern)], pattern)):
+                return True
+        return False
+
+    def test_selected(self, name=None, status=None, tags=None, path=None):
+        """
+        True if a test with the given name, status, tags and suite path is
+        selected. A criterion whose value is None isn't checked.
+        """
+        if name is not None:
+            lower = name.lower()
+            if self.names and not _matches(lower, self.names):
+                return False
+            if _matches(lower, self.exclude_names):
+                return False
+        if status is not None and self.statuses:
+            if not _matches(status.lower(), self.statuses):
+                return False
+        if tags is not None and (self.include_tags or self.exclude_tags):
+            tags = [tag.lower() for tag in tags]
+            if self.include_tags and not any(
+                    _matches(tag, self.include_tags) for tag in tags):
+                return False
+            if any(_matches(tag, self.exclude_tags) for tag in tags):
+                return False
+        if path is not None and not self.suite_selected(path):
+            return False
+        return True
+
+    def row_selected(self, row):
+        """
+        True if row, {column: value} of a DataTable row, matches columns.
+        """
+        for column, pattern in self.columns.items():
+            value = row.get(column)
+            if value is None or not fnmatch.fnmatchcase(
+                    _cell_text(value).lower(), pattern):
+                return False
+        return True
+
+    def apply(self, tests):
+        """
+        Yields the tests, dicts or records, whose name, status and suite
+        are selected.
+        """
+        for test in tests:
+            path = '/'.join(part for part in (
+                test.get('subject', ''), test.get('suite', '')) if part)
+            if self.test_selected(test.get('name'), test.get('status'),
+                                  path=path or None):
+                yield test
+
+
+def from_config(cfg):
+    """
+    Returns the TestFilter of the [filters] section of cfg, None if it
+    selects everything. Lists are comma separated; columns is a list of
+    column=pattern.
+    """
+    if not cfg.has_section(SECTION):
+        return None
+    kwargs = dict((option, split_list(cfg.get(SECTION, option, fallback='')))
+                  for option in _LIST_OPTIONS)
+    kwargs['columns'] = parse_columns(
+        split_list(cfg.get(SECTION, 'columns', fallback='')))
+    test_filter = TestFilter(**kwargs)
+    return test_filter if test_filter else None
+
+
+def split_list(value):
+    """
+    Returns the items of a comma separated list.
+    """
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def parse_columns(items):
+    """
+    Returns {column: pattern} of items, 'column=pattern' strings.
+    """
+    columns = {}
+    for item in items:
+        column, sep, pattern = item.partition('=')
+        if not sep:
+            raise ValueError('expected column=pattern: {}'.format(item))
+        columns[column.strip()] = pattern.strip()
+    return columns
+
+
+def _lower(patterns):
+    return [pattern.lower() for pattern in patterns if pattern]
+
+
+def _matches(value, patterns):
+    return any(fnmatch.fnmatchcase(value, pattern) for pattern in patterns)
+
+
+def _matches_any_of(values, pattern):
+    return any(fnmatch.fnmatchcase(value, pattern) for value in values)
+
+
+def _match_parts(parts, pattern):
+    return all(fnmatch.fnmatchcase(part, pat)
+               for part, pat in zip(parts, pattern))
+
+
+def _cell_text(value):
+    if isinstance(value, float) and value.is_integer():
+        # xlrd reads whole numbers as floats
+        return str(int(value))
+    return str(value)
@@ -4,11 +4,12 @@ The GUI to QCRI.
 
 # pylint: disable=I0011, no-member, missing-docstring
 
-import threading
 import logging
 from sys import version_info
-import pythoncom
+from qcri.application import executor
 from qcri.application import importer
+from qcri.application import instrument
+from qcri.application import labindex
 from qcri.application import qualitycenter
 # pylint: disable=I0011, import-error
 if version_info.major == 2:
@@ -16,41 +17,56 @@ if version_info.major == 2:
     import tkMessageBox as messagebox
     import tkFileDialog as filedialog
     import ttk
-    import Queue as queue
 elif version_info.major == 3:
     import tkinter as tk
     from tkinter import messagebox
     from tkinter import filedialog
     from tkinter import ttk
-    import queue
 
 
 LOG = logging.getLogger(__name__)
 
+# milliseconds between checks for the result of background work
+POLL_INTERVAL = 50
 
-def work_in_background(tk_, func, callback=None):
+# folders indexed per turn of a snapshot on the executor, so other actions
+# don't wait for the whole tree
+SNAPSHOT_STEP = 20
+
+
+def work_in_background(tk_, func, callback=None, busy=True):
     """
-    Processes func in background.
+    Processes func on the Quality Center executor thread, which owns the
+    connection. Unless busy is False, the busy window is shown meanwhile.
+
+    func must not touch Tk widgets; callback is called with its result on
+    the Tk thread once it is done. Errors are logged and shown.
     """
-    window = BusyWindow()
-    done_queue = queue.Queue()
+    window = BusyWindow() if busy else None
 
     def _process():
-        func()
-        done_queue.put(True)
+        with instrument.span('gui.work_in_background'):
+            return func()
 
-    def _process_queue():
-        try:
-            done_queue.get_nowait()
+    future = executor.submit(_process)
+
+    def _poll():
+        if not future.done():
+            tk_.after(POLL_INTERVAL, _poll)
+            return
+        if window is not None:
             window.destroy()
-            if callback:
-                callback()
-        except queue.Empty:
-            tk_.after(100, _process_queue)
+        try:
+            result = future.result()
+        except Exception as ex:  # pylint: disable=I0011, broad-except
+            LOG.exception(ex)
+            messagebox.showerror('Error', 'Error Details:\n\n{}'.format(ex))
+            return
+        if callback:
+            callback(result)
 
-    thread = threading.Thread(target=_process)
-    thread.start()
-    tk_.after(100, _process_queue)
+    tk_.after(POLL_INTERVAL, _poll)
+    return future
 
 
 def center(widget, width, height):
@@ -83,6 +99,7 @@ class QcriGui(tk.Tk):
         self._results = {}  # test results
         self.dir_dict = {}
         self.bug_dict = {}
+        self.labindex = None  # the Test Lab folders of the project
 
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
         self.title('QC Results Importer')
@@ -101,6 +118,7 @@ class QcriGui(tk.Tk):
         self.header_frame = None
         self.qc_connected_frm = None
         self.qc_disconnected_frm = None
+        self.qc_connect_button = None
         self.link_bug = None
 
         self.qc_domain = tk.StringVar()
@@ -108,6 +126,7 @@ class QcriGui(tk.Tk):
         self.qc_project = tk.StringVar()
         self.runresultsvar = tk.StringVar()
         self.qc_conn_status = tk.BooleanVar()
+        self.qcdir_search = tk.StringVar()
 
         # build the gui        
         self._make()
@@ -125,14 +144,25 @@ class QcriGui(tk.Tk):
 
         :return:
         """
-        self.disconnect_qc()
+        if self.qcc is not None:
+            try:
+                executor.call(qualitycenter.disconnect, self.qcc)
+            except qualitycenter.com_error as ex:
+                LOG.exception(ex)
+            self.qcc = None
+        executor.shutdown()
         self.destroy()
 
     def disconnect_qc(self):
         """
         Release the QC connection
         """
-        qualitycenter.disconnect(self.qcc)
+        qcc = self.qcc
+        self.qcc = None
+        if qcc is not None:
+            work_in_background(
+                self, lambda: qualitycenter.disconnect(qcc), busy=False)
+        self.labindex = None
         self.qc_conn_status.set(False)
 
     def _make(self):
@@ -211,12 +241,12 @@ class QcriGui(tk.Tk):
             hist = importer.load_history()
         else:
             hist = None
-        qc_connect_button = tk.Button(
+        self.qc_connect_button = tk.Button(
             self.qc_disconnected_frm,
             text='Connect',
             command=lambda: LoginWindow(self.login_callback, hist),
             width=15)
-        qc_connect_button.grid(row=0, column=0, sticky='ew', pady=5)
+        self.qc_connect_button.grid(row=0, column=0, sticky='ew', pady=5)
         self.qc_disconnected_frm.grid(row=0, column=0, sticky='nsew')
 
         # QC Connected Frame
@@ -272,6 +302,16 @@ class QcriGui(tk.Tk):
         upload_frm.columnconfigure(1, weight=1)
         upload_frm.grid(row=1, column=0, sticky='nsew', padx=10, pady=5)
 
+        # QC Directory search
+        search_frm = tk.Frame(remote_pane)
+        search_label = tk.Label(search_frm, text='Find folder:')
+        search_label.grid(row=0, column=0, sticky='w')
+        search_entry = tk.Entry(search_frm, textvariable=self.qcdir_search)
+        search_entry.grid(row=0, column=1, sticky='ew', padx=(10, 0))
+        search_frm.columnconfigure(1, weight=1)
+        search_frm.grid(row=2, column=0, sticky='nsew', padx=10)
+        self.qcdir_search.trace('w', self._on_qcdir_search_changed)
+
         # QC Directory
         qcdir_tree_frame = tk.Frame(remote_pane)
         self.qcdir_tree = ttk.Treeview(qcdir_tree_frame, selectmode='browse')
@@ -285,17 +325,17 @@ class QcriGui(tk.Tk):
         self.qcdir_tree.configure(yscroll=ysb.set)
         qcdir_tree_frame.columnconfigure(0, weight=1)
         qcdir_tree_frame.rowconfigure(0, weight=1)
-        qcdir_tree_frame.grid(row=2, column=0, sticky='nsew', padx=10, pady=5)
+        qcdir_tree_frame.grid(row=3, column=0, sticky='nsew', padx=10, pady=5)
 
         remote_pane.columnconfigure(0, weight=1)
-        remote_pane.rowconfigure(2, weight=1)
+        remote_pane.rowconfigure(3, weight=1)
         return remote_pane
 
     def _on_right_click_qc_tree(self, event):
         if not self.qc_conn_status.get():
             return
         menu = tk.Menu(self, tearoff=0)
-        menu.add_command(label='Refresh', command=self.refresh_qc_directories)
+        menu.add_command(label='Refresh', command=self.refresh_labindex)
         menu.post(event.x_root, event.y_root)
 
     def _load_run_results(self):
@@ -354,23 +394,94 @@ class QcriGui(tk.Tk):
 
     def refresh_qc_directories(self):
         """
-        Refresh the QC directory tree in background.
+        Refresh the QC directory tree, from the Test Lab index if it holds a
+        snapshot, otherwise in background.
         """
+        if self.labindex is not None and self.labindex.complete:
+            for child in self.qcdir_tree.get_children():
+                self.qcdir_tree.delete(child)
+            self.dir_dict.clear()
+            self._populate_from_index('', labindex.ROOT)
+            return
 
-        def _():
+        qcc = self.qcc
+
+        def _fetch():
+            root_ = qcc.TestSetTreeManager.Root
+            return _describe_folders(qualitycenter.get_subdirectories(root_))
+
+        def _done(folders):
             for child in self.qcdir_tree.get_children():
                 self.qcdir_tree.delete(child)
-            root_ = self.qcc.TestSetTreeManager.Root
-            subdirs = qualitycenter.get_subdirectories(root_)
             self.dir_dict.clear()
-            for node in subdirs:
-                idx = self.qcdir_tree.insert('', 'end', text=node.Name)
-                self.dir_dict[idx] = node.Path
-                subsubdirs = qualitycenter.get_subdirectories(node)
-                if subsubdirs:
-                    self.qcdir_tree.insert(idx, 'end', text='Fetching...')
+            self._insert_folders('', folders)
+
+        # results can still be loaded meanwhile
+        work_in_background(self, _fetch, _done, busy=False)
+
+    def refresh_labindex(self):
+        """
+        Snapshot the Test Lab tree in background, without blocking the
+        window. The snapshot is taken a few folders at a time so other
+        actions on the connection aren't held up, and the old index serves
+        browsing and searching until the new one is complete.
+        """
+        key = self.labindex.key
+        qcc = self.qcc
+        snapshots = []
+
+        def _step():
+            if not snapshots:
+                snapshots.append(labindex.Snapshot(qcc, key))
+            return snapshots[0].step(SNAPSHOT_STEP)
+
+        def _stepped(done):
+            if self.labindex is None or self.labindex.key != key:
+                # disconnected or connected elsewhere meanwhile
+                return
+            if not done:
+                work_in_background(self, _step, _stepped, busy=False)
+                return
+            was_complete = self.labindex.complete
+            self.labindex = snapshots[0].index
+            labindex.save_index(self.labindex)
+            if not was_complete and not self.qcdir_search.get():
+                self.refresh_qc_directories()
+
+        work_in_background(self, _step, _stepped, busy=False)
 
-        work_in_background(self, _)
+    def _populate_from_index(self, parent_idx, path):
+        self._insert_folders(parent_idx, [
+            (folder['name'], folder['path'],
+             self.labindex.has_children(folder['path']))
+            for folder in self.labindex.children(path)])
+
+    def _insert_folders(self, parent_idx, folders):
+        """
+        Add folders, a list of (name, path, has_children), to the tree.
+        """
+        for name, path, has_children in folders:
+            idx = self.qcdir_tree.insert(parent_idx, 'end', text=name)
+            self.dir_dict[idx] = path
+            if has_children:
+                self.qcdir_tree.insert(idx, 'end', text='Fetching...')
+
+    def _on_qcdir_search_changed(self, *_):
+        if self.labindex is None:
+            return
+        text = self.qcdir_search.get()
+        if not text.strip():
+            self.refresh_qc_directories()
+            return
+        for child in self.qcdir_tree.get_children():
+            self.qcdir_tree.delete(child)
+        self.dir_dict.clear()
+        for path in self.labindex.search(text):
+            if path == labindex.ROOT:
+                continue
+            # remove "Root\"
+            idx = self.qcdir_tree.insert('', 'end', text=path[5:])
+            self.dir_dict[idx] = path
 
     def _on_branch_opened(self, dummy_event):
         selection = self.qcdir_tree.selection()
@@ -381,22 +492,33 @@ class QcriGui(tk.Tk):
         if not children:
             return
         child = self.qcdir_tree.item(children[0])
-        if child['text'] == 'Fetching...':
-
-            def refresh(parent_idx):
-                fldr = self.dir_dict[parent_idx]
-                node = qualitycenter.get_qc_folder(self.qcc, fldr, create=False)
-                subdirs = qualitycenter.get_subdirectories(node)
-                for child in self.qcdir_tree.get_children(parent_idx):
-                    self.qcdir_tree.delete(child)
-                for node in subdirs:
-                    idx = self.qcdir_tree.insert(parent_idx, 'end', text=node.Name)
-                    self.dir_dict[idx] = node.Path
-                    subsubdirs = qualitycenter.get_subdirectories(node)
-                    if subsubdirs:
-                        self.qcdir_tree.insert(idx, 'end', text='Fetching...')
-
-            work_in_background(self, lambda: refresh(selected_idx))
+        if child['text'] != 'Fetching...':
+            return
+        fldr = self.dir_dict[selected_idx]
+        if self.labindex is not None and self.labindex.complete:
+            for child in children:
+                self.qcdir_tree.delete(child)
+            self._populate_from_index(selected_idx, fldr)
+            return
+
+        qcc = self.qcc
+
+        def _fetch():
+            node = qualitycenter.get_qc_folder(qcc, fldr, create=False)
+            subdirs = qualitycenter.get_subdirectories(node)
+            nodes = [(sub.NodeID, sub.Name, sub.Path) for sub in subdirs]
+            return node.NodeID, nodes, _describe_folders(subdirs)
+
+        def _done(fetched):
+            parent_id, nodes, folders = fetched
+            for child in self.qcdir_tree.get_children(selected_idx):
+                self.qcdir_tree.delete(child)
+            self._insert_folders(selected_idx, folders)
+            # the branch is known now, even before a snapshot
+            if self.labindex is not None:
+                self.labindex.replace_children(parent_id, nodes)
+
+        work_in_background(self, _fetch, _done)
 
     def select_run_result(self):
         pass
@@ -436,36 +558,73 @@ class QcriGui(tk.Tk):
         if not result:
             return
 
-        work_in_background(
-            self,
-            lambda: importer.import_results(
-                self.qcc,
-                qcdir,
-                results,
-                self.attach_report.get()),
-            lambda: messagebox.showinfo('Success', 'Import complete.'))
+        qualitycenter.configure(self.cfg)
+        qcc = self.qcc
+        attach_report = self.attach_report.get()
+
+        def _import():
+            return importer.import_results(qcc, qcdir, results, attach_report)
+
+        def _done(report):
+            if report['failed'] or report['attachment']:
+                messagebox.showwarning(
+                    'Import complete', importer.format_report(report))
+            else:
+                messagebox.showinfo('Success', 'Import complete.')
+
+        work_in_background(self, _import, _done)
 
     def login_callback(self, logincfg):
         """
-        called by login window
+        called by login window, connects in background so that results can
+        be loaded and parsed meanwhile
         """
         use_history = self.cfg.getboolean('main', 'history')
         if use_history:
             hist = importer.load_history()
             importer.update_history(hist, logincfg)
-        # pylint
-        try:
-            qcc = qualitycenter.connect(**logincfg)
-        except pythoncom.com_error as ex:
-            messagebox.showerror('Unable to Connect',
-                                 'Error Details:\n\n{}'.format(ex))
-            return False
+
+        key = labindex.index_key(
+            logincfg['url'], logincfg['domain'], logincfg['project'])
+
+        def _connect():
+            index = labindex.load_index(key)
+            try:
+                return qualitycenter.connect(**logincfg), index, None
+            except qualitycenter.com_error as ex:
+                return None, index, ex
+
+        def _done(connected):
+            self.qc_connect_button.config(text='Connect', state=tk.NORMAL)
+            qcc, index, error = connected
+            if error is not None:
+                messagebox.showerror('Unable to Connect',
+                                     'Error Details:\n\n{}'.format(error))
+                return
+            self._on_connected(qcc, logincfg, index)
+
+        self.qc_connect_button.config(text='Connecting...', state=tk.DISABLED)
+        work_in_background(self, _connect, _done, busy=False)
+
+    def _on_connected(self, qcc, logincfg, index):
         self.qcc = qcc
         self.qc_domain.set(logincfg['domain'])
         self.qc_project.set(logincfg['project'])
+        self.labindex = index
         self.qc_conn_status.set(True)
         self.refresh_qc_directories()
-        return True
+        if self.labindex.is_stale():
+            self.refresh_labindex()
+
+
+def _describe_folders(nodes):
+    """
+    Returns (name, path, has_children) of the QC folder nodes, to be shown
+    by the Tk thread.
+    """
+    return [(node.Name, node.Path,
+             bool(qualitycenter.get_subdirectories(node)))
+            for node in nodes]
 
 
 class LoginWindow(tk.Toplevel):
@@ -539,9 +698,9 @@ class LoginWindow(tk.Toplevel):
         }
         if not any(logincfg.items()):
             return
-        if self.callback(logincfg):
-            self.destroy()
-            self.grab_release()
+        self.callback(logincfg)
+        self.destroy()
+        self.grab_release()
 
 
 class BugWindow(tk.Toplevel):
@@ -657,10 +816,13 @@ class BugWindow(tk.Toplevel):
             self._test_cache[idx] = test
 
     def refresh_qc_bugs(self):
+        qcc = self.qcc
+        work_in_background(
+            self, lambda: qualitycenter.get_bugs(qcc), self._populate_bugs)
+
+    def _populate_bugs(self, bugs):
         for child in self.bug_tree.get_children():
             self.bug_tree.delete(child)
-
-        bugs = qualitycenter.get_bugs(self.qcc)
         self._bug_cache.clear()
         for bug in bugs:
             idx = self.bug_tree.insert('', 'end', values=(
@@ -0,0 +1,142 @@
+"""
+ID Cache
+
+Remembers the ids of the Quality Center entities imports resolve, per
+server, domain and project, in an SQLite file in the temp directory, so
+that the next run can fetch a test set, test or test instance by id
+instead of looking up its folders and filtering by name.
+
+An id is trusted for ttl seconds after it was looked up. qualitycenter
+checks an entity fetched by id still has the name it was cached under, and
+a test set or test the folder, and drops the id and falls back to the
+lookup when it doesn't or the fetch fails, so deleted, renamed and moved
+entities only cost one extra call.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+
+LOG = logging.getLogger(__name__)
+
+# seconds an id is trusted, a week covers nightly and weekly imports
+TTL = 7 * 24 * 60 * 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ids (
+    scope TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    id TEXT NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (scope, kind, key)
+)
+"""
+
+
+class IdCache(object):
+    """
+    Entity ids by (scope, kind, key): scope names the project, see
+    scope_key, kind the entity type and key is a tuple of strings.
+    Safe to share between threads and processes.
+    """
+
+    def __init__(self, filename, ttl=TTL):
+        self.filename = filename
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(filename, timeout=10,
+                                     check_same_thread=False)
+        # a lost write only costs a lookup, don't wait for the disk
+        self._conn.execute('PRAGMA synchronous=OFF')
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+
+    def get(self, scope, kind, key):
+        """
+        Returns the id cached for key, None if there is none or it expired.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT id, updated FROM ids '
+                'WHERE scope = ? AND kind = ? AND key = ?',
+                (scope, kind, _dump(key))).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return row[0]
+
+    def put(self, scope, kind, key, entity_id):
+        """
+        Cache entity_id for key.
+        """
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO ids VALUES (?, ?, ?, ?, ?)',
+                (scope, kind, _dump(key), str(entity_id), time.time()))
+            self._conn.commit()
+
+    def discard(self, scope, kind, key):
+        """
+        Forget the id of key.
+        """
+        with self._lock:
+            self._conn.execute(
+                'DELETE FROM ids WHERE scope = ? AND kind = ? AND key = ?',
+                (scope, kind, _dump(key)))
+            self._conn.commit()
+
+    def purge(self):
+        """
+        Remove the expired ids, returns how many.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                'DELETE FROM ids WHERE updated < ?', (time.time() - self.ttl,))
+            self._conn.commit()
+        return cursor.rowcount
+
+    def close(self):
+        """
+        Close the file.
+        """
+        with self._lock:
+            self._conn.close()
+
+
+def scope_key(url, domain, project):
+    """
+    Returns the scope of the ids of a project.
+    """
+    return '{}|{}|{}'.format(url.rstrip('/').lower(), domain.lower(),
+                             project.lower())
+
+
+def get_cache_path(folder=None):
+    """
+    Returns the file the ids are kept in.
+    """
+    return os.path.join(folder or tempfile.gettempdir(), 'qcri-ids.sqlite')
+
+
+def open_cache(ttl=TTL, folder=None):
+    """
+    Returns the IdCache in the temp directory, or folder, with expired ids
+    removed. Returns None if it can't be opened; imports work without it.
+    """
+    filename = get_cache_path(folder)
+    try:
+        cache = IdCache(filename, ttl)
+        cache.purge()
+    except sqlite3.Error as ex:
+        LOG.warning('id cache unavailable at %s: %s', filename, ex)
+        return None
+    return cache
+
+
+def _dump(key):
+    return json.dumps([str(part) for part in key])
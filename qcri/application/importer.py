@@ -3,27 +3,25 @@ Importer
 """
 
 import logging
-import io
 import os
 import random
 import string
 import tempfile
+import threading
 import json
 import configparser
 import codecs
 import importlib
-from collections import defaultdict
-from distutils.util import strtobool
-from qcri.application import qualitycenter
+from collections import defaultdict, OrderedDict
+from qcri.application import filters as _filters
+from qcri.application import instrument
+from qcri.application import registry
+from qcri.application import steppolicy
 
 
-logging.basicConfig(
-    filename=os.path.join(tempfile.gettempdir(), 'qcri.log'),
-    format='%(levelname)s <%(funcName)s> %(message)s',
-    level=logging.INFO)
 LOG = logging.getLogger(__name__)
 
-DEFAULT_CFG = """
+DEFAULT_CFG = u"""
 [main]
 history=true
 
@@ -31,6 +29,14 @@ history=true
 robotframework=true
 uftrunreport=true
 seleniumtestresults=true
+junit=true
+
+[qualitycenter]
+max_operations_per_second=0
+connections=1
+upsert=off
+attachment_dir=
+id_cache_ttl=604800
 
 [uftrunreport]
 test_column=test
@@ -39,8 +45,24 @@ subject_column=subject
 suite_column=suite
 replace_warning_with_passed=true
 
+[steps]
+policy=all
+max_length=0
+
+[filters]
+include_tags=
+exclude_tags=
+suites=
+statuses=
+names=
+exclude_names=
+columns=
+
 """
 
+# how parse_shards resolves a test found in several shards
+MERGE_MODES = ('last', 'merge')
+
 
 class ParserError(Exception):
     """
@@ -52,6 +74,17 @@ class ParserError(Exception):
     pass
 
 
+def configure_logging():
+    """
+    Log to qcri.log in the temp directory. Called by the qcri application;
+    API users configure logging themselves.
+    """
+    logging.basicConfig(
+        filename=get_tempfilepath('qcri.log'),
+        format='%(levelname)s <%(funcName)s> %(message)s',
+        level=logging.INFO)
+
+
 def get_tempfilepath(filename='qcri.history'):
     """
     returns tempfilepath
@@ -104,27 +137,43 @@ def update_history(hist, new_items):
 
 def is_parser(parser):
     """
-    Parsers are modules with a parse function dropped in the 'parsers' folder.
-    When attempting to parse a file, QCRI will load and try all parsers,
-    returning a list of the ones that worked.
-    todo: load them from config
+    Parsers are modules with a parse function and an ATTACH_LIST, either in
+    the 'parsers' folder or registered under the 'qcri.parsers' entry point.
+    When attempting to parse a file, QCRI will try the parsers the registry
+    deems candidates, returning a list of the ones that worked.
     """
     return hasattr(parser, 'parse') and hasattr(parser, 'ATTACH_LIST')
 
 
+@instrument.timed('parse.get_parsers')
 def get_parsers(filename, cfg):
     """
     Returns a list of valid parsers for filename.
     """
     if not os.path.isfile(filename):
         return []
-    avail_parsers = _load_parsers(cfg)
+    disabled = [option for option in cfg.options('parsers')
+                if not cfg.getboolean('parsers', option)]
     valid_parsers = []
-    for parser in avail_parsers:
+    for info in registry.get_candidates(filename, disabled):
+        LOG.debug('testing parser: %s', info.name)
         try:
-            parser_name = parser.__name__
-            LOG.debug('testing parser: %s', parser_name)
-            parser.parse(filename)
+            parser = info.load()
+        except ImportError as ex:
+            LOG.exception(ex)
+            continue
+        if not is_parser(parser):
+            LOG.error('not a parser: %s', info.module)
+            continue
+        options = _parser_options(parser, cfg)
+        try:
+            if info.streaming and hasattr(parser, 'iter_parse'):
+                # reading the first test is enough to tell the format
+                tests = parser.iter_parse(filename, options)
+                next(tests, None)
+                tests.close()
+            else:
+                parser.parse(filename, options)
             valid_parsers.append(parser)
         except ParserError as ex:
             LOG.exception(ex)
@@ -143,26 +192,37 @@ def load_config(config_filename='qcri.cfg'):
         with codecs.open(config_filepath, 'r', encoding='utf-8') as filed:
             cfg.read_file(filed)
     else:
-        cfg.readfp(io.BytesIO(DEFAULT_CFG))
+        cfg.read_string(DEFAULT_CFG)
     return cfg
 
 
-def parse_results(parser, filename, cfg=None):
+def parse_results(parser, filename, cfg=None, stream=False, filters=None,
+                  step_policy=None):
     """
     Returns the parsed test results from filename, using cfg options if given.
+
+    If stream is True and the parser can parse incrementally, 'tests' is a
+    generator that parses each test as it is consumed.
+
+    filters is a filters.TestFilter selecting the tests to parse, by default
+    the one of the [filters] section of cfg. Parsers that support it skip
+    the tests left out without building them.
+
+    step_policy is a steppolicy.StepPolicy of the steps kept of each test,
+    by default the one of the [steps] section of cfg.
     """
     if cfg is None:
         cfg = load_config()
-    sections = cfg.sections()
-    options = None
-    parser_name = parser.__name__
-    for section in sections:
-        if section == parser_name:
-            LOG.info('found options for parser: %s', parser_name)
-            options = cfg.options(section)
-            options = {option: cfg.get(section, option) for option in options}
-            break
-    tests = parser.parse(filename, options)
+    options, filters, step_policy = _parse_options(
+        parser, cfg, filters, step_policy)
+    if stream and hasattr(parser, 'iter_parse'):
+        tests = parser.iter_parse(filename, options)
+    else:
+        with instrument.span('parse.parse'):
+            tests = parser.parse(filename, options)
+    tests = _refine(tests, filters, step_policy)
+    if not stream and (filters or step_policy):
+        tests = list(tests)
     return {
         'filename': filename,
         'tests': tests,
@@ -170,75 +230,417 @@ def parse_results(parser, filename, cfg=None):
     }
 
 
-def import_results(qcc, qcdir, results, attach_report=False):
+def parse_shards(parser, filenames, cfg=None, processes=None, merge='last',
+                 filters=None, step_policy=None):
+    """
+    Returns the test results of filenames, the shards of one run such as the
+    outputs of pabot, parsed in up to processes worker processes (by default
+    one per CPU) and merged as rebot --merge does.
+
+    Tests are matched by subject, suite and name. A test found in several
+    shards keeps the result of the last of filenames, in the position it
+    first appeared. With merge='merge' its description also notes the
+    status it replaced. Shards are merged in order as they are parsed, and
+    the results import as one, attached from the folder of the first shard.
+    filters and step_policy are those of parse_results.
+    """
+    if merge not in MERGE_MODES:
+        raise ValueError('unknown merge mode: {}'.format(merge))
+    if not filenames:
+        raise ValueError('no shards to parse')
+    if cfg is None:
+        cfg = load_config()
+    options, filters, step_policy = _parse_options(
+        parser, cfg, filters, step_policy)
+    # process pools are slow to import, only load them for shards
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    processes = min(len(filenames), processes or multiprocessing.cpu_count())
+    with instrument.span('parse.parse_shards'):
+        if processes > 1:
+            with ProcessPoolExecutor(processes) as pool:
+                tests = merge_shards(
+                    pool.map(_parse_shard, [parser.__name__] * len(filenames),
+                             filenames, [options] * len(filenames)), merge)
+        else:
+            tests = merge_shards(
+                (parser.parse(filename, options) for filename in filenames),
+                merge)
+    tests = list(_refine(tests, filters, step_policy))
+    names = [os.path.basename(filename) for filename in filenames[1:]]
+    return {
+        'filename': filenames[0],
+        'tests': tests,
+        'attach_list': list(parser.ATTACH_LIST) + names
+    }
+
+
+def merge_shards(shards, merge='last'):
+    """
+    Returns the tests of shards, lists of test results in run order, merged
+    as parse_shards describes.
+    """
+    merged = OrderedDict()
+    for tests in shards:
+        for test in tests:
+            key = (test.get('subject', ''), test.get('suite', ''),
+                   test.get('name'))
+            previous = merged.get(key)
+            if previous is not None and merge == 'merge':
+                test['description'] = '\n\n'.join(part for part in (
+                    test.get('description', ''),
+                    'Re-executed test has been merged.\n'
+                    'New status: {}\nOld status: {}'.format(
+                        test.get('status'), previous.get('status'))) if part)
+            merged[key] = test
+    return list(merged.values())
+
+
+def import_results(qcc, qcdir, results, attach_report=False,
+                   connections=None, upsert=None, plan=None):
     """
     Imports the results to Quality Center at the qcdir location.
     If attach_report is True the folder containing the results file will
-    be zipped and attached to qcdir attachment factory.
+    be zipped and attached to qcdir attachment factory. The archive is made
+    on a thread of its own while the tests import. If the folder doesn't
+    exist on this host, as when the results were loaded from a result file
+    written elsewhere, the tests import without it and
+    report['attachment'] says so.
+
+    results['tests'] may be any iterable; tests are imported one at a time
+    as they are read. A streamed parse may raise ParserError partway, after
+    the tests read before were imported: the report is then returned
+    without attaching the report archive, with the error in
+    report['parse_error']. With connections > 1, that many sessions logged in
+    like qcc import tests in parallel, paced by qualitycenter.LIMITER. It
+    defaults to the connections set by qualitycenter.configure.
+
+    upsert is 'off', 'skip' or 'update', see
+    qualitycenter.import_test_result, and defaults to the mode set by
+    qualitycenter.configure. Runs are matched by execution date and time and
+    a fingerprint of the result, which leaves out the attachment serial.
+
+    plan is a planner.make_plan of the same tests; the entities it found are
+    used without looking them up again, and its upsert mode by default.
+
+    A test that fails to import is logged and skipped, the others are still
+    imported. If the session expired the connection is logged in again, the
+    run the expired session left incomplete removed, and the test retried
+    once. Returns the import report:
+
+        tests       - number of tests read
+        imported    - number of tests imported, including updated ones
+        updated     - number of existing runs updated
+        skipped     - number of tests whose run was already imported
+        failed      - [{'name', 'error'}] of the tests not imported
+        reconnects  - number of times the session was renewed
+        attachment  - the error attaching the report, or None
+        parse_error - the ParserError that stopped reading the tests, or
+                      None
     """
+    from qcri.application import archive
+    from qcri.application import qualitycenter
+    report = {
+        'tests': 0,
+        'imported': 0,
+        'updated': 0,
+        'skipped': 0,
+        'failed': [],
+        'reconnects': 0,
+        'attachment': None,
+        'parse_error': None
+    }
     serial = None
+    if attach_report:
+        pardir, filename = os.path.split(results['filename'])
+        if os.path.isdir(pardir or os.curdir):
+            serial = _make_serial()
+        else:
+            # results loaded from a result file made on another host
+            LOG.warning('report folder not found, not attaching: %s',
+                        pardir)
+            report['attachment'] = 'report folder not found: {}'.format(
+                pardir)
+            attach_report = False
+    if connections is None:
+        connections = qualitycenter.CONNECTIONS
+    if plan is not None and plan['qcdir'] != qcdir:
+        raise ValueError('the plan is for another destination: {}'.format(
+            plan['qcdir']))
+    if upsert is None:
+        upsert = plan['upsert'] if plan is not None else qualitycenter.UPSERT
+    if upsert not in qualitycenter.UPSERT_MODES:
+        raise ValueError('invalid upsert mode: {}'.format(upsert))
+
     tests = results['tests']
+    if instrument.is_enabled():
+        # times a streamed parse or a result file load as it is consumed
+        tests = instrument.timed_iter('parse.read_test', tests)
+    tests = iter(tests)
+    lock = threading.Lock()
+    parse_errors = []
+    archiving = None
     if attach_report:
-        serial = _insert_serial_step(tests)
+        # reading the report, often from a network share, overlaps the
+        # round-trips of the import
+        from concurrent.futures import ThreadPoolExecutor
+        archiver = ThreadPoolExecutor(1)
+        archiving = archiver.submit(
+            qualitycenter.make_report_archive, pardir,
+            results['attach_list'] + [filename],
+            'report-{}.zip'.format(serial))
+        archiver.shutdown(wait=False)
+
+    def _work(conn, session=None):
+        # the entities found on one connection are only used on it
+        if session is None:
+            session = {}
+        while True:
+            with lock:
+                if parse_errors:
+                    return
+                try:
+                    test = next(tests, None)
+                except Exception as ex:  # pylint: disable=I0011, broad-except
+                    # raised again by the calling thread
+                    parse_errors.append(ex)
+                    return
+                if test is None:
+                    return
+                report['tests'] += 1
+            testname = test['name']
+            LOG.debug('importing test result: %s', testname)
+            steps = test['steps']
+            fingerprint = None
+            if upsert != 'off':
+                fingerprint = qualitycenter.test_fingerprint(test)
+            if serial:
+                steps = [_serial_step(serial, steps)] + list(steps)
+            outcome, error, reconnects = _import_test(
+                qualitycenter, conn, qcdir, {
+                    'subject': test['subject'],
+                    'suite': test.get('suite', ''),
+                    'name': testname,
+                    'description': test.get('description', ''),
+                    'exec_date': test.get('exec_date', ''),
+                    'exec_time': test.get('exec_time', ''),
+                    'duration': test.get(
+                        'duration', qualitycenter.DEFAULT_DURATION),
+                    'status': test.get(
+                        'status', qualitycenter.DEFAULT_STATUS),
+                    'steps': steps,
+                    'bug': test.get('bug', '0'),
+                    'upsert': upsert,
+                    'fingerprint': fingerprint,
+                    'session': session
+                })
+            if error is not None:
+                LOG.error('unable to import test result %s: %s',
+                          testname, error)
+            with lock:
+                report['reconnects'] += reconnects
+                if outcome == 'skipped':
+                    report['skipped'] += 1
+                elif outcome is not None:
+                    report['imported'] += 1
+                    if outcome == 'updated':
+                        report['updated'] += 1
+                else:
+                    report['failed'].append(
+                        {'name': testname, 'error': error})
+
+    workers = []
+    for idx in range(1, connections):
+        worker = threading.Thread(
+            target=_import_worker,
+            args=(qualitycenter, qcc, _work),
+            name='qcri-import-{}'.format(idx))
+        worker.start()
+        workers.append(worker)
+    _work(qcc, plan['session'] if plan is not None else None)
+    for worker in workers:
+        worker.join()
+    if archiving is not None:
+        try:
+            zipfileloc = archiving.result()
+        except archive.ERRORS as ex:
+            LOG.exception(ex)
+            report['attachment'] = str(ex)
+            archiving = None
+    if parse_errors:
+        if archiving is not None:
+            os.remove(zipfileloc)
+        if not isinstance(parse_errors[0], ParserError):
+            raise parse_errors[0]
+        # the tests read before the error are already imported
+        LOG.error('results not fully read, import is partial: %s',
+                  parse_errors[0])
+        report['parse_error'] = str(parse_errors[0])
+        return report
+
+    if archiving is not None:
+        try:
+            qualitycenter.upload_report(qcc, qcdir, zipfileloc)
+        except qualitycenter.com_error as ex:
+            LOG.exception(ex)
+            report['attachment'] = str(ex)
+    return report
 
-    _errors = []
-    for test in tests:
-        testname = test['name']
-        LOG.debug('importing test result: %s', testname)
-        err = qualitycenter.import_test_result(
-            qcc,
-            qcdir,
-            subject=test['subject'],
-            suite=test.get('suite', ''),
-            name=testname,
-            description=test.get('description', ''),
-            exec_date=test.get('exec_date', ''),
-            exec_time=test.get('exec_time', ''),
-            duration=test.get('duration', '0'),
-            status=test.get('status', 'Failed'),
-            steps=test['steps'],
-            bug=test.get('bug', '0'))
-        _errors.append((testname, err))
 
-    if attach_report:
-        # remove the serial step inserted earlier
-        for test in tests:
-            test['steps'].pop(0)
-        pardir, filename = os.path.split(results['filename'])
-        attachments = results['attach_list'] + [filename]
-        qualitycenter.attach_report(
-            qcc, pardir, attachments, qcdir, 'report-{}.zip'.format(serial))
+def _import_worker(qualitycenter, qcc, work):
+    """
+    Run work with a connection of its own on a worker thread.
+    """
+    qualitycenter.init_thread()
+    try:
+        try:
+            conn = qualitycenter.clone(qcc)
+        except qualitycenter.com_error as ex:
+            LOG.exception(ex)
+            conn = None
+        if conn is None:
+            LOG.warning('no extra connection, importing on fewer sessions')
+            return
+        try:
+            work(conn)
+        finally:
+            if conn is not qcc:
+                qualitycenter.disconnect(conn)
+    finally:
+        qualitycenter.uninit_thread()
+
+
+def format_report(report):
+    """
+    Returns the import report as text.
+    """
+    lines = ['Imported {} of {} test results.'.format(
+        report['imported'], report['tests'])]
+    if report['updated']:
+        lines.append('Updated {} existing runs.'.format(report['updated']))
+    if report['skipped']:
+        lines.append('Skipped {} unchanged runs.'.format(report['skipped']))
+    if report['reconnects']:
+        lines.append('Reconnected {} times.'.format(report['reconnects']))
+    for failure in report['failed']:
+        lines.append('Failed: {name}: {error}'.format(**failure))
+    if report['attachment']:
+        lines.append('Report not attached: {}'.format(report['attachment']))
+    if report.get('parse_error'):
+        lines.append('Results not fully read, the import is partial: '
+                     '{}'.format(report['parse_error']))
+    return '\n'.join(lines)
+
+
+def _import_test(qualitycenter, qcc, qcdir, kwargs):
+    """
+    Import one test, returns (outcome, error, reconnects) where outcome is
+    that of qualitycenter.import_test_result, or None with the error.
+
+    If the session expired the connection is logged in again, the run the
+    failed attempt left incomplete is discarded and the test imported again.
+    """
+    reconnects = 0
+    session = kwargs['session']
+    while True:
+        try:
+            outcome = qualitycenter.import_test_result(qcc, qcdir, **kwargs)
+            if outcome:
+                return outcome, None, reconnects
+            return None, 'unable to create the test instance', reconnects
+        except qualitycenter.com_error as ex:
+            partial_run = session.pop('partial_run', None)
+            if (not reconnects and qualitycenter.is_session_error(ex) and
+                    qualitycenter.reconnect(qcc)):
+                reconnects += 1
+                # runs listed on the expired session can't be used
+                session.clear()
+                try:
+                    if partial_run is not None:
+                        qualitycenter.discard_partial_run(qcc, partial_run)
+                    continue
+                except qualitycenter.com_error as discard_ex:
+                    # importing again would leave a duplicate run
+                    ex = discard_ex
+            LOG.exception(ex)
+            return None, str(ex), reconnects
+        except Exception as ex:  # pylint: disable=I0011, broad-except
+            session.pop('partial_run', None)
+            LOG.exception(ex)
+            return None, repr(ex), reconnects
 
 
-def _insert_serial_step(tests):
+def _make_serial():
     serial_length = 8
+    return ''.join(random.choice(string.ascii_lowercase + string.digits)
+                   for _ in range(int(serial_length)))
 
-    serial = ''.join(random.choice(string.ascii_lowercase + string.digits)
-                     for _ in range(int(serial_length)))
+
+def _serial_step(serial, steps):
+    """
+    Returns the step recording the attachment serial, dated like the first
+    step of the test.
+    """
+    try:
+        exec_date = steps[0]['exec_date']
+        exec_time = steps[0]['exec_time']
+    except (IndexError, KeyError):
+        exec_date = ''
+        exec_time = ''
+    return {
+        'name': 'Attachment Serial',
+        'status': 'N/A',
+        'description': serial,
+        'exec_date': exec_date,
+        'exec_time': exec_time
+    }
+
+
+def _parse_shard(module, filename, options):
+    # runs in a worker process, which imports the parser itself
+    return importlib.import_module(module).parse(filename, options)
+
+
+def _parse_options(parser, cfg, filters, step_policy):
+    """
+    Returns the options of parser, with the filters and step policy given or
+    those of cfg, and the filters and step policy.
+    """
+    if filters is None:
+        filters = _filters.from_config(cfg)
+    if step_policy is None:
+        step_policy = steppolicy.from_config(cfg)
+    options = _parser_options(parser, cfg)
+    if filters:
+        options = dict(options or {}, filters=filters)
+    if step_policy:
+        options = dict(options or {}, step_policy=step_policy)
+    return options, filters, step_policy
+
+
+def _refine(tests, filters, step_policy):
+    # parsers that don't know about filters and step policies
+    if filters:
+        tests = filters.apply(tests)
+    if step_policy:
+        tests = _apply_step_policy(tests, step_policy)
+    return tests
+
+
+def _apply_step_policy(tests, step_policy):
     for test in tests:
-        steps = test['steps']
-        try:
-            exec_date = steps[0]['exec_date']
-            exec_time = steps[0]['exec_time']
-        except (IndexError, KeyError):
-            exec_date = ''
-            exec_time = ''
-        serial_step = {
-            'name': 'Attachment Serial',
-            'status': 'N/A',
-            'description': serial,
-            'exec_date': exec_date,
-            'exec_time': exec_time
-        }
-        steps.insert(0, serial_step)
-    return serial
-
-
-def _load_parsers(cfg):
-    valid_parsers = []
-    options = cfg.options('parsers')
-    for option in options:
-        if strtobool(cfg.get('parsers', option)):
-            mod = importlib.import_module('qcri.parsers.' + option)
-            valid_parsers.append(mod)
-    return valid_parsers
+        if test.get('steps'):
+            test['steps'] = step_policy.apply(test['steps'])
+        yield test
+
+
+def _parser_options(parser, cfg):
+    """
+    Returns the options of the cfg section named after the parser, if any.
+    """
+    parser_name = parser.__name__.rsplit('.', 1)[-1]
+    if not cfg.has_section(parser_name):
+        return None
+    LOG.info('found options for parser: %s', parser_name)
+    return {option: cfg.get(parser_name, option)
+            for option in cfg.options(parser_name)}
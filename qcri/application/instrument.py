@@ -0,0 +1,265 @@
+"""
+Instrumentation
+
+Counts and times Quality Center operations and parse phases.
+
+Operations are wrapped with the timed decorator or a span context; while
+instrumentation is disabled, the default, the wrappers call straight
+through. Once enabled, every span adds to the per-operation statistics and
+is passed to the registered hooks as
+
+    hook(name, start, duration, error)
+
+where start and duration are in seconds (time.time() based) and error is
+the exception raised inside the span, or None. Hooks are called on the
+thread that ran the span.
+
+Spans nest, e.g. 'qc.get_qc_folder' runs inside 'qc.make_test_plan', so
+times are inclusive.
+
+A TraceRecorder hook keeps every span with its thread and writes them in
+the Chrome Trace Event format, for chrome://tracing, Perfetto or
+speedscope.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+
+
+_ENABLED = False
+_HOOKS = []
+_STATS = {}
+_LOCK = threading.Lock()
+
+
+def enable(enabled=True):
+    """
+    Turn instrumentation on or off.
+    """
+    global _ENABLED  # pylint: disable=I0011, global-statement
+    _ENABLED = enabled
+
+
+def is_enabled():
+    """
+    Returns True if spans are being recorded.
+    """
+    return _ENABLED
+
+
+def add_hook(hook):
+    """
+    Call hook(name, start, duration, error) for every span. Enables
+    instrumentation.
+    """
+    _HOOKS.append(hook)
+    enable()
+
+
+def remove_hook(hook):
+    """
+    Stop calling hook.
+    """
+    _HOOKS.remove(hook)
+
+
+def reset():
+    """
+    Clear the statistics collected so far.
+    """
+    with _LOCK:
+        _STATS.clear()
+
+
+def get_stats():
+    """
+    Returns {name: {count, errors, total, mean, max}} with times in seconds.
+    """
+    with _LOCK:
+        items = [(name, list(stat)) for name, stat in _STATS.items()]
+    stats = {}
+    for name, (count, errors, total, maximum) in items:
+        stats[name] = {
+            'count': count,
+            'errors': errors,
+            'total': round(total, 6),
+            'mean': round(total / count, 6),
+            'max': round(maximum, 6)
+        }
+    return stats
+
+
+def span(name):
+    """
+    Returns a context manager timing the block as operation name.
+    """
+    if not _ENABLED:
+        return _NULL_SPAN
+    return _Span(name)
+
+
+def timed(name):
+    """
+    Decorator timing every call of the function as operation name.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _ENABLED:
+                return func(*args, **kwargs)
+            with _Span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def timed_iter(name, iterable):
+    """
+    Yields from iterable, timing each item it produces as operation name.
+    Lets the work of a lazy parser be measured where it is consumed.
+    """
+    iterator = iter(iterable)
+    while True:
+        with span(name) as spn:
+            try:
+                item = next(iterator)
+            except StopIteration:
+                spn.discard()
+                return
+        yield item
+
+
+def summary_table():
+    """
+    Returns the statistics as a text table, slowest operation first.
+    """
+    stats = get_stats()
+    rows = sorted(stats.items(), key=lambda item: -item[1]['total'])
+    lines = ['{:<28} {:>8} {:>7} {:>10} {:>10} {:>10}'.format(
+        'operation', 'count', 'errors', 'total s', 'mean ms', 'max ms')]
+    for name, stat in rows:
+        lines.append('{:<28} {:>8} {:>7} {:>10.3f} {:>10.2f} {:>10.2f}'.format(
+            name, stat['count'], stat['errors'], stat['total'],
+            stat['mean'] * 1000, stat['max'] * 1000))
+    return '\n'.join(lines)
+
+
+def write_json(filename):
+    """
+    Write the statistics to filename as JSON.
+    """
+    with open(filename, 'w') as filed:
+        json.dump(get_stats(), filed, indent=2, sort_keys=True)
+
+
+class TraceRecorder(object):
+    """
+    A hook recording every span as a Chrome trace complete event.
+    """
+
+    def __init__(self):
+        self.events = []
+        self._origin = time.time()
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, name, start, duration, error):
+        thread = threading.current_thread()
+        event = {
+            'name': name,
+            'cat': name.split('.', 1)[0],
+            'ph': 'X',
+            'ts': int((start - self._origin) * 1e6),
+            'dur': int(duration * 1e6),
+            'pid': os.getpid(),
+            'tid': thread.ident
+        }
+        if error is not None:
+            event['args'] = {'error': repr(error)}
+        with self._lock:
+            self._threads.setdefault(thread.ident, thread.name)
+            self.events.append(event)
+
+    def trace(self):
+        """
+        Returns the trace as a Chrome Trace Event format dict.
+        """
+        with self._lock:
+            events = list(self.events)
+            threads = sorted(self._threads.items())
+        meta = [{
+            'name': 'thread_name',
+            'ph': 'M',
+            'pid': os.getpid(),
+            'tid': ident,
+            'args': {'name': name}
+        } for ident, name in threads]
+        return {
+            'traceEvents': meta + sorted(events, key=lambda e: e['ts']),
+            'displayTimeUnit': 'ms'
+        }
+
+    def write(self, filename):
+        """
+        Write the trace to filename.
+        """
+        with open(filename, 'w') as filed:
+            json.dump(self.trace(), filed)
+
+
+def _record(name, start, duration, error):
+    with _LOCK:
+        stat = _STATS.get(name)
+        if stat is None:
+            stat = _STATS[name] = [0, 0, 0.0, 0.0]
+        stat[0] += 1
+        if error is not None:
+            stat[1] += 1
+        stat[2] += duration
+        if duration > stat[3]:
+            stat[3] = duration
+    for hook in list(_HOOKS):
+        hook(name, start, duration, error)
+
+
+class _Span(object):
+
+    __slots__ = ('name', 'start', '_discarded')
+
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+        self._discarded = False
+
+    def discard(self):
+        self._discarded = True
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self._discarded:
+            _record(self.name, self.start, time.time() - self.start,
+                    exc_value if exc_type is not None else None)
+        return False
+
+
+class _NullSpan(object):
+
+    __slots__ = ()
+
+    def discard(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
@@ -0,0 +1,258 @@
+"""
+Test Lab Index
+
+A local snapshot of the Test Lab folder tree, with the id, name, path and
+parent of every folder, so that folders can be browsed and searched without
+a round-trip to Quality Center per branch.
+
+An index is kept per server, domain and project in the temp directory and
+records when it was last fully refreshed. snapshot, or a Snapshot taken
+step by step, walks the whole tree into a new index, to be swapped in for
+the old one once it is complete; refresh_children updates a single branch
+of an index as it is browsed.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import deque
+
+from qcri.application import instrument
+
+
+LOG = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+# a snapshot older than this, in seconds, is refreshed in the background
+MAX_AGE = 24 * 60 * 60
+
+ROOT = 'Root'
+
+
+class LabIndex(object):
+    """
+    The Test Lab folders of one project.
+
+    folders maps folder ids to {'name', 'parent', 'path'}; updated is the
+    time of the last full snapshot, None if there wasn't one.
+    """
+
+    def __init__(self, key, folders=None, updated=None):
+        self.key = key
+        self.folders = {}
+        self.updated = updated
+        self._children = {}
+        self._paths = {}
+        self._search_list = None
+        for folder_id, folder in (folders or {}).items():
+            self.update(folder_id, folder['name'], folder['parent'],
+                        folder['path'])
+
+    @property
+    def complete(self):
+        """
+        True if the index holds a full snapshot.
+        """
+        return self.updated is not None
+
+    def is_stale(self, max_age=MAX_AGE):
+        """
+        True if the index should be refreshed.
+        """
+        return not self.complete or time.time() - self.updated > max_age
+
+    def get(self, path):
+        """
+        Returns the folder at path, or None.
+        """
+        folder_id = self._paths.get(path.lower())
+        return None if folder_id is None else self.folders[folder_id]
+
+    def children(self, path):
+        """
+        Returns the folders in the folder at path, sorted by name.
+        """
+        parent_id = self._paths.get(path.lower())
+        folders = [self.folders[fid]
+                   for fid in self._children.get(parent_id, ())]
+        return sorted(folders, key=lambda folder: folder['name'].lower())
+
+    def has_children(self, path):
+        """
+        True if the folder at path has subfolders.
+        """
+        return bool(self._children.get(self._paths.get(path.lower())))
+
+    def search(self, text, limit=200):
+        """
+        Returns the paths of up to limit folders whose path contains every
+        word of text, ignoring case. Folders whose name starts with the last
+        word come first, then shorter paths.
+        """
+        words = text.lower().split()
+        if not words:
+            return []
+        if self._search_list is None:
+            self._search_list = [
+                (folder['path'].lower(), folder['name'].lower(),
+                 folder['path'])
+                for folder in self.folders.values()]
+        matches = []
+        for lower_path, lower_name, path in self._search_list:
+            if all(word in lower_path for word in words):
+                matches.append((not lower_name.startswith(words[-1]),
+                                len(path), path))
+        matches.sort()
+        return [path for _, _, path in matches[:limit]]
+
+    def update(self, folder_id, name, parent, path):
+        """
+        Add or replace a folder.
+        """
+        folder_id = str(folder_id)
+        parent = None if parent is None else str(parent)
+        self._unlink(folder_id)
+        self.folders[folder_id] = {
+            'name': name,
+            'parent': parent,
+            'path': path
+        }
+        self._children.setdefault(parent, set()).add(folder_id)
+        self._paths[path.lower()] = folder_id
+        self._search_list = None
+
+    def replace_children(self, parent_id, nodes):
+        """
+        Replace the children of the folder parent_id with nodes, a list of
+        (id, name, path), dropping the subtrees of removed folders.
+        """
+        parent_id = str(parent_id)
+        keep = set(str(node[0]) for node in nodes)
+        removed = [fid for fid in self._children.get(parent_id, ())
+                   if fid not in keep]
+        while removed:
+            fid = removed.pop()
+            removed.extend(self._children.pop(fid, ()))
+            self._unlink(fid)
+            self.folders.pop(fid, None)
+        for folder_id, name, path in nodes:
+            self.update(folder_id, name, parent_id, path)
+
+    def _unlink(self, folder_id):
+        old = self.folders.get(folder_id)
+        if old is None:
+            return
+        self._children.get(old['parent'], set()).discard(folder_id)
+        if self._paths.get(old['path'].lower()) == folder_id:
+            del self._paths[old['path'].lower()]
+        self._search_list = None
+
+
+def index_key(url, domain, project):
+    """
+    Returns the key of the index of a project.
+    """
+    return '{}|{}|{}'.format(url.rstrip('/').lower(), domain.lower(),
+                             project.lower())
+
+
+def get_index_path(key, folder=None):
+    """
+    Returns the file the index with key is kept in.
+    """
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(folder or tempfile.gettempdir(),
+                        'qcri-lab-{}.json'.format(digest))
+
+
+def load_index(key, folder=None):
+    """
+    Returns the saved index with key, or an empty one.
+    """
+    filename = get_index_path(key, folder)
+    try:
+        with open(filename, 'r') as filed:
+            data = json.load(filed)
+    except (IOError, OSError, ValueError):
+        LOG.debug('no test lab index at: %s', filename)
+        return LabIndex(key)
+    if data.get('version') != FORMAT_VERSION or data.get('key') != key:
+        return LabIndex(key)
+    return LabIndex(key, data['folders'], data['updated'])
+
+
+def save_index(index, folder=None):
+    """
+    Save index to the temp directory, or folder if given.
+    """
+    filename = get_index_path(index.key, folder)
+    tmpname = filename + '.tmp'
+    with open(tmpname, 'w') as filed:
+        json.dump({
+            'version': FORMAT_VERSION,
+            'key': index.key,
+            'updated': index.updated,
+            'folders': index.folders
+        }, filed)
+    if os.path.exists(filename):
+        os.remove(filename)
+    os.rename(tmpname, filename)
+
+
+class Snapshot(object):
+    """
+    A snapshot of the Test Lab tree of qcc being taken breadth first, a few
+    folders per step so that other work can use the connection in between.
+    index is complete once step returns True.
+    """
+
+    def __init__(self, qcc, key):
+        self.index = LabIndex(key)
+        root = qcc.TestSetTreeManager.Root
+        self.index.update(root.NodeID, root.Name, None, ROOT)
+        self._pending = deque([root])
+        self._count = 0
+
+    @instrument.timed('labindex.snapshot_step')
+    def step(self, folders=20):
+        """
+        Index the subfolders of the next folders, returns True when done.
+        """
+        for _ in range(folders):
+            if not self._pending:
+                break
+            node = self._pending.popleft()
+            subnodes = list(node.SubNodes)
+            refresh_children(self.index, node.NodeID, subnodes)
+            self._pending.extend(subnodes)
+            self._count += len(subnodes)
+        if self._pending:
+            return False
+        if self.index.updated is None:
+            self.index.updated = time.time()
+            LOG.info('indexed %s test lab folders', self._count)
+        return True
+
+
+@instrument.timed('labindex.snapshot')
+def snapshot(qcc, key):
+    """
+    Returns a new index with key of the whole Test Lab tree of qcc, walked
+    breadth first.
+    """
+    walk = Snapshot(qcc, key)
+    while not walk.step():
+        pass
+    return walk.index
+
+
+def refresh_children(index, parent_id, subnodes):
+    """
+    Record subnodes, the QC folder nodes in the folder parent_id.
+    """
+    index.replace_children(
+        parent_id, [(node.NodeID, node.Name, node.Path) for node in subnodes])
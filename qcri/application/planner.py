@@ -0,0 +1,263 @@
+"""
+Planner
+
+Works out what importing test results would do in Quality Center before
+anything is written: the folders, tests, test sets and test instances that
+would be created, the runs created, updated or skipped and the steps
+posted, with an estimate of the calls and time it takes.
+
+The existing entities are fetched in bulk, one list per folder and test
+set instead of one lookup per test. They are kept in the plan's session,
+which import_results takes with plan= so the import doesn't look them up
+again.
+
+    plan = planner.make_plan(qcc, 'GroupA/SubGroup', tests, upsert='skip')
+    print(planner.format_plan(plan))
+    importer.import_results(qcc, 'GroupA/SubGroup', results, plan=plan)
+"""
+
+import logging
+import time
+
+from qcri.application import instrument
+from qcri.application import qualitycenter
+# pylint: disable=I0011, protected-access
+from qcri.application.qualitycenter import _to_lab_dir, _to_plan_dir
+
+
+LOG = logging.getLogger(__name__)
+
+# round-trips the import makes per entity it creates or updates, see
+# qualitycenter
+CALLS = {
+    'folder': 2,       # AddNode, Post
+    'test': 3,         # NewList, AddItem, Post
+    'test_set': 4,     # NewList, AddItem, Post, Refresh
+    'instance': 3,     # NewList, AddItem, NewList
+    'runs': 1,         # the runs of a new test set, when upserting
+    'run': 5,          # AddItem, Post, Refresh, Post, Refresh
+    'run_update': 3,   # Post, NewList of the steps, Refresh
+    'step': 4          # AddItem, Post, Refresh, Post
+}
+
+ENTITIES = ('folders', 'tests', 'test_sets', 'instances')
+
+
+@instrument.timed('plan.make_plan')
+def make_plan(qcc, qcdir, tests, upsert='off', attach_report=False,
+              connections=1):
+    """
+    Returns the plan of importing tests, a list of test results, to qcdir.
+
+        qcdir       - the destination given to import_results
+        upsert      - the upsert mode of the import
+        new         - {'folders', 'tests', 'test_sets', 'instances'} lists
+                      of the paths, (folder, name) and (folder, suite, name)
+                      of the entities to create
+        counts      - {entity: {'new', 'existing'}} of those and the runs
+                      {'new', 'updated', 'skipped'} and {'steps': {'new'}}
+        invalid     - names of the tests that can't be imported
+        calls       - the estimated round-trips of the import
+        latency     - the mean seconds per round-trip of the fetches, None
+                      if nothing was fetched
+        seconds     - the estimated time of the import, or None
+        session     - the entities found, for import_results
+    """
+    session = {}
+    plan = {
+        'qcdir': qcdir,
+        'upsert': upsert,
+        'new': dict((entity, []) for entity in ENTITIES),
+        'counts': dict((entity, {'new': 0, 'existing': 0})
+                       for entity in ENTITIES),
+        'invalid': [],
+        'calls': 0,
+        'latency': None,
+        'seconds': None,
+        'session': session
+    }
+    plan['counts']['runs'] = {'new': 0, 'updated': 0, 'skipped': 0}
+    plan['counts']['steps'] = {'new': 0}
+    timings = []
+
+    plan_dirs = {}
+    lab_dirs = {}
+    for test in tests:
+        if not test.get('suite'):
+            plan['invalid'].append(test['name'])
+            continue
+        plan_dir = _to_plan_dir(qcdir, test['subject'], test['suite'])
+        lab_dir = _to_lab_dir(qcdir, test['subject'])
+        plan_dirs.setdefault(plan_dir, set()).add(test['name'])
+        lab_dirs.setdefault(lab_dir, {}).setdefault(
+            test['suite'], []).append(test)
+
+    folders = set(plan_dirs) | set(lab_dirs)
+    new_folders = set()
+    for folder in sorted(folders):
+        new_folders.update(
+            qualitycenter.missing_folders(qcc, folder, session))
+    _count(plan, 'folders', sorted(new_folders),
+           len(folders - new_folders))
+
+    for fldr, names in sorted(plan_dirs.items()):
+        found = _fetch_tests(qcc, fldr, fldr in new_folders, session,
+                             timings)
+        _count(plan, 'tests', [(fldr, name) for name in sorted(names)
+                               if name not in found],
+               len(names & found))
+
+    for fldr, suites in sorted(lab_dirs.items()):
+        test_sets = _fetch_test_sets(qcc, fldr, fldr in new_folders, session,
+                                     timings)
+        for suite, suite_tests in sorted(suites.items()):
+            _plan_test_set(plan, qcc, fldr, suite, suite_tests,
+                           test_sets.get(suite), attach_report, timings)
+
+    counts = plan['counts']
+    plan['calls'] = (
+        CALLS['folder'] * counts['folders']['new'] +
+        CALLS['test'] * counts['tests']['new'] +
+        CALLS['test_set'] * counts['test_sets']['new'] +
+        CALLS['instance'] * counts['instances']['new'] +
+        CALLS['run'] * counts['runs']['new'] +
+        CALLS['run_update'] * counts['runs']['updated'] +
+        CALLS['step'] * counts['steps']['new'])
+    if upsert != 'off':
+        plan['calls'] += CALLS['runs'] * counts['test_sets']['new']
+    if timings:
+        plan['latency'] = sum(timings) / len(timings)
+        plan['seconds'] = (plan['calls'] * plan['latency'] /
+                           max(1, connections))
+    return plan
+
+
+def _count(plan, entity, new, existing):
+    plan['new'][entity].extend(new)
+    plan['counts'][entity]['new'] += len(new)
+    plan['counts'][entity]['existing'] += existing
+
+
+def _timed_list(factory, timings):
+    """
+    Returns factory.NewList(''), one round-trip, recording its time.
+    """
+    start = time.time()
+    items = factory.NewList('')
+    timings.append(time.time() - start)
+    return items
+
+
+def _fetch_tests(qcc, fldr, is_new, session, timings):
+    """
+    Returns the names of the tests in the test plan folder fldr, keeping
+    them in session.
+    """
+    if is_new:
+        return set()
+    folder = qualitycenter.get_qc_folder(qcc, fldr, create=False,
+                                         session=session)
+    cache = session.setdefault('tests', {})
+    names = set()
+    for testplan in _timed_list(folder.TestFactory, timings):
+        name = testplan.Field('TS_NAME')
+        names.add(name)
+        cache[(fldr.lower(), name)] = testplan
+    return names
+
+
+def _fetch_test_sets(qcc, fldr, is_new, session, timings):
+    """
+    Returns {name: test set} of the test lab folder fldr, keeping them in
+    session.
+    """
+    if is_new:
+        return {}
+    folder = qualitycenter.get_qc_folder(qcc, fldr, create=False,
+                                         session=session)
+    cache = session.setdefault('test_sets', {})
+    test_sets = {}
+    for testset in _timed_list(folder.TestSetFactory, timings):
+        name = testset.Field('CY_CYCLE')
+        test_sets[name] = testset
+        cache[(fldr.lower(), name)] = testset
+    return test_sets
+
+
+def _plan_test_set(plan, qcc, fldr, suite, tests, testset, attach_report,
+                   timings):
+    session = plan['session']
+    upsert = plan['upsert']
+    instances = {}
+    runs = {}
+    if testset is None:
+        _count(plan, 'test_sets', [(fldr, suite)], 0)
+    else:
+        _count(plan, 'test_sets', [], 1)
+        cache = session.setdefault('instances', {})
+        for instance in _timed_list(testset.TsTestFactory, timings):
+            name = instance.TestName
+            instances[name] = instance
+            cache[(fldr.lower(), suite, name)] = instance
+        if upsert != 'off':
+            start = time.time()
+            runs = qualitycenter.get_test_set_runs(qcc, testset.ID, session)
+            timings.append(time.time() - start)
+
+    names = set(test['name'] for test in tests)
+    _count(plan, 'instances',
+           [(fldr, suite, name) for name in sorted(names)
+            if name not in instances],
+           len([name for name in names if name in instances]))
+
+    extra_steps = 1 if attach_report else 0
+    for test in tests:
+        steps = test['steps']
+        instance = instances.get(test['name'])
+        existing = None
+        if (upsert != 'off' and instance is not None and
+                test.get('exec_date') and test.get('exec_time')):
+            existing = runs.get((instance.ID, qualitycenter.run_name(
+                test.get('exec_date'), test.get('exec_time'))))
+        if existing is not None:
+            if existing[1] == qualitycenter.test_fingerprint(test):
+                plan['counts']['runs']['skipped'] += 1
+                continue
+            if upsert == 'update':
+                plan['counts']['runs']['updated'] += 1
+                plan['counts']['steps']['new'] += len(steps) + extra_steps
+                continue
+        plan['counts']['runs']['new'] += 1
+        plan['counts']['steps']['new'] += len(steps) + extra_steps
+
+
+def format_plan(plan):
+    """
+    Returns the plan as text: the entities to create, one per line, then
+    the counts and estimates.
+    """
+    lines = ['Plan of the import to {}:'.format(plan['qcdir'])]
+    for path in plan['new']['folders']:
+        lines.append('+ folder    {}'.format(path))
+    for fldr, suite in plan['new']['test_sets']:
+        lines.append('+ test set  {}: {}'.format(fldr, suite))
+    for fldr, name in plan['new']['tests']:
+        lines.append('+ test      {}: {}'.format(fldr, name))
+    for name in plan['invalid']:
+        lines.append('! no suite  {}'.format(name))
+    lines.append('')
+    lines.append('{:<12}{:>8}{:>10}'.format('', 'new', 'existing'))
+    for entity in ENTITIES:
+        counts = plan['counts'][entity]
+        lines.append('{:<12}{:>8}{:>10}'.format(
+            entity.replace('_', ' '), counts['new'], counts['existing']))
+    runs = plan['counts']['runs']
+    lines.append('runs: {new} new, {updated} updated, {skipped} '
+                 'skipped'.format(**runs))
+    lines.append('steps: {} new'.format(plan['counts']['steps']['new']))
+    if plan['seconds'] is None:
+        lines.append('About {} calls.'.format(plan['calls']))
+    else:
+        lines.append('About {} calls, {:.0f}s at {:.3f}s per call.'.format(
+            plan['calls'], plan['seconds'], plan['latency']))
+    return '\n'.join(lines)
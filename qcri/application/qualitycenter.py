@@ -24,19 +24,225 @@ tests:
 # pylint: disable=I0011, no-member
 
 from datetime import datetime
-import fnmatch
+import functools
+import hashlib
+import json
 import logging
 import os
+import random
 import tempfile
-import zipfile
-import pywintypes
-from win32com.client import Dispatch
+import threading
+import time
+
+from qcri.application import archive
+from qcri.application import idcache
+from qcri.application import instrument
+from qcri.application import throttle
+
+try:
+    from pywintypes import com_error
+except ImportError:
+    # pywin32 only exists on Windows. Nothing can raise a COM error without
+    # it, but the module stays importable on parse-only hosts.
+    class com_error(Exception):  # pylint: disable=I0011, invalid-name
+        """
+        Stands in for pywintypes.com_error where pywin32 is unavailable.
+        """
+        pass
 
 
 LOG = logging.getLogger(__name__)
 
 TDATT_FILE = 1  # data file attachment.
 
+# attempts of an operation failing with a transient COM error, and the
+# base and maximum backoff between them in seconds
+RETRIES = 3
+BACKOFF = 1.0
+MAX_BACKOFF = 30.0
+
+# an error with one of these messages means the session is gone, retrying
+# on the same session cannot help
+SESSION_ERRORS = (
+    'session timed out',
+    'session has timed out',
+    'session expired',
+    'session has expired',
+    'you are not logged in',
+    'user is not logged in',
+    'not connected to server',
+    'project is not connected',
+    'server has been disconnected'
+)
+# the HRESULTs of a COM server, the OTA client or the RPC link to it, that
+# went away: RPC_E_DISCONNECTED, RPC_S_SERVER_UNAVAILABLE,
+# RPC_S_CALL_FAILED
+SESSION_HRESULTS = (-2147417848, -2147023174, -2147023170)
+
+# paces the operations sent to the server, see configure
+LIMITER = throttle.AdaptiveLimiter()
+# sessions an import uses by default
+CONNECTIONS = 1
+
+# where report archives are made before they are attached, None for the
+# temp directory
+ATTACHMENT_DIR = None
+
+# the ids of the test sets, tests and test instances resolved by earlier
+# imports, see configure; None to always look them up
+ID_CACHE = None
+
+# what importing a result that already has a run does, see
+# import_test_result
+UPSERT_MODES = ('off', 'skip', 'update')
+UPSERT = 'off'
+# the fingerprint of a run whose update didn't complete, never that of a
+# result
+PARTIAL = 'partial'
+# the status and duration of a parsed test that has none
+DEFAULT_STATUS = 'Failed'
+DEFAULT_DURATION = '0'
+
+# the _Login of the connections made by connect, for reconnect and clone
+_LOGINS = {}
+_RETRY_STATE = threading.local()
+# creating the same folder, test or test set from two connections at once
+# would make duplicates. Lookups that may create hold the lock their key
+# hashes to; they never hold two at once.
+_CREATE_LOCKS = [threading.Lock() for _ in range(64)]
+
+
+def configure(cfg):
+    """
+    Apply the [qualitycenter] section of the config:
+
+        max_operations_per_second - retried operations started per
+                                    second, 0 for no limit; one may make
+                                    several server requests
+        connections               - sessions an import may use in
+                                    parallel, the most operations in flight
+        upsert                    - off, skip or update, see
+                                    import_test_result
+        attachment_dir            - where report archives are made, empty
+                                    for the temp directory
+        id_cache_ttl              - seconds the ids of entities are kept
+                                    for later imports, 0 not to keep them
+    """
+    # pylint: disable=I0011, global-statement
+    global CONNECTIONS, UPSERT, ATTACHMENT_DIR, ID_CACHE
+    section = 'qualitycenter'
+    if not cfg.has_section(section):
+        return
+    LIMITER.max_rate = cfg.getfloat(
+        section, 'max_operations_per_second', fallback=0)
+    CONNECTIONS = max(1, cfg.getint(section, 'connections', fallback=1))
+    LIMITER.max_concurrency = CONNECTIONS
+    upsert = cfg.get(section, 'upsert', fallback='off').lower()
+    if upsert not in UPSERT_MODES:
+        raise ValueError('invalid upsert mode: {}'.format(upsert))
+    UPSERT = upsert
+    ATTACHMENT_DIR = cfg.get(section, 'attachment_dir', fallback='') or None
+    ttl = cfg.getfloat(section, 'id_cache_ttl', fallback=0)
+    if ID_CACHE is not None and ID_CACHE.ttl != ttl:
+        ID_CACHE.close()
+        ID_CACHE = None
+    if ttl > 0 and ID_CACHE is None:
+        ID_CACHE = idcache.open_cache(ttl)
+
+
+def is_session_error(ex):
+    """
+    Returns True if the error means the QC session expired or was lost.
+    OTA reports its errors as DISP_E_EXCEPTION with the server's code and
+    message in the excepinfo, so both the error and the excepinfo codes
+    are checked.
+    """
+    args = getattr(ex, 'args', ())
+    codes = [args[0]] if args else []
+    if len(args) > 2 and args[2]:
+        # (wcode, source, description, helpfile, helpcontext, scode)
+        codes.append(args[2][-1])
+    if any(code in SESSION_HRESULTS for code in codes):
+        return True
+    text = str(ex).lower()
+    return any(err in text for err in SESSION_ERRORS)
+
+
+def retried(func):
+    """
+    Decorator retrying an idempotent operation on transient COM errors, with
+    jittered exponential backoff. Session errors are raised at once for the
+    caller to reconnect. Only the outermost retried operation retries, so
+    nested operations don't multiply the attempts.
+
+    Every attempt takes a slot from LIMITER, so it is paced and counts
+    towards the server load; its latency is compared with that of the
+    other attempts of func only.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if getattr(_RETRY_STATE, 'active', False):
+            return func(*args, **kwargs)
+        _RETRY_STATE.active = True
+        try:
+            attempt = 1
+            while True:
+                try:
+                    return _limited(func, args, kwargs)
+                except com_error as ex:
+                    if attempt >= RETRIES or is_session_error(ex):
+                        raise
+                    delay = _backoff(attempt)
+                    LOG.warning('%s failed (attempt %s of %s), retrying in '
+                                '%.1fs: %s', func.__name__, attempt, RETRIES,
+                                delay, ex)
+                    with instrument.span('qc.retry'):
+                        time.sleep(delay)
+                    attempt += 1
+        finally:
+            _RETRY_STATE.active = False
+    return wrapper
+
+
+def _limited(func, args, kwargs):
+    start = LIMITER.acquire()
+    error = False
+    try:
+        return func(*args, **kwargs)
+    except com_error:
+        # only server errors are a sign of load
+        error = True
+        raise
+    finally:
+        LIMITER.release(start, error, func.__name__)
+
+
+def _creation_lock(*key):
+    return _CREATE_LOCKS[hash(key) % len(_CREATE_LOCKS)]
+
+
+def _backoff(attempt):
+    delay = min(MAX_BACKOFF, BACKOFF * 2 ** (attempt - 1))
+    return delay * random.uniform(0.5, 1.5)
+
+
+class _Login(object):
+    """
+    Logs connections in to a project. The username and password are only
+    held by the log_in closure; url, domain and project name the project.
+    """
+
+    def __init__(self, url, domain, project, username, password):
+        self.url = url
+        self.domain = domain
+        self.project = project
+
+        def log_in(qcc):
+            qcc.InitConnectionEx(url)
+            qcc.Login(username, password)
+            qcc.Connect(domain, project)
+        self.log_in = log_in
+
 
 def connect(
         url='',
@@ -48,15 +254,77 @@ def connect(
     """
     Return a connection to Quality Center using the given credentials.
     """
+    return _connect(_Login(url, domain, project, username, password))
+
+
+@instrument.timed('qc.connect')
+def _connect(login):
+    # win32com is slow to import, only load it once a connection is needed
+    from win32com.client import Dispatch
     LOG.info("Connecting to Quality Center...")
     qcc = Dispatch("TDApiole80.TDConnection")
-    qcc.InitConnectionEx(url)
-    qcc.Login(username, password)
-    qcc.Connect(domain, project)
+    login.log_in(qcc)
     LOG.info('Connected to Quality Center')
+    _LOGINS[id(qcc)] = login
     return qcc
 
 
+@instrument.timed('qc.reconnect')
+def reconnect(qcc):
+    """
+    Log the connection in again after its session expired. Only connections
+    made by connect can be reconnected; returns False for any other.
+    """
+    login = _LOGINS.get(id(qcc))
+    if login is None:
+        return False
+    LOG.info('Reconnecting to Quality Center...')
+    try:
+        if qcc.Connected:
+            qcc.Disconnect()
+        qcc.Logout()
+    except com_error as ex:
+        LOG.debug('ignoring error closing the expired session: %s', ex)
+    login.log_in(qcc)
+    LOG.info('Reconnected to Quality Center')
+    return True
+
+
+def clone(qcc):
+    """
+    Returns a new connection logged in like qcc, for use on the calling
+    thread, or None if qcc wasn't made by connect.
+    """
+    login = _LOGINS.get(id(qcc))
+    if login is None:
+        return None
+    return _connect(login)
+
+
+def init_thread():
+    """
+    Prepare the calling thread for COM, needed before a thread other than
+    the main one makes a connection. Call uninit_thread when done.
+    """
+    try:
+        import pythoncom
+    except ImportError:
+        return
+    pythoncom.CoInitialize()
+
+
+def uninit_thread():
+    """
+    Undo init_thread.
+    """
+    try:
+        import pythoncom
+    except ImportError:
+        return
+    pythoncom.CoUninitialize()
+
+
+@instrument.timed('qc.disconnect')
 def disconnect(qcc):
     """
     Make sure the quality center connection is closed
@@ -66,12 +334,14 @@ def disconnect(qcc):
     if not qcc.Connected:
         LOG.info('Already disconnected from Quality Center.')
         return
+    _LOGINS.pop(id(qcc), None)
     qcc.Disconnect()
     qcc.Logout()
     qcc.ReleaseConnection()
     LOG.info('Disconnected from Quality Center.')
 
 
+@instrument.timed('qc.create_folder')
 def create_folder(parent, name):
     """
     Create a Quality Center folder.
@@ -80,15 +350,21 @@ def create_folder(parent, name):
         child = parent.AddNode(name)
         child.Post()
         return child
-    except pywintypes.com_error as ex:
+    except com_error as ex:
         LOG.error('error creating folder: %s', name)
         LOG.exception(ex)
         raise
 
 
-def get_qc_folder(qcc, folder, create=True):
+@instrument.timed('qc.get_qc_folder')
+@retried
+def get_qc_folder(qcc, folder, create=True, session=None):
     """
     Returns a QC folder. If create=True, create subdirectories if don't exist.
+
+    Missing folders are created below the deepest existing one, which is
+    found by bisecting the path. Folders found or created are kept in
+    session; pass the same dict for all the tests of an import.
     """
     # check if folder is in tests lab or tests plan by seeing if it starts with
     # 'Root' (plan) or 'Subject' (lab).
@@ -99,26 +375,94 @@ def get_qc_folder(qcc, folder, create=True):
     else:
         raise ValueError(folder)
 
-    # if folder is there return it, otherwise walk path from root creating
-    # folders if needed
-    child = None
+    if session is None:
+        session = {}
+    cache = session.setdefault('folders', {})
+    child = cache.get(folder.lower())
+    if child is not None:
+        return child
+    child = _node_by_path(treemgr, folder, cache)
+    if child is not None or not create:
+        return child
+
+    LOG.debug('folder not found, creating folder structure...')
+    folders = folder.split('\\')
+    while True:
+        depth, parent = _deepest_folder(treemgr, folders, cache)
+        missing = '\\'.join(folders[:depth + 1])
+        # folders are created rarely, creating one tree's at a time keeps a
+        # tail from being created twice by sessions starting at different
+        # depths
+        with _creation_lock('folder', folders[0]):
+            # another session may have made it since it was looked up
+            child = _node_by_path(treemgr, missing, cache)
+            if child is not None:
+                if depth + 1 == len(folders):
+                    return child
+                continue
+            for idx in range(depth, len(folders)):
+                LOG.debug('folder not found. creating: %s', folders[idx])
+                parent = create_folder(parent, folders[idx])
+                cache['\\'.join(folders[:idx + 1]).lower()] = parent
+        return parent
+
+
+def missing_folders(qcc, folder, session=None):
+    """
+    Returns the paths of the folders get_qc_folder would create for folder,
+    parents first; none if it exists.
+    """
+    if get_qc_folder(qcc, folder, create=False, session=session) is not None:
+        return []
+    treemgr = (qcc.TestSetTreeManager if folder.startswith('Root')
+               else qcc.TreeManager)
+    folders = folder.split('\\')
+    cache = session.setdefault('folders', {}) if session is not None else {}
+    depth, _ = _deepest_folder(treemgr, folders, cache)
+    return ['\\'.join(folders[:idx + 1])
+            for idx in range(depth, len(folders))]
+
+
+def _node_by_path(treemgr, path, cache):
+    """
+    Returns the folder at path or None, caching it.
+    """
     try:
-        child = treemgr.NodeByPath(folder)
-    except pywintypes.com_error:
-        if not create:
-            return None
-        LOG.debug('folder not found, creating folder structure...')
-        folders = folder.split('\\')
-        for i in range(len(folders)-1):
-            try:
-                child = treemgr.NodeByPath('\\'.join(folders[:i+2]))
-            except pywintypes.com_error:
-                LOG.debug('folder not found. creating: %s', folders[i+1])
-                parent = treemgr.NodeByPath('\\'.join(folders[:i+1]))
-                child = create_folder(parent, folders[i+1])
-    return child
+        node = treemgr.NodeByPath(path)
+    except com_error:
+        return None
+    cache[path.lower()] = node
+    return node
 
 
+def _deepest_folder(treemgr, folders, cache):
+    """
+    Returns (depth, node) of the deepest existing folder on the path of
+    folders, the whole path being missing. Takes O(log depth) lookups.
+    """
+    # the root always exists, and so do the folders in the cache
+    low = 1
+    for depth in range(len(folders) - 1, 1, -1):
+        if '\\'.join(folders[:depth]).lower() in cache:
+            low = depth
+            break
+    high = len(folders)
+    while high - low > 1:
+        mid = (low + high) // 2
+        if _node_by_path(treemgr, '\\'.join(folders[:mid]), cache) is None:
+            high = mid
+        else:
+            low = mid
+    path = '\\'.join(folders[:low])
+    node = cache.get(path.lower())
+    if node is None:
+        node = treemgr.NodeByPath(path)
+        cache[path.lower()] = node
+    return low, node
+
+
+@instrument.timed('qc.get_subdirectories')
+@retried
 def get_subdirectories(qcnode):
     """
     Return a list of refs to sub-directories of given qcnode.
@@ -130,103 +474,302 @@ def get_subdirectories(qcnode):
     return subdirectories
 
 
+@instrument.timed('qc.find_test_instance')
+@retried
+def find_test_instance(qcc, qcdir, subject='', suite='', name='',
+                       session=None):
+    """
+    Returns the TsTestInstance if it is in session or ID_CACHE, fetched by
+    id, otherwise None; make_test_plan and make_test_instance look it up.
+    """
+    fldr = _to_lab_dir(qcdir, subject)
+    if session is None:
+        session = {}
+    key = (fldr.lower(), suite, name)
+    testinstance = session.setdefault('instances', {}).get(key)
+    if testinstance is not None:
+        return testinstance
+    test_sets = session.setdefault('test_sets', {})
+    testset = test_sets.get(key[:2])
+    if testset is None:
+        testset = _cached_test_set(qcc, key[:2])
+        if testset is None:
+            return None
+        test_sets[key[:2]] = testset
+    testinstance = _cached(
+        qcc, 'instance', key, lambda: testset.TsTestFactory,
+        lambda item, _: (item.TestName == name and
+                         str(item.Field('TC_CYCLE_ID')) == str(testset.ID)))
+    if testinstance is not None:
+        session['instances'][key] = testinstance
+    return testinstance
+
+
+def _cache_scope(qcc):
+    """
+    Returns the ID_CACHE scope of qcc, None without a cache or for a
+    connection not made by connect.
+    """
+    login = _LOGINS.get(id(qcc))
+    if ID_CACHE is None or login is None:
+        return None
+    return idcache.scope_key(login.url, login.domain, login.project)
+
+
+def _cached_test_set(qcc, key):
+    """
+    Returns the test set of key, (folder, suite), if its id is cached and
+    it is still in the folder it was cached in; a test set moved or copied
+    elsewhere keeps its id and name.
+    """
+    return _cached(qcc, 'test_set', key, lambda: qcc.TestSetFactory,
+                   lambda item, folder_id: (
+                       item.Field('CY_CYCLE') == key[1] and
+                       str(item.Field('CY_FOLDER_ID')) == folder_id))
+
+
+def _cached_test(qcc, key):
+    """
+    Returns the test of key, (folder, name), if its id is cached and it is
+    still in the plan folder it was cached in.
+    """
+    return _cached(qcc, 'test', key, lambda: qcc.TestFactory,
+                   lambda item, folder_id: (
+                       item.Field('TS_NAME') == key[1] and
+                       _node_id(item.Field('TS_SUBJECT')) == folder_id))
+
+
+def _node_id(node):
+    # TS_SUBJECT is the folder itself, not its id
+    return str(getattr(node, 'NodeID', node))
+
+
+def _cache_test_set(qcc, key, testset):
+    _cache_id(qcc, 'test_set', key, testset, testset.Field('CY_FOLDER_ID'))
+
+
+def _cached(qcc, kind, key, factory, valid):
+    """
+    Returns the entity whose id ID_CACHE has for kind and key, fetched from
+    factory(), or None. The id is dropped if the fetch fails or the entity
+    isn't valid(entity, extra) any more, extra being what was cached with
+    the id by _cache_id.
+    """
+    scope = _cache_scope(qcc)
+    if scope is None:
+        return None
+    cached = ID_CACHE.get(scope, kind, key)
+    if cached is None:
+        return None
+    entity_id, _, extra = cached.partition('/')
+    try:
+        entity = factory().Item(int(entity_id))
+    except com_error as ex:
+        if is_session_error(ex):
+            raise
+        entity = None
+    if entity is None or not valid(entity, extra):
+        LOG.debug('dropping stale %s id: %s', kind, key)
+        ID_CACHE.discard(scope, kind, key)
+        return None
+    return entity
+
+
+def _cache_id(qcc, kind, key, entity, extra=None):
+    scope = _cache_scope(qcc)
+    if scope is not None:
+        entity_id = str(entity.ID)
+        if extra is not None:
+            entity_id = '{}/{}'.format(entity_id, extra)
+        ID_CACHE.put(scope, kind, key, entity_id)
+
+
+@instrument.timed('qc.make_test_instance')
+@retried
 def make_test_instance(
         qcc,
         qcdir,
         testplan,
         subject='',
         suite='',
-        name=''
+        name='',
+        session=None
 ):
     """
     Create a TsTestInstance in QC.
+
+    Test sets and instances found or created are kept in session, like
+    folders.
     """
     if not suite:
         LOG.error('suite cannot be empty')
         return
     fldr = _to_lab_dir(qcdir, subject)
-    folder = get_qc_folder(qcc, fldr)
+    if session is None:
+        session = {}
+    instances = session.setdefault('instances', {})
+    key = (fldr.lower(), suite, name)
+    testinstance = instances.get(key)
+    if testinstance is not None:
+        return testinstance
+    test_sets = session.setdefault('test_sets', {})
+    testset = test_sets.get(key[:2])
+    if testset is None:
+        testset = _cached_test_set(qcc, key[:2])
+    if testset is None:
+        testset = _make_test_set(qcc, fldr, suite, session)
+        _cache_test_set(qcc, key[:2], testset)
+    test_sets[key[:2]] = testset
 
+    test_instance_factory = testset.TsTestFactory
+    test_instance_filter = test_instance_factory.Filter
+    test_instance_filter.Clear()
+    test_instance_filter["TSC_NAME"] = '"{}"'.format(name)
+    with _creation_lock('instance', fldr.lower(), suite, name):
+        test_instance_list = test_instance_factory.NewList(
+            test_instance_filter.Text)
+        if len(test_instance_list) == 0:
+            test_instance_factory.AddItem(testplan)
+            test_instance_list = test_instance_factory.NewList(
+                test_instance_filter.Text)
+
+    testinstance = instances[key] = test_instance_list(1)
+    _cache_id(qcc, 'instance', key, testinstance)
+    return testinstance
+
+
+def _make_test_set(qcc, fldr, suite, session):
+    """
+    Returns the test set named suite in the folder fldr, created if needed.
+    """
+    folder = get_qc_folder(qcc, fldr, session=session)
     test_set_factory = folder.TestSetFactory
     test_set_filter = test_set_factory.Filter
     test_set_filter.Clear()
     test_set_filter["CY_CYCLE"] = '"{}"'.format(suite)
-    test_set_list = test_set_factory.NewList(test_set_filter.Text)
-    if len(test_set_list) > 0:
-        testset = test_set_list(1)
-    else:
+    with _creation_lock('testset', fldr.lower(), suite):
+        test_set_list = test_set_factory.NewList(test_set_filter.Text)
+        if len(test_set_list) > 0:
+            return test_set_list(1)
         testset = test_set_factory.AddItem(None)
         testset.Name = suite
         testset.Post()
         testset.Refresh()
-
-    test_instance_factory = testset.TsTestFactory
-    test_instance_filter = test_instance_factory.Filter
-    test_instance_filter.Clear()
-    test_instance_filter["TSC_NAME"] = '"{}"'.format(name)
-    test_instance_list = test_instance_factory.NewList(
-        test_instance_filter.Text)
-    if len(test_instance_list) == 0:
-        test_instance_factory.AddItem(testplan)
-        test_instance_list = test_instance_factory.NewList(
-            test_instance_filter.Text)
-
-    return test_instance_list(1)
+    return testset
 
 
+@instrument.timed('qc.make_test_plan')
+@retried
 def make_test_plan(
         qcc,
         qcdir,
         subject='',
         suite='',
         name='',
-        description=''
+        description='',
+        session=None
 ):
     """
     Create a TestInstance in QC.
+
+    Tests found or created are kept in session, like folders.
     """
     fldr = _to_plan_dir(qcdir, subject, suite)
-    folder = get_qc_folder(qcc, fldr)
+    if session is None:
+        session = {}
+    tests = session.setdefault('tests', {})
+    key = (fldr.lower(), name)
+    testplan = tests.get(key)
+    if testplan is not None:
+        return testplan
+    testplan = _cached_test(qcc, key)
+    if testplan is not None:
+        tests[key] = testplan
+        return testplan
+    folder = get_qc_folder(qcc, fldr, session=session)
     test_factory = folder.TestFactory
     test_filter = test_factory.Filter
     test_filter["TS_NAME"] = '"{}"'.format(name)
-    test_list = test_filter.NewList()
-    if len(test_list) > 0:
-        testplan = test_list(1)
-    else:
-        testplan = test_factory.AddItem(name)
-        testplan.SetField("TS_DESCRIPTION", description)
-        testplan.SetField("TS_STATUS", "Ready")
-        testplan.SetField("TS_TYPE", "QUICKTEST_TEST")
-        testplan.Post()
+    with _creation_lock('test', fldr.lower(), name):
+        test_list = test_filter.NewList()
+        if len(test_list) > 0:
+            testplan = test_list(1)
+        else:
+            testplan = test_factory.AddItem(name)
+            testplan.SetField("TS_DESCRIPTION", description)
+            testplan.SetField("TS_STATUS", "Ready")
+            testplan.SetField("TS_TYPE", "QUICKTEST_TEST")
+            testplan.Post()
+    tests[key] = testplan
+    _cache_id(qcc, 'test', key, testplan, folder.NodeID)
     return testplan
 
 
+@instrument.timed('qc.make_test_run')
+@retried
 def make_test_run(
         testinstance,
         exec_date='',
         exec_time='',
         duration='0',
-        status='Passed'
+        status='Passed',
+        name=None,
+        session=None
 ):
     """
-    Create a RunInstance in QC.
+    Create a RunInstance in QC, named 'Run <now>' unless name is given.
+
+    The run is recorded as session['partial_run'] from when it exists; the
+    caller pops it once the run is complete, see discard_partial_run.
     """
-    run = testinstance.RunFactory.AddItem("Run {}".format(datetime.now()))
-    run.Status = status
-    run.SetField('RN_DURATION', duration)
-    run.SetField('RN_EXECUTION_DATE', exec_date)
-    run.SetField('RN_EXECUTION_TIME', exec_time)
-    run.Post()
-    run.Refresh()
-    # do again, otherwise not showing in QC
-    run.SetField('RN_EXECUTION_DATE', exec_date)
-    run.SetField('RN_EXECUTION_TIME', exec_time)
-    run.Post()
-    run.Refresh()
+    run_factory = testinstance.RunFactory
+    run = run_factory.AddItem(name or "Run {}".format(datetime.now()))
+    if session is not None:
+        session['partial_run'] = ('created', run.ID, None)
+    try:
+        run.Status = status
+        run.SetField('RN_DURATION', duration)
+        run.SetField('RN_EXECUTION_DATE', exec_date)
+        run.SetField('RN_EXECUTION_TIME', exec_time)
+        run.Post()
+        run.Refresh()
+        # do again, otherwise not showing in QC
+        run.SetField('RN_EXECUTION_DATE', exec_date)
+        run.SetField('RN_EXECUTION_TIME', exec_time)
+        run.Post()
+        run.Refresh()
+    except com_error as ex:
+        if not is_session_error(ex):
+            # don't leave a half made run behind when retried
+            _remove_item(run_factory, run)
+            if session is not None:
+                session.pop('partial_run', None)
+        raise
     return run
 
 
+@instrument.timed('qc.discard_partial_run')
+@retried
+def discard_partial_run(qcc, partial_run):
+    """
+    Undo the run an import left incomplete when its session expired, on the
+    new session. partial_run is the session['partial_run'] of
+    import_test_result: a created run is removed, an updated one renamed
+    so that importing the result again updates it again.
+    """
+    action, run_id, base_name = partial_run
+    run_factory = qcc.RunFactory
+    if action == 'created':
+        LOG.info('removing incomplete run: %s', run_id)
+        run_factory.RemoveItem(run_id)
+        return
+    LOG.info('marking incomplete run: %s', run_id)
+    run = run_factory.Item(run_id)
+    run.Name = '{} [{}]'.format(base_name, PARTIAL)
+    run.Post()
+
+
+@instrument.timed('qc.import_test_result')
 def import_test_result(
         qcc,
         qcdir,
@@ -239,79 +782,290 @@ def import_test_result(
         duration='0',
         status='Passed',
         steps=None,
-        bug='0'
+        bug='0',
+        upsert='off',
+        fingerprint=None,
+        session=None
 ):
     """
     Import test results to Quality Center.
+
+    upsert decides what happens when the test instance already has a run
+    executed at exec_date and exec_time; a result without both always adds
+    a new run:
+
+        off     - always add a new run
+        skip    - add a new run unless the existing one has the same result
+        update  - update the existing run and replace its steps, unless it
+                  has the same result
+
+    The result is identified by fingerprint, by default a hash of status,
+    duration and steps. Runs are looked up in the run index of session,
+    which is filled with all the runs of a test set at once, and folders in
+    its folder cache; pass the same dict for all the tests of an import.
+
+    Until the run and its steps are complete it is recorded in session as
+    'partial_run', for the caller to discard_partial_run if the session
+    expires on the way.
+
+    Returns 'created', 'updated' or 'skipped', or False on error.
     """
-    testplan = make_test_plan(qcc, qcdir, subject, suite, name, description)
-    testinstance = make_test_instance(
-        qcc, qcdir, testplan, subject, suite, name)
+    if session is None:
+        session = {}
+    # the test is only needed to make the instance
+    testinstance = None
+    if suite:
+        testinstance = find_test_instance(
+            qcc, qcdir, subject, suite, name, session)
+    if testinstance is None:
+        testplan = make_test_plan(
+            qcc, qcdir, subject, suite, name, description, session)
+        testinstance = make_test_instance(
+            qcc, qcdir, testplan, subject, suite, name, session)
     if testinstance is None:
         LOG.error('error creating test instance')
         return False
-    testrun = make_test_run(
-        testinstance, exec_date, exec_time, duration, status)
+
+    if upsert != 'off' and not (exec_date and exec_time):
+        # runs are matched by their execution, an undated one is always new
+        LOG.warning('no execution date and time, adding a new run of: %s',
+                    name)
+        upsert = 'off'
+    if upsert == 'off':
+        testrun = make_test_run(
+            testinstance, exec_date, exec_time, duration, status,
+            session=session)
+        outcome = 'created'
+    else:
+        if fingerprint is None:
+            fingerprint = result_fingerprint(status, duration, steps)
+        base_name = run_name(exec_date, exec_time)
+        runs = get_run_index(qcc, testinstance, session)
+        existing = runs.get((testinstance.ID, base_name))
+        if existing is not None and existing[1] == fingerprint:
+            LOG.info('skipping unchanged run of: %s', name)
+            return 'skipped'
+        full_name = '{} [{}]'.format(base_name, fingerprint)
+        if existing is not None and upsert == 'update':
+            session['partial_run'] = ('updated', existing[0].ID, base_name)
+            testrun = update_test_run(
+                existing[0], exec_date, exec_time, duration, status,
+                full_name)
+            outcome = 'updated'
+        else:
+            testrun = make_test_run(
+                testinstance, exec_date, exec_time, duration, status,
+                full_name, session)
+            outcome = 'created'
+        runs[(testinstance.ID, base_name)] = (testrun, fingerprint)
 
     if steps:
-        for step in steps:
-            runstep = testrun.StepFactory.AddItem(None)
-            runstep.SetField('ST_STEP_NAME', step['name'])
-            runstep.SetField('ST_STATUS', step['status'])
-            runstep.SetField('ST_DESCRIPTION', step.get('description', ''))
-            runstep.SetField('ST_EXPECTED', step.get('expected', ''))
-            runstep.SetField('ST_ACTUAL', step.get('actual', ''))
-            runstep.SetField('ST_EXECUTION_DATE', step.get('exec_date', ''))
-            runstep.SetField('ST_EXECUTION_TIME', step.get('exec_time', ''))
-            runstep.Post()
-            # not seeing the step without a Refresh and Post here
-            runstep.Refresh()
-            runstep.Post()
+        _post_steps(testrun, steps)
 
     if int(bug):
         LOG.info('linking bug: %s', bug)
         link_bug(qcc, testinstance, bug)
 
-    return True
+    session.pop('partial_run', None)
+    return outcome
+
+
+def run_name(exec_date, exec_time):
+    """
+    Returns the name of the run of a result executed at exec_date and
+    exec_time, without its fingerprint.
+    """
+    return 'Run {} {}'.format(exec_date or '', exec_time or '').strip()
+
+
+def test_fingerprint(test):
+    """
+    Returns the result_fingerprint of test, a parsed test, with the status
+    and duration the importer gives a test that has none.
+    """
+    return result_fingerprint(
+        test.get('status', DEFAULT_STATUS),
+        test.get('duration', DEFAULT_DURATION),
+        test['steps'])
+
+
+def result_fingerprint(status, duration, steps):
+    """
+    Returns a short hash identifying a test result.
+    """
+    keys = ('name', 'status', 'description', 'expected', 'actual',
+            'exec_date', 'exec_time')
+    data = [status, str(duration)]
+    for step in steps or ():
+        data.append([step.get(key, '') for key in keys])
+    text = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:12]
 
 
+def get_run_index(qcc, testinstance, session=None):
+    """
+    Returns {(test instance id, run name): (run, fingerprint)} of the runs
+    imported by qcri in the test set of testinstance. The index is kept in
+    session and the runs of each test set are only listed once.
+    """
+    return get_test_set_runs(qcc, testinstance.Field('TC_CYCLE_ID'), session)
+
+
+def get_test_set_runs(qcc, cycle_id, session=None):
+    """
+    Returns the run index of get_run_index for the test set cycle_id.
+    """
+    if session is None:
+        session = {}
+    indexes = session.setdefault('runs', {})
+    index = indexes.get(cycle_id)
+    if index is None:
+        index = indexes[cycle_id] = _list_runs(qcc, cycle_id)
+    return index
+
+
+@instrument.timed('qc.list_runs')
+@retried
+def _list_runs(qcc, cycle_id):
+    run_factory = qcc.RunFactory
+    run_filter = run_factory.Filter
+    run_filter.Clear()
+    run_filter['RN_CYCLE_ID'] = str(cycle_id)
+    index = {}
+    for run in run_factory.NewList(run_filter.Text):
+        base_name, _, fingerprint = run.Name.rpartition(' [')
+        if not base_name or not fingerprint.endswith(']'):
+            # not upserted by qcri
+            continue
+        key = (run.Field('RN_TESTCYCL_ID'), base_name)
+        index[key] = (run, fingerprint[:-1])
+    return index
+
+
+@instrument.timed('qc.update_test_run')
+@retried
+def update_test_run(
+        run,
+        exec_date='',
+        exec_time='',
+        duration='0',
+        status='Passed',
+        name=None
+):
+    """
+    Update a RunInstance in QC and remove its steps.
+    """
+    if name:
+        run.Name = name
+    run.Status = status
+    run.SetField('RN_DURATION', duration)
+    run.SetField('RN_EXECUTION_DATE', exec_date)
+    run.SetField('RN_EXECUTION_TIME', exec_time)
+    run.Post()
+    step_factory = run.StepFactory
+    for step in step_factory.NewList(''):
+        step_factory.RemoveItem(step.ID)
+    run.Refresh()
+    return run
+
+
+@instrument.timed('qc.post_steps')
+def _post_steps(testrun, steps):
+    for step in steps:
+        _post_step(testrun, step)
+
+
+@instrument.timed('qc.post_step')
+@retried
+def _post_step(testrun, step):
+    step_factory = testrun.StepFactory
+    runstep = step_factory.AddItem(None)
+    try:
+        runstep.SetField('ST_STEP_NAME', step['name'])
+        runstep.SetField('ST_STATUS', step['status'])
+        runstep.SetField('ST_DESCRIPTION', step.get('description', ''))
+        runstep.SetField('ST_EXPECTED', step.get('expected', ''))
+        runstep.SetField('ST_ACTUAL', step.get('actual', ''))
+        runstep.SetField('ST_EXECUTION_DATE', step.get('exec_date', ''))
+        runstep.SetField('ST_EXECUTION_TIME', step.get('exec_time', ''))
+        runstep.Post()
+        # not seeing the step without a Refresh and Post here
+        runstep.Refresh()
+        runstep.Post()
+    except com_error:
+        _remove_item(step_factory, runstep)
+        raise
+
+
+def _remove_item(factory, item):
+    try:
+        factory.RemoveItem(item.ID)
+    except com_error as ex:
+        LOG.debug('unable to remove item %s: %s', item.ID, ex)
+
+
+@instrument.timed('qc.attach_report')
 def attach_report(qcc, pardir, attachments, qcdir, attachname):
     """
-    Zip the folder at local_path and upload it to the attachments of qcdir.
+    Zip the files of pardir matching the attachments patterns and upload
+    them to the attachments of qcdir as attachname.
+    """
+    upload_report(qcc, qcdir, make_report_archive(
+        pardir, attachments, attachname))
+
 
+@instrument.timed('report.write_archive')
+def make_report_archive(pardir, attachments, attachname):
     """
-    # qc
+    Zip the files of pardir matching the attachments patterns, returns the
+    path of the archive. OTA uploads attachments from a file, so it is made
+    straight in ATTACHMENT_DIR, by default the temp directory.
+
+    Needs no connection; import_results makes it while the tests import.
+    """
+    zipfileloc = os.path.join(ATTACHMENT_DIR or tempfile.gettempdir(),
+                              attachname)
+    try:
+        count = archive.write_archive(zipfileloc, pardir, attachments)
+    except Exception:
+        if os.path.exists(zipfileloc):
+            os.remove(zipfileloc)
+        raise
+    LOG.info('archived %s report files in: %s', count, zipfileloc)
+    return zipfileloc
+
+
+@instrument.timed('qc.upload_report')
+def upload_report(qcc, qcdir, filename):
+    """
+    Upload the archive filename to the attachments of qcdir, then remove
+    it.
+    """
+    try:
+        _upload_attachment(qcc, qcdir, filename)
+    finally:
+        os.remove(filename)
+
+
+@retried
+def _upload_attachment(qcc, qcdir, filename):
     fldr = '/'.join(['Root', qcdir])
     fldr = os.path.normpath(fldr)
     fldr = fldr.replace('/', '\\')
     fldr = get_qc_folder(qcc, fldr)
     afactory = fldr.Attachments
     attach = afactory.AddItem(None)
-
-    # local
-    zipfileloc = os.path.join(tempfile.gettempdir(), attachname)
-    zipf = zipfile.ZipFile(zipfileloc, 'w', zipfile.ZIP_DEFLATED)
-
-    for root, dirnames, filenames in os.walk(pardir):
-        for filepat in attachments:
-            print('looking @ filepat: {}'.format(filepat))
-            for matched in fnmatch.filter(filenames, filepat):
-                print('adding file: {}'.format(matched))
-                filepath = os.path.join(root, matched)
-                zipf.write(filepath, os.path.basename(filepath))
-            for matched in fnmatch.filter(dirnames, filepat):
-                print('adding folder: {}'.format(matched))
-                filepath = os.path.join(root, matched)
-                zipf.write(filepath, os.path.basename(filepath))
-
-    zipf.close()
-
-    attach.FileName = zipfileloc.replace('/', '\\')
-    attach.Type = TDATT_FILE
-    attach.Post()
-    os.remove(zipfileloc)
+    try:
+        attach.FileName = filename.replace('/', '\\')
+        attach.Type = TDATT_FILE
+        attach.Post()
+    except com_error:
+        _remove_item(afactory, attach)
+        raise
 
 
+@instrument.timed('qc.get_bugs')
+@retried
 def get_bugs(qcc):
     """
     Return a list of dicts containing bug info.
@@ -328,6 +1082,8 @@ def get_bugs(qcc):
     return bugs
 
 
+@instrument.timed('qc.link_bug')
+@retried
 def link_bug(qcc, testinstance, bug):
     """
     link a Bug to a TsTestInstance
@@ -346,23 +1102,11 @@ def link_bug(qcc, testinstance, bug):
         link = link_factory.AddItem(bug)
         link.LinkType = 'Related'
         link.Post()
-    except pywintypes.com_error as ex:
+    except com_error as ex:
         LOG.exception(ex)
     return True
 
 
-def _zipfolder(fldr, filename):
-    zipfileloc = os.path.join(fldr, os.pardir, filename)
-    zipf = zipfile.ZipFile(zipfileloc, 'w', zipfile.ZIP_DEFLATED)
-    # add entire directory to zip
-    for root, _, files in os.walk(fldr):
-        for child in files:
-            filepath = os.path.join(root, child)
-            zipf.write(filepath, os.path.basename(filepath))
-    zipf.close()
-    return zipfileloc
-
-
 def _to_lab_dir(qcdir, subject):
     fldr = '/'.join(['Root', qcdir, subject])
     fldr = os.path.normpath(fldr)
@@ -0,0 +1,174 @@
+"""
+Test Result Records
+
+Compact containers for parsed test and step results.
+
+A large run produces millions of steps, so rather than one dict per step the
+parsers emit slotted records. Status strings are interned and unset fields
+cost a single shared None. The records still behave as mutable mappings with
+the same keys the dicts had, so API users can keep using test['name'],
+test.get('bug', '') and dict(test).
+"""
+
+# pylint: disable=I0011, redefined-builtin, invalid-name
+
+import sys
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
+
+try:
+    intern = sys.intern
+except AttributeError:
+    pass
+
+
+PASSED = intern('Passed')
+FAILED = intern('Failed')
+
+
+class _Record(MutableMapping):
+    """
+    A mapping over __slots__. A slot set to None is absent from the mapping,
+    keys that are not slots are kept in a dict created on first use.
+    """
+
+    __slots__ = ('_extra',)
+    _FIELDS = ()
+
+    def __init__(self, **extra):
+        self._extra = None
+        for key, value in extra.items():
+            self[key] = value
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Returns a record holding the items of data.
+        """
+        return cls(**data)
+
+    def __getitem__(self, key):
+        if key in self._FIELDS:
+            value = getattr(self, key)
+            if value is not None:
+                return value
+        elif self._extra and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in self._FIELDS:
+            if key == 'status' and value is not None:
+                value = intern(str(value))
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self._FIELDS and getattr(self, key) is not None:
+            setattr(self, key, None)
+        elif self._extra and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        for field in self._FIELDS:
+            if getattr(self, field) is not None:
+                yield field
+        if self._extra:
+            for key in self._extra:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __getstate__(self):
+        return dict(self)
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, dict(self))
+
+
+class StepResult(_Record):
+    """
+    A parsed test step.
+    """
+
+    _FIELDS = (
+        'name',
+        'status',
+        'description',
+        'expected',
+        'actual',
+        'exec_date',
+        'exec_time'
+    )
+    __slots__ = _FIELDS
+
+    def __init__(self, name=None, status=None, description=None,
+                 expected=None, actual=None, exec_date=None, exec_time=None,
+                 **extra):
+        _Record.__init__(self, **extra)
+        self.name = name
+        self.status = None if status is None else intern(status)
+        self.description = description
+        self.expected = expected
+        self.actual = actual
+        self.exec_date = exec_date
+        self.exec_time = exec_time
+
+
+class TestResult(_Record):
+    """
+    A parsed test. 'steps' is a list of StepResult.
+    """
+
+    _FIELDS = (
+        'test_id',
+        'name',
+        'status',
+        'subject',
+        'suite',
+        'steps',
+        'description',
+        'exec_date',
+        'exec_time',
+        'duration',
+        'bug'
+    )
+    __slots__ = _FIELDS
+    # not a test case, for test runners collecting Test* classes
+    __test__ = False
+
+    def __init__(self, name=None, status=None, subject=None, suite=None,
+                 steps=None, description=None, exec_date=None,
+                 exec_time=None, duration=None, test_id=None, bug=None,
+                 **extra):
+        _Record.__init__(self, **extra)
+        self.test_id = test_id
+        self.name = name
+        self.status = None if status is None else intern(status)
+        self.subject = subject
+        self.suite = suite
+        self.steps = steps
+        self.description = description
+        self.exec_date = exec_date
+        self.exec_time = exec_time
+        self.duration = duration
+        self.bug = bug
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        data['steps'] = [StepResult.from_dict(step)
+                         for step in data.get('steps') or []]
+        return cls(**data)
@@ -0,0 +1,198 @@
+"""
+Parser Registry
+
+Knows which parsers exist and what files they read, without importing them.
+
+Parsers come from two places:
+ * the modules in the qcri.parsers package
+ * the 'qcri.parsers' entry point group of installed distributions
+
+Every parser is described by a ParserInfo holding its file name patterns,
+the root tags of the files it reads and whether it can parse incrementally
+(iter_parse). get_candidates matches a file against that metadata so only
+the likely parsers are imported and tried.
+
+A third-party entry point either names the parser module,
+
+    nunit = mypackage.nunitparser
+
+which is imported only when it is a candidate for every file, or names a
+ParserInfo in a lightweight module so that it is filtered like the
+built-ins:
+
+    nunit = mypackage.qcri_meta:NUNIT
+"""
+
+import fnmatch
+import importlib
+import logging
+import os
+import pkgutil
+
+
+LOG = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = 'qcri.parsers'
+
+
+class ParserInfo(object):
+    """
+    Metadata about a parser module.
+
+    patterns are fnmatch patterns for the file name, root_tags the tags of
+    the first element of the files it reads; empty means any.
+    """
+
+    def __init__(self, name, module, patterns=('*',), root_tags=(),
+                 streaming=False):
+        self.name = name
+        self.module = module
+        self.patterns = tuple(patterns)
+        self.root_tags = tuple(root_tags)
+        self.streaming = streaming
+        self._loaded = None
+
+    def matches(self, filename, root_tag=None):
+        """
+        Returns True if filename may be read by this parser. An unknown
+        root_tag (None) does not rule a parser out.
+        """
+        basename = os.path.basename(filename).lower()
+        if not any(fnmatch.fnmatch(basename, pat) for pat in self.patterns):
+            return False
+        if root_tag is None or not self.root_tags:
+            return True
+        return root_tag in self.root_tags
+
+    def load(self):
+        """
+        Returns the imported parser module.
+        """
+        if self._loaded is None:
+            self._loaded = importlib.import_module(self.module)
+        return self._loaded
+
+    def __repr__(self):
+        return 'ParserInfo({!r}, {!r})'.format(self.name, self.module)
+
+
+BUILTIN_PARSERS = (
+    ParserInfo(
+        'robotframework',
+        'qcri.parsers.robotframework',
+        patterns=('*.xml',),
+        root_tags=('robot',)),
+    ParserInfo(
+        'uftrunreport',
+        'qcri.parsers.uftrunreport',
+        patterns=('*.xml',),
+        root_tags=('Report',),
+        streaming=True),
+    ParserInfo(
+        'seleniumtestresults',
+        'qcri.parsers.seleniumtestresults',
+        patterns=('*.html', '*.htm'),
+        root_tags=('html',),
+        streaming=True),
+    ParserInfo(
+        'junit',
+        'qcri.parsers.junit',
+        patterns=('*.xml',),
+        root_tags=('testsuites', 'testsuite'),
+        streaming=True),
+)
+
+_REGISTRY = None
+
+
+def get_registry():
+    """
+    Returns {name: ParserInfo} of all known parsers, discovered once.
+    """
+    global _REGISTRY  # pylint: disable=I0011, global-statement
+    if _REGISTRY is None:
+        _REGISTRY = _discover()
+    return _REGISTRY
+
+
+def register(info):
+    """
+    Add or replace a parser in the registry.
+    """
+    get_registry()[info.name] = info
+
+
+def get_candidates(filename, disabled=()):
+    """
+    Returns the ParserInfo of the enabled parsers that may read filename,
+    judged by name pattern and root tag only.
+    """
+    root_tag = sniff_root_tag(filename)
+    LOG.debug('sniffed root tag %s for: %s', root_tag, filename)
+    return [info for name, info in sorted(get_registry().items())
+            if name not in disabled and info.matches(filename, root_tag)]
+
+
+def sniff_root_tag(filename):
+    """
+    Returns the tag of the first element in filename without reading the
+    rest of it, or None if it isn't markup.
+    """
+    from lxml import etree
+    html = os.path.splitext(filename)[1].lower() in ('.html', '.htm')
+    try:
+        for _, elem in etree.iterparse(
+                filename, events=('start',), html=html):
+            return elem.tag
+    except (etree.XMLSyntaxError, IOError, ValueError):
+        pass
+    return None
+
+
+def _discover():
+    registry = {}
+    builtins = {info.name: info for info in BUILTIN_PARSERS}
+
+    import qcri.parsers
+    for _, name, ispkg in pkgutil.iter_modules(qcri.parsers.__path__):
+        if ispkg or name.startswith('_'):
+            continue
+        registry[name] = builtins.get(name) or ParserInfo(
+            name, 'qcri.parsers.' + name)
+
+    for name, module, attr, load in _iter_entry_points(ENTRY_POINT_GROUP):
+        if attr:
+            try:
+                info = load()
+            except Exception as ex:  # pylint: disable=I0011, broad-except
+                LOG.error('unable to load parser entry point: %s', name)
+                LOG.exception(ex)
+                continue
+        else:
+            info = ParserInfo(name, module)
+        registry[name] = info
+    return registry
+
+
+def _iter_entry_points(group):
+    """
+    Yields (name, module, attr, load) for the entry points in group.
+    """
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        try:
+            import pkg_resources
+        except ImportError:
+            return
+        for ep in pkg_resources.iter_entry_points(group):
+            yield ep.name, ep.module_name, '.'.join(ep.attrs), ep.load
+        return
+    eps = entry_points()
+    if hasattr(eps, 'select'):
+        eps = eps.select(group=group)
+    else:
+        eps = eps.get(group, [])
+    for ep in eps:
+        module, _, attr = ep.value.partition(':')
+        yield ep.name, module.strip(), attr.strip(), ep.load
@@ -0,0 +1,113 @@
+"""
+Parsed Results File
+
+An intermediate file format that lets the parse and the upload of a test
+run happen on different hosts.
+
+The file is JSON Lines: the first line is a header record holding the
+original results filename and the parser's attach list, every following
+line is one test. Files ending in '.gz' are gzip compressed.
+
+    {"qcri": 1, "filename": "...", "attach_list": [...]}
+    {"name": "...", "status": "...", "steps": [...], ...}
+    ...
+"""
+
+import gzip
+import io
+import json
+import logging
+import os
+from qcri.application.records import TestResult
+
+
+LOG = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+EXTENSIONS = ('.jsonl', '.jsonl.gz')
+
+_SEPARATORS = (',', ':')
+
+
+def is_result_file(filename):
+    """
+    Returns True if filename is a parsed results file.
+    """
+    if not filename.endswith(EXTENSIONS):
+        return False
+    try:
+        with _open(filename, 'r') as filed:
+            header = json.loads(filed.readline())
+    except (IOError, ValueError):
+        return False
+    return isinstance(header, dict) and 'qcri' in header
+
+
+def dump_results(results, filename):
+    """
+    Write the parsed results to filename, one test per line.
+    The tests are written as they are read, so results['tests'] may be any
+    iterable. If reading them fails, as when a streamed parse finds the
+    file malformed, filename is removed. Returns the number of tests
+    written.
+    """
+    header = {
+        'qcri': FORMAT_VERSION,
+        'filename': results['filename'],
+        'attach_list': list(results['attach_list'])
+    }
+    count = 0
+    try:
+        with _open(filename, 'w') as filed:
+            filed.write(_dumps(header))
+            filed.write(u'\n')
+            for test in results['tests']:
+                filed.write(_dumps(test))
+                filed.write(u'\n')
+                count += 1
+    except Exception:
+        # a partial file would load as if it held all the results
+        os.remove(filename)
+        raise
+    LOG.info('wrote %s tests to: %s', count, filename)
+    return count
+
+
+def load_results(filename):
+    """
+    Returns the results stored in filename. The tests are read lazily, one
+    line at a time, so the full result set is never held in memory.
+    """
+    with _open(filename, 'r') as filed:
+        header = json.loads(filed.readline())
+    if not isinstance(header, dict) or 'qcri' not in header:
+        raise ValueError('not a parsed results file: {}'.format(filename))
+    if header['qcri'] > FORMAT_VERSION:
+        raise ValueError('unsupported format version: {}'.format(
+            header['qcri']))
+    return {
+        'filename': header['filename'],
+        'tests': _iter_tests(filename),
+        'attach_list': header['attach_list']
+    }
+
+
+def _iter_tests(filename):
+    with _open(filename, 'r') as filed:
+        # skip the header
+        filed.readline()
+        for line in filed:
+            if line.strip():
+                yield TestResult.from_dict(json.loads(line))
+
+
+def _dumps(record):
+    # records are mappings but not dicts, hand them to json as dicts
+    return json.dumps(record, separators=_SEPARATORS, default=dict)
+
+
+def _open(filename, mode):
+    if filename.endswith('.gz'):
+        return io.TextIOWrapper(
+            gzip.open(filename, mode + 'b'), encoding='utf-8')
+    return io.open(filename, mode, encoding='utf-8')
@@ -0,0 +1,139 @@
+"""
+Step Policy
+
+Decides which steps of a test are kept, for runs whose passing steps
+nobody reads. The mode is one of:
+
+    all      - every step, the default
+    failed   - the steps that didn't pass, then a summary step counting the
+               passing ones left out
+    collapse - each series of passing steps in a row becomes one step
+               counting them and listing their names
+
+max_length caps the description, expected and actual text of a step, 0
+leaves it whole. The parsers apply the policy to each test's steps as
+they are read, given as options['step_policy'] by importer.parse_results,
+so steps left out don't stay in memory. Applying it again leaves the
+steps unchanged, and parse_results does so for the parsers that don't know
+about it.
+"""
+
+from qcri.application.records import PASSED, StepResult
+
+
+SECTION = 'steps'
+
+MODES = ('all', 'failed', 'collapse')
+
+# status of the summary step of 'failed', kept when applied again
+SUMMARY_STATUS = 'N/A'
+
+ELLIPSIS = '...'
+
+_TEXT_FIELDS = ('description', 'expected', 'actual')
+
+
+class StepPolicy(object):
+    """
+    The steps kept of a test and the length of their text, see the module
+    docstring.
+    """
+
+    def __init__(self, mode='all', max_length=0):
+        if mode not in MODES:
+            raise ValueError('unknown step policy: {}'.format(mode))
+        self.mode = mode
+        self.max_length = max(0, int(max_length))
+
+    def __bool__(self):
+        return self.mode != 'all' or self.max_length > 0
+
+    __nonzero__ = __bool__
+
+    def apply(self, steps):
+        """
+        Returns the steps kept of steps, any iterable of StepResult; steps
+        left out are dropped as they are read.
+        """
+        if self.mode == 'failed':
+            kept = _failed(steps)
+        elif self.mode == 'collapse':
+            kept = _collapse(steps)
+        else:
+            kept = list(steps)
+        if self.max_length:
+            for step in kept:
+                for field in _TEXT_FIELDS:
+                    text = step.get(field)
+                    if text:
+                        step[field] = truncate(text, self.max_length)
+        return kept
+
+
+def from_config(cfg):
+    """
+    Returns the StepPolicy of the [steps] section of cfg, None if it keeps
+    every step whole.
+    """
+    if not cfg.has_section(SECTION):
+        return None
+    policy = StepPolicy(
+        cfg.get(SECTION, 'policy', fallback='all') or 'all',
+        cfg.get(SECTION, 'max_length', fallback='0') or 0)
+    return policy if policy else None
+
+
+def truncate(text, max_length):
+    """
+    Returns text cut to max_length characters, marked with an ellipsis.
+    """
+    if len(text) <= max_length:
+        return text
+    if max_length <= len(ELLIPSIS):
+        return text[:max_length]
+    return text[:max_length - len(ELLIPSIS)] + ELLIPSIS
+
+
+def _failed(steps):
+    kept = []
+    passed = 0
+    total = 0
+    for step in steps:
+        total += 1
+        if step.get('status') == PASSED:
+            passed += 1
+        else:
+            kept.append(step)
+    if passed:
+        kept.append(StepResult(
+            name='Summary',
+            status=SUMMARY_STATUS,
+            description='{} of {} steps passed and are not listed'.format(
+                passed, total)))
+    return kept
+
+
+def _collapse(steps):
+    kept = []
+    series = []
+    for step in steps:
+        if step.get('status') == PASSED:
+            series.append(step)
+            continue
+        kept.extend(_collapse_series(series))
+        series = []
+        kept.append(step)
+    kept.extend(_collapse_series(series))
+    return kept
+
+
+def _collapse_series(series):
+    if len(series) < 2:
+        return series
+    first = series[0]
+    return [StepResult(
+        name='{} passed steps'.format(len(series)),
+        status=PASSED,
+        description='\n'.join(step.get('name') or '' for step in series),
+        exec_date=first.get('exec_date'),
+        exec_time=first.get('exec_time'))]
@@ -0,0 +1,92 @@
+"""
+Throttle
+
+An adaptive limiter for the operations sent to Quality Center.
+
+The number of operations in flight follows AIMD, as TCP congestion control
+does: it grows by one per window of successful operations and is halved
+when an operation fails or its latency rises well above the lowest latency
+seen for the same kind of operation, a sign the server is queueing; a
+lookup answered from a cache and a creation making several server calls
+aren't compared. Independently of that the operations can be spaced to at
+most max_rate per second.
+"""
+
+import threading
+import time
+
+
+class AdaptiveLimiter(object):
+    """
+    Limits the concurrency and rate of operations.
+
+    max_rate        - operations per second, 0 for no limit
+    max_concurrency - the most operations in flight
+    min_concurrency - the fewest operations in flight
+    tolerance       - latency over tolerance * baseline counts as congestion
+    min_latency     - latencies below this never count as congestion
+    """
+
+    def __init__(self, max_rate=0, max_concurrency=8, min_concurrency=1,
+                 tolerance=2.0, min_latency=0.05):
+        self.max_rate = max_rate
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.tolerance = tolerance
+        self.min_latency = min_latency
+        self.limit = float(min_concurrency)
+        self.baselines = {}
+        self._in_flight = 0
+        self._since_decrease = 0
+        self._next_start = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """
+        Wait for a free slot and for the rate limit, returns the start time
+        to pass to release.
+        """
+        with self._cond:
+            while self._in_flight >= int(self.limit):
+                self._cond.wait()
+            self._in_flight += 1
+            wait = 0.0
+            if self.max_rate:
+                now = time.time()
+                start = max(now, self._next_start)
+                self._next_start = start + 1.0 / self.max_rate
+                wait = start - now
+        if wait > 0:
+            time.sleep(wait)
+        return time.time()
+
+    def release(self, start, error=False, key=None):
+        """
+        Free the slot taken at start and adapt the limit to how the
+        operation went. key names the kind of operation, whose latencies
+        are compared with each other only.
+        """
+        latency = time.time() - start
+        with self._cond:
+            self._in_flight -= 1
+            self._since_decrease += 1
+            if error or self._congested(key, latency):
+                # halve at most once per window, concurrent operations
+                # usually fail together
+                if self._since_decrease >= int(self.limit):
+                    self.limit = max(self.min_concurrency, self.limit / 2)
+                    self._since_decrease = 0
+            else:
+                self.limit = min(self.max_concurrency,
+                                 self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def _congested(self, key, latency):
+        baseline = self.baselines.get(key)
+        if baseline is None or latency < baseline:
+            self.baselines[key] = latency
+            return False
+        # let the baseline drift up slowly, the server may just be busier
+        self.baselines[key] = baseline + (latency - baseline) * 0.01
+        return (latency > self.min_latency and
+                latency > baseline * self.tolerance)
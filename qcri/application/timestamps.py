@@ -0,0 +1,111 @@
+"""
+Timestamp Decoding
+
+Fixed-format decoders for the step and test timestamps in Robot Framework,
+UFT and JUnit results.
+
+Parsing a large log decodes one or two timestamps per keyword, and most of
+them repeat at second resolution. Instead of datetime.strptime followed by
+two strftime calls, the decoders slice the fixed layout and memoize the
+date and time strings per second, so repeated stamps cost one dict lookup
+and share their strings.
+
+Each decoder returns (exec_date, exec_time, microseconds), the microseconds
+counting from the epoch so that durations are a plain subtraction.
+"""
+
+from datetime import datetime
+
+
+_EPOCH = datetime(1970, 1, 1)
+_CACHE_SIZE = 8192
+
+_ROBOT_CACHE = {}
+_UFT_CACHE = {}
+
+
+def decode_robot(stamp):
+    """
+    Decode a Robot Framework timestamp, '%Y%m%d %H:%M:%S.%f'.
+    exec_time is formatted '%H:%M:%S'.
+    """
+    key = stamp[:17]
+    try:
+        exec_date, exec_time, micros = _ROBOT_CACHE[key]
+    except KeyError:
+        if len(key) != 17 or key[8] != ' ' or key[11] != ':' or \
+                key[14] != ':':
+            raise ValueError('invalid timestamp: {!r}'.format(stamp))
+        stamped = datetime(
+            int(key[0:4]), int(key[4:6]), int(key[6:8]),
+            int(key[9:11]), int(key[12:14]), int(key[15:17]))
+        exec_date = '{}-{}-{}'.format(key[0:4], key[4:6], key[6:8])
+        exec_time = key[9:17]
+        micros = _to_micros(stamped)
+        _remember(_ROBOT_CACHE, key, (exec_date, exec_time, micros))
+    fraction = stamp[18:]
+    if fraction:
+        if stamp[17] != '.' or not fraction.isdigit() or len(fraction) > 6:
+            raise ValueError('invalid timestamp: {!r}'.format(stamp))
+        micros += int(fraction.ljust(6, '0'))
+    return exec_date, exec_time, micros
+
+
+def decode_uft(stamp):
+    """
+    Decode a UFT timestamp, '%m/%d/%Y - %H:%M:%S'.
+    exec_time is formatted '%I:%M:%S %p'.
+    """
+    try:
+        return _UFT_CACHE[stamp]
+    except KeyError:
+        pass
+    try:
+        month, day, rest = stamp.split('/', 2)
+        year, sep, clock = rest[:4], rest[4:7], rest[7:]
+        hour, minute, second = clock.split(':')
+        if sep != ' - ':
+            raise ValueError
+        stamped = datetime(
+            int(year), int(month), int(day),
+            int(hour), int(minute), int(second))
+    except ValueError:
+        raise ValueError('invalid timestamp: {!r}'.format(stamp))
+    hour12 = stamped.hour % 12 or 12
+    decoded = (
+        '{:04d}-{:02d}-{:02d}'.format(
+            stamped.year, stamped.month, stamped.day),
+        '{:02d}:{:02d}:{:02d} {}'.format(
+            hour12, stamped.minute, stamped.second,
+            'AM' if stamped.hour < 12 else 'PM'),
+        _to_micros(stamped))
+    _remember(_UFT_CACHE, stamp, decoded)
+    return decoded
+
+
+def decode_junit(stamp):
+    """
+    Decode a JUnit timestamp, ISO 8601 '%Y-%m-%dT%H:%M:%S', ignoring any
+    fraction or time zone after it. exec_time is formatted '%H:%M:%S'.
+    """
+    key = stamp[:19]
+    try:
+        if len(key) != 19 or key[10] not in 'T ':
+            raise ValueError
+        stamped = datetime(
+            int(key[0:4]), int(key[5:7]), int(key[8:10]),
+            int(key[11:13]), int(key[14:16]), int(key[17:19]))
+    except ValueError:
+        raise ValueError('invalid timestamp: {!r}'.format(stamp))
+    return key[0:10], key[11:19], _to_micros(stamped)
+
+
+def _to_micros(stamped):
+    delta = stamped - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000
+
+
+def _remember(cache, key, value):
+    if len(cache) >= _CACHE_SIZE:
+        cache.clear()
+    cache[key] = value
@@ -7,13 +7,12 @@ QCRI
 # pylint: disable=I0011, no-member
 
 from __future__ import print_function
-from distutils.util import strtobool
 import os
 import sys
 import argparse
 import getpass
+import glob
 import logging
-import pythoncom
 
 # modify path
 PTH = os.path.abspath(__file__)
@@ -22,8 +21,8 @@ PTH = os.path.dirname(PTH)
 sys.path.insert(1, PTH)
 
 from qcri.application import importer
-from qcri.application import gui
-from qcri.application import qualitycenter
+from qcri.application import instrument
+from qcri.application import resultfile
 
 
 LOG = logging.getLogger(__name__)
@@ -38,6 +37,10 @@ def main(dummy_args=None):
     """
     The application entry point.
     """
+    # worker processes of frozen executables start here
+    import multiprocessing
+    multiprocessing.freeze_support()
+    importer.configure_logging()
     ap = argparse.ArgumentParser(
         description='Import test results to HP Quality Center.')
 
@@ -57,6 +60,66 @@ def main(dummy_args=None):
     ap.add_argument('--attach_report', '-a',
                     help=('flag to zip and attach the test results folder to '
                           'the folder specified in the source argument'))
+    ap.add_argument('--out', '-o',
+                    help=('parse the source and write the results to this '
+                          '.jsonl or .jsonl.gz file instead of importing '
+                          'them; the file can be given as the source of a '
+                          'later import'))
+    ap.add_argument('--upsert', choices=('off', 'skip', 'update'),
+                    help=('what to do with a test result whose run was '
+                          'already imported: add another run (off), skip it '
+                          'if unchanged (skip) or update the run (update); '
+                          'overrides the upsert option of qcri.cfg'))
+    ap.add_argument('--plan', action='store_true',
+                    help=('show what the import would create, update and '
+                          'skip in quality center and how long it would '
+                          'take, then ask before importing'))
+    ap.add_argument('--include-tag', dest='include_tags', action='append',
+                    metavar='GLOB',
+                    help='import only the tests with a matching tag')
+    ap.add_argument('--exclude-tag', dest='exclude_tags', action='append',
+                    metavar='GLOB',
+                    help='leave out the tests with a matching tag')
+    ap.add_argument('--suite', dest='suites', action='append',
+                    metavar='PATH',
+                    help=('import only the tests of matching suites, '
+                          'e.g. Top/Sub or Sub'))
+    ap.add_argument('--status', dest='statuses', action='append',
+                    metavar='GLOB',
+                    help='import only the tests with a matching status')
+    ap.add_argument('--test', dest='names', action='append', metavar='GLOB',
+                    help='import only the tests with a matching name')
+    ap.add_argument('--exclude-test', dest='exclude_names', action='append',
+                    metavar='GLOB',
+                    help='leave out the tests with a matching name')
+    ap.add_argument('--column', dest='columns', action='append',
+                    metavar='COLUMN=GLOB',
+                    help=('import only the UFT DataTable rows whose column '
+                          'matches; the filter options override the '
+                          '[filters] section of qcri.cfg'))
+    ap.add_argument('--steps', choices=('all', 'failed', 'collapse'),
+                    help=('the steps imported: all of them, the failed ones '
+                          'and a summary (failed) or each series of passed '
+                          'steps as one (collapse); overrides the policy '
+                          'option of qcri.cfg'))
+    ap.add_argument('--max-step-length', type=int, metavar='CHARS',
+                    help=('cut step descriptions, expected and actual '
+                          'text to this length'))
+    ap.add_argument('--merge', choices=importer.MERGE_MODES, default='last',
+                    help=('when the source is a pattern matching several '
+                          'shards of one run, e.g. output*.xml of pabot, '
+                          'keep the last result of a test found in several '
+                          '(last) or also note the status it replaced '
+                          '(merge), as rebot --merge does'))
+    ap.add_argument('--processes', type=int,
+                    help=('the worker processes parsing shards, one per CPU '
+                          'by default'))
+    ap.add_argument('--stats',
+                    help=('write the count and time of every Quality Center '
+                          'operation and parse phase to this JSON file'))
+    ap.add_argument('--trace',
+                    help=('record every timed operation with its thread to '
+                          'this JSON file, in the Chrome Trace Event format'))
     ap.set_defaults(func=_handle_command)
 
     ap.parse_args().func(ap.parse_args())
@@ -82,45 +145,220 @@ def _handle_command(args):
         ('attach_report', 'Attach report? (yes/no)')
     )
     cfg = importer.load_config()
-    if not args.console and not any((getattr(args, opt[0]) for opt in options)):
-        rr = gui.QcriGui(cfg)
-        rr.mainloop()
-        return
+    recorder = None
+    if args.trace:
+        recorder = instrument.TraceRecorder()
+        instrument.add_hook(recorder)
+    instrument.enable()
+    use_gui = (not args.console and not args.out and
+               not any((getattr(args, opt[0]) for opt in options)))
+    try:
+        if use_gui:
+            from qcri.application import gui
+            rr = gui.QcriGui(cfg)
+            rr.mainloop()
+        else:
+            _run_console(args, options, cfg)
+    finally:
+        _report_stats(args.stats, summary=not use_gui)
+        if recorder is not None:
+            recorder.write(args.trace)
+
+
+def _run_console(args, options, cfg):
+    """
+    Parse the source and import it, or write it to args.out. The connection
+    is made on the executor thread while the source is parsed.
+    """
+    if args.out:
+        # parse only, nothing is sent to Quality Center
+        options = [opt for opt in options if opt[0] == 'source']
     use_history = cfg.getboolean('main', 'history')
     hist = importer.load_history() if use_history else None
     try:
         for opt in options:
             _set_argument(args, opt, hist)
-        if not args.password:
+        if not args.out and not args.password:
             args.password = getpass.getpass()
     except KeyboardInterrupt:
         return
     if use_history:
         importer.save_history(hist)
-    parser = _get_parser(args.source, cfg)
-    if parser is None:
-        LOG.error('parser not found for source: %s', args.source)
+    if args.out:
+        _import_source(args, cfg)
         return
-    results = importer.parse_results(parser, args.source, cfg)
-    # get a Quality Center connection
-    qcc = None
+    # log in while the source is parsed, the handshake takes seconds
+    from qcri.application import executor
+    from qcri.application import qualitycenter
+    qualitycenter.configure(cfg)
+    connecting = executor.submit(
+        qualitycenter.connect,
+        args.url,
+        args.domain,
+        args.project,
+        args.username,
+        args.password)
     try:
-        qcc = qualitycenter.connect(
-            args.url,
-            args.domain,
-            args.project,
-            args.username,
-            args.password)
-        importer.import_results(
+        _import_source(args, cfg, connecting)
+    finally:
+        executor.call(_disconnect, connecting)
+        executor.shutdown()
+
+
+def _import_source(args, cfg, connecting=None):
+    """
+    Parse the source and import it on the connection connecting resolves
+    to, or write it to args.out.
+    """
+    shards = sorted(glob.glob(args.source)) if glob.has_magic(
+        args.source) else []
+    if resultfile.is_result_file(args.source):
+        results = resultfile.load_results(args.source)
+    elif shards:
+        _set_parse_options(args, cfg)
+        parser = _get_parser(shards[0], cfg)
+        if parser is None:
+            LOG.error('parser not found for source: %s', shards[0])
+            return
+        results = importer.parse_shards(
+            parser, shards, cfg, getattr(args, 'processes', None),
+            getattr(args, 'merge', 'last'))
+        print('Merged {} tests from {} shards.'.format(
+            len(results['tests']), len(shards)))
+    else:
+        _set_parse_options(args, cfg)
+        parser = _get_parser(args.source, cfg)
+        if parser is None:
+            LOG.error('parser not found for source: %s', args.source)
+            return
+        results = importer.parse_results(
+            parser, args.source, cfg, stream=True)
+    if args.out:
+        try:
+            with instrument.span('resultfile.dump_results'):
+                count = resultfile.dump_results(results, args.out)
+        except importer.ParserError as e:
+            LOG.exception(e)
+            print('Parse failed: {}'.format(e))
+            return
+        print('Wrote {} test results to {}.'.format(count, args.out))
+        return
+    from qcri.application import executor
+    from qcri.application import qualitycenter
+    attach_report = _strtobool(args.attach_report)
+    try:
+        with instrument.span('qc.wait_connect'):
+            qcc = connecting.result()
+        plan = None
+        if args.plan:
+            # the plan needs every test up front
+            results['tests'] = list(results['tests'])
+            from qcri.application import planner
+            plan = executor.call(
+                planner.make_plan,
+                qcc,
+                args.destination,
+                results['tests'],
+                args.upsert or qualitycenter.UPSERT,
+                attach_report,
+                qualitycenter.CONNECTIONS)
+            print(planner.format_plan(plan))
+            if not _confirm('Import? (yes/no)'):
+                return
+        # the connection belongs to the executor thread
+        report = executor.call(
+            importer.import_results,
             qcc,
             args.destination,
             results,
-            strtobool(args.attach_report))
-    except pythoncom.com_error as e:
+            attach_report,
+            upsert=args.upsert,
+            plan=plan)
+    except importer.ParserError as e:
+        # raised reading the tests for the plan, before any was imported
         LOG.exception(e)
-    finally:
-        qualitycenter.disconnect(qcc)
-    print('Import complete.')
+        print('Parse failed: {}'.format(e))
+        return
+    except qualitycenter.com_error as e:
+        LOG.exception(e)
+        print('Import failed: {}'.format(e))
+        return
+    print(importer.format_report(report))
+    if report['parse_error']:
+        print('Import incomplete.')
+    else:
+        print('Import complete.')
+
+
+def _set_parse_options(args, cfg):
+    """
+    Set the [filters] and [steps] options of cfg given on the command line.
+    """
+    from qcri.application import filters
+    from qcri.application import steppolicy
+    if not cfg.has_section(steppolicy.SECTION):
+        cfg.add_section(steppolicy.SECTION)
+    if getattr(args, 'steps', None):
+        cfg.set(steppolicy.SECTION, 'policy', args.steps)
+    if getattr(args, 'max_step_length', None) is not None:
+        cfg.set(steppolicy.SECTION, 'max_length', str(args.max_step_length))
+    if not cfg.has_section(filters.SECTION):
+        cfg.add_section(filters.SECTION)
+    for option in ('include_tags', 'exclude_tags', 'suites', 'statuses',
+                   'names', 'exclude_names', 'columns'):
+        values = getattr(args, option, None)
+        if values:
+            cfg.set(filters.SECTION, option, ','.join(values))
+
+
+def _disconnect(connecting):
+    """
+    Disconnect the connection connecting resolves to, if it was made.
+    """
+    from qcri.application import qualitycenter
+    try:
+        qcc = connecting.result()
+    except Exception:  # pylint: disable=I0011, broad-except
+        # reported by the import
+        return
+    qualitycenter.disconnect(qcc)
+
+
+def _report_stats(filename=None, summary=True):
+    """
+    Print the instrumentation summary if summary is True and write it to
+    filename, if given.
+    """
+    if not instrument.get_stats():
+        return
+    if summary:
+        print(instrument.summary_table())
+    if filename:
+        instrument.write_json(filename)
+
+
+def _confirm(question):
+    """
+    Ask a yes/no question, no if there is no answer.
+    """
+    print(question)
+    try:
+        return _strtobool(input().strip() or 'no')
+    except (EOFError, ValueError):
+        return False
+
+
+def _strtobool(value):
+    """
+    Convert a yes/no answer to a bool, as distutils.util.strtobool does,
+    without the cost of importing distutils at startup.
+    """
+    value = value.lower()
+    if value in ('y', 'yes', 't', 'true', 'on', '1'):
+        return True
+    if value in ('n', 'no', 'f', 'false', 'off', '0'):
+        return False
+    raise ValueError('invalid truth value {!r}'.format(value))
 
 
 def _set_argument(args, option_pair, hist=None):
@@ -0,0 +1,146 @@
+"""
+The JUnit XML parser.
+
+"""
+
+# pylint: disable=I0011, no-member
+
+from lxml import etree
+from qcri.application import importer
+from qcri.application.records import FAILED, PASSED, StepResult, TestResult
+from qcri.application.timestamps import decode_junit
+
+ATTACH_LIST = []
+
+NO_RUN = 'No Run'
+
+_ROOT_TAGS = ('testsuites', 'testsuite')
+_FAILURE_TAGS = ('failure', 'error')
+_OUTPUT_TAGS = ('system-out', 'system-err')
+
+
+def parse(filename, options=None):
+    """
+    Parse JUnit XML, as written by pytest, Maven Surefire, go-junit-report
+    and most xUnit tools.
+    """
+    return list(iter_parse(filename, options))
+
+
+def iter_parse(filename, options=None):
+    """
+    Parse JUnit XML incrementally, yielding each testcase as it is read and
+    freeing it afterwards, so memory does not grow with the file.
+
+    A testcase is a test of the innermost testsuite holding it, in the
+    subject of its classname with the dots as folders. Its failure, error
+    and skipped elements and its output are its steps.
+
+    The testcases are yielded before the rest of the file is read, so a
+    file truncated by a crashed job raises ParserError only after the
+    testcases before the break; importer.import_results imports those and
+    reports the import as partial.
+    """
+    options = options or {}
+    filters = options.get('filters')
+    step_policy = options.get('step_policy')
+    root = None
+    try:
+        for event, elem in etree.iterparse(
+                filename, events=('start', 'end'),
+                tag=_ROOT_TAGS + ('testcase',)):
+            if root is None:
+                if elem.getparent() is not None or elem.tag not in _ROOT_TAGS:
+                    raise importer.ParserError('root.tag is not testsuites')
+                root = elem
+            if event != 'end':
+                continue
+            if elem.tag == 'testcase':
+                test = _parse_testcase(elem, filters, step_policy)
+                if test is not None:
+                    yield test
+            _free(elem)
+    except etree.XMLSyntaxError as ex:
+        raise importer.ParserError(ex)
+    if root is None:
+        raise importer.ParserError('testsuite not found')
+
+
+def _parse_testcase(testcase, filters, step_policy):
+    testsuite = next(testcase.iterancestors('testsuite'), None)
+    classname = testcase.get('classname') or ''
+    name = testcase.get('name')
+    suite = testsuite.get('name') if testsuite is not None else None
+    suite = suite or classname.rsplit('.', 1)[-1]
+    subject = classname.replace('.', '/')
+
+    failures = [elem for elem in testcase if elem.tag in _FAILURE_TAGS]
+    skipped = testcase.find('skipped')
+    if failures:
+        status = FAILED
+    elif skipped is not None:
+        status = NO_RUN
+    else:
+        status = PASSED
+    if filters is not None and not filters.test_selected(
+            name, status,
+            path='/'.join(part for part in (subject, suite) if part)):
+        return None
+
+    exec_date = exec_time = None
+    stamp = testsuite.get('timestamp') if testsuite is not None else None
+    if stamp:
+        try:
+            exec_date, exec_time, _ = decode_junit(stamp)
+        except ValueError:
+            raise importer.ParserError('invalid timestamp: {}'.format(stamp))
+    try:
+        duration = int(float(testcase.get('time') or 0))
+    except ValueError:
+        raise importer.ParserError('invalid time: {}'.format(
+            testcase.get('time')))
+
+    steps = (_parse_step(elem, exec_date, exec_time) for elem in testcase
+             if elem.tag in _FAILURE_TAGS + _OUTPUT_TAGS + ('skipped',))
+    if step_policy is None:
+        steps = list(steps)
+    else:
+        steps = step_policy.apply(steps)
+
+    return TestResult(
+        name=name,
+        status=status,
+        subject=subject,
+        suite=suite,
+        steps=steps,
+        description=name,
+        exec_date=exec_date,
+        exec_time=exec_time,
+        duration=duration)
+
+
+def _parse_step(elem, exec_date, exec_time):
+    if elem.tag in _FAILURE_TAGS:
+        status = FAILED
+    elif elem.tag == 'skipped':
+        status = NO_RUN
+    else:
+        status = PASSED
+    message = elem.get('message')
+    text = elem.text or ''
+    description = '\n'.join(part for part in (message, text) if part)
+    return StepResult(
+        name=elem.get('type') or elem.tag,
+        status=status,
+        description=description,
+        exec_date=exec_date,
+        exec_time=exec_time)
+
+
+def _free(elem):
+    # drop the parsed element and everything read before it
+    elem.clear()
+    parent = elem.getparent()
+    if parent is not None:
+        while elem.getprevious() is not None:
+            del parent[0]
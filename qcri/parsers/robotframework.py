@@ -5,9 +5,10 @@ The Robot Framework parser.
 
 # pylint: disable=I0011, no-member, unused-argument
 
-from datetime import datetime
 from lxml import etree
 from qcri.application.importer import ParserError
+from qcri.application.records import StepResult, TestResult
+from qcri.application.timestamps import decode_robot
 
 ATTACH_LIST = [
     'log.html',
@@ -31,6 +32,9 @@ def parse(filename, options=None):
     if root.tag != 'robot':
         raise ParserError('root.tag is not robot')
 
+    options = options or {}
+    filters = options.get('filters')
+    step_policy = options.get('step_policy')
     test_results = []
     stack = root.xpath('./suite')
     while stack:
@@ -39,8 +43,20 @@ def parse(filename, options=None):
         path = [p.get('name') for p in tree.iterancestors() if p.tag == 'suite']
         path = path[::-1]
         subject = '/'.join(path)
-        tests = tree.xpath('./test')
-        test_results = [_parse_test(t, subject, suite_name) for t in tests]
+        if filters is not None:
+            suite_path = '/'.join(path + [suite_name])
+            if not filters.may_contain(suite_path):
+                # nothing below can be selected
+                continue
+            if filters.suite_selected(suite_path):
+                tests = [t for t in tree.xpath('./test')
+                         if _test_selected(t, filters)]
+            else:
+                tests = []
+        else:
+            tests = tree.xpath('./test')
+        test_results.extend(_parse_test(t, subject, suite_name, step_policy)
+                            for t in tests)
         suites = tree.xpath('./suite')
         for suite in suites:
             stack.append(suite)
@@ -48,41 +64,51 @@ def parse(filename, options=None):
     return test_results
 
 
-def _parse_test(test, subject, suite_name):
+def _test_selected(test, filters):
+    status_node = test.find('./status')
+    status = None if status_node is None else _to_status(
+        status_node.get('status'))
+    tags = [tag.text or '' for tag in test.xpath('./tags/tag | ./tag')]
+    return filters.test_selected(test.get('name'), status, tags)
+
+
+def _to_status(status):
+    status = status.replace('PASS', 'Passed')
+    return status.replace('FAIL', 'Failed')
+
+
+def _parse_test(test, subject, suite_name, step_policy=None):
     test_name = test.get('name')
     # todo
     test_description = test.get('name')
     test_id = test.get('id')
     status_node = test.find("./status")
-    test_status = status_node.get('status')
-    test_status = test_status.replace('PASS', 'Passed')
-    test_status = test_status.replace('FAIL', 'Failed')
-
-    test_starttime = status_node.get('starttime')
-    test_starttime = datetime.strptime(test_starttime, '%Y%m%d %H:%M:%S.%f')
-    test_exec_time = test_starttime.strftime('%H:%M:%S')
-    test_exec_date = test_starttime.strftime('%Y-%m-%d')
-    test_endtime = status_node.get('endtime')
-    test_endtime = datetime.strptime(test_endtime, '%Y%m%d %H:%M:%S.%f')
-    test_duration = (test_endtime - test_starttime).total_seconds()
-    test_duration = int(test_duration)
+    test_status = _to_status(status_node.get('status'))
+
+    test_exec_date, test_exec_time, test_start = decode_robot(
+        status_node.get('starttime'))
+    _, _, test_end = decode_robot(status_node.get('endtime'))
+    test_duration = int((test_end - test_start) / 1000000.0)
 
     # test steps
     keywords = test.xpath('./kw')
-    step_results = [_parse_step(k) for k in keywords]
-
-    return {
-        'test_id': test_id,
-        'name': test_name,
-        'status': test_status,
-        'subject': subject,
-        'suite': suite_name,
-        'steps': step_results,
-        'description': test_description,
-        'exec_date': test_exec_date,
-        'exec_time': test_exec_time,
-        'duration': test_duration
-    }
+    step_results = (_parse_step(k) for k in keywords)
+    if step_policy is None:
+        step_results = list(step_results)
+    else:
+        step_results = step_policy.apply(step_results)
+
+    return TestResult(
+        test_id=test_id,
+        name=test_name,
+        status=test_status,
+        subject=subject,
+        suite=suite_name,
+        steps=step_results,
+        description=test_description,
+        exec_date=test_exec_date,
+        exec_time=test_exec_time,
+        duration=test_duration)
 
 
 def _parse_step(step):
@@ -93,25 +119,17 @@ def _parse_step(step):
     else:
         name = kw_name
     kw_status_node = step.find('./status')
-    kw_status = kw_status_node.get('status')
-    kw_status = kw_status.replace('PASS', 'Passed')
-    kw_status = kw_status.replace('FAIL', 'Failed')
-    starttime = kw_status_node.get('starttime')
-    starttime = datetime.strptime(starttime, '%Y%m%d %H:%M:%S.%f')
-    exec_date = datetime.strftime(starttime, '%Y-%m-%d')
-    exec_time = datetime.strftime(starttime, '%H:%M:%S')
+    kw_status = _to_status(kw_status_node.get('status'))
+    exec_date, exec_time, _ = decode_robot(kw_status_node.get('starttime'))
     args = step.xpath('./arguments/arg')
 
-    descr = ''
-    for arg in args:
-        descr += 'Argument = ' + arg.text + '\n'
-
-    return {
-        'name': name,
-        'status': kw_status,
-        'description': descr,
-        'expected': '',
-        'actual': '',
-        'exec_date': exec_date,
-        'exec_time': exec_time
-    }
+    descr = ''.join('Argument = {}\n'.format(arg.text or '') for arg in args)
+
+    return StepResult(
+        name=name,
+        status=kw_status,
+        description=descr,
+        expected='',
+        actual='',
+        exec_date=exec_date,
+        exec_time=exec_time)
@@ -5,8 +5,9 @@ The Selenium IDE - Test Results Plugin parser.
 
 # pylint: disable=I0011, redefined-builtin, invalid-name, no-member
 from __future__ import print_function
-from lxml import html
+from lxml import etree
 from qcri.application import importer
+from qcri.application.records import FAILED, PASSED, StepResult, TestResult
 
 try:
     range = xrange
@@ -23,66 +24,108 @@ def parse(filename, options=None):
     """
     Parse Selenium IDE - Test Results Plugin output files.
 
+    """
+    return list(iter_parse(filename, options))
+
+
+def iter_parse(filename, options=None):
+    """
+    Parse Selenium IDE - Test Results Plugin output files incrementally,
+    yielding each test as its table is read and freeing it afterwards.
+
+    A report may hold several suites; each test belongs to the suite of the
+    summary table preceding it.
+
+    The tests are yielded before the rest of the report is read, so a
+    malformed report raises ParserError only after the tests before the
+    error; importer.import_results imports those and reports the import as
+    partial.
     """
     options = options or {}
+    step_policy = options.get('step_policy')
+    suitename = None
     try:
-        parsed_html = html.parse(filename)
-    except html.HTMLSyntaxError:
+        for _, tbl in etree.iterparse(
+                filename, events=('end',), tag='table', html=True):
+            if tbl.get('id') == 'suiteSummaryTable':
+                suitename = _parse_suite(tbl)
+            elif 'test_case' in (tbl.get('class') or '').split():
+                if suitename is None:
+                    raise importer.ParserError('Test Suite not found')
+                yield _parse_test(tbl, suitename, step_policy)
+            else:
+                continue
+            _free(tbl)
+    except etree.XMLSyntaxError:
         raise importer.ParserError('TEST invalid XML syntax')
-
-    suite = parsed_html.find("//table[@id='suiteSummaryTable']/thead/tr/td")
-    if suite is None:
+    if suitename is None:
         raise importer.ParserError('Test Suite not found')
-    suite = suite.text
-    if not suite.startswith(_SUITE_HEADER):
+
+
+def _parse_suite(tbl):
+    suite = _first_cell(tbl)
+    if suite is None or not suite.startswith(_SUITE_HEADER):
         raise importer.ParserError('invalid test results')
     # get suite name from 'Test Suite: <testname>'
-    suitename = suite[len(_SUITE_HEADER) + 1:].strip()
-    root = parsed_html.getroot()
-    suitetbls = root.find_class('test_case')
-    if suitetbls is None:
-        raise importer.ParserError('no test cases found')
+    return suite[len(_SUITE_HEADER) + 1:].strip()
 
-    return [_parse_test(tbl, suitename) for tbl in suitetbls]
 
-def _parse_test(tbl, suitename):
-    testhead = tbl.xpath("./thead/tr/td")[0].text
-    if not testhead.startswith(_TEST_HEADER):
+def _parse_test(tbl, suitename, step_policy=None):
+    # the first row is the 'Test case: <name>' header, the rest are steps
+    rows = tbl.iter('tr')
+    testhead = next(rows, None)
+    testhead = None if testhead is None else _first_cell(testhead)
+    if testhead is None or not testhead.startswith(_TEST_HEADER):
         raise importer.ParserError('invalid test')
     test_name = testhead[len(_TEST_HEADER):]
-    rows = tbl.xpath(".//tr")
     test_steps = []
-    test_status = 'Passed'
-    for row in rows[1:]:
+    test_status = PASSED
+    for row in rows:
         step = _parse_step(row)
-        if step['status'] == 'Failed':
-            test_status = 'Failed'
+        if step.status == FAILED:
+            test_status = FAILED
         test_steps.append(step)
+    if step_policy is not None:
+        test_steps = step_policy.apply(test_steps)
+
+    return TestResult(
+        name=test_name,
+        subject='',
+        status=test_status,
+        suite=suitename,
+        steps=test_steps,
+        description='')
 
-    return {
-        'name': test_name,
-        'subject': '',
-        'status': test_status,
-        'suite': suitename,
-        'steps': test_steps,
-        'description': ''
-    }
 
 def _parse_step(step):
-    step_name = step.xpath('./td[1]')[0].text
-    _ident = step.xpath('./td[2]')[0].text
+    cells = [td.text for td in step.iterchildren('td')]
+    if len(cells) < 4:
+        raise importer.ParserError('invalid test step')
+    step_name, _ident, _input, fail = cells[:4]
     step_description = step_name + ': ' + _ident
-    _input = step.xpath('./td[3]')[0].text
     if _input is not None:
         step_description = step_description + ' -> ' + _input
-    fail = step.xpath('./td[4]')[0].text
     if fail is not None:
         step_description += '\n' + fail
-        step_status = 'Failed'
+        step_status = FAILED
     else:
-        step_status = 'Passed'
-    return {
-        'name': step_name,
-        'status': step_status,
-        'description': step_description
-    }
+        step_status = PASSED
+    return StepResult(
+        name=step_name,
+        status=step_status,
+        description=step_description)
+
+
+def _first_cell(tbl):
+    for td in tbl.iter('td'):
+        return td.text
+    return None
+
+
+def _free(elem):
+    # drop the parsed table and everything read before it
+    elem.clear()
+    parent = elem.getparent()
+    if parent is not None:
+        while elem.getprevious() is not None:
+            del parent[0]
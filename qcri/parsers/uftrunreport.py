@@ -6,10 +6,13 @@ The UFT Run Results parser.
 # pylint: disable=I0011, redefined-builtin, invalid-name, no-member
 
 import os
-from datetime import datetime
+import posixpath
+import zipfile
 import xlrd
 from lxml import etree
 from qcri.application import importer
+from qcri.application.records import StepResult, TestResult
+from qcri.application.timestamps import decode_uft
 
 try:
     range = xrange
@@ -27,6 +30,12 @@ ATTACH_LIST = [
 ]
 
 _SHEET_NAME = 'Global'
+_EMPTY_CELL = ('str', '')
+_XLSX_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_XLSX_REL_NS = ('http://schemas.openxmlformats.org/officeDocument/2006/'
+                'relationships')
+_XLSX_PKG_REL_NS = ('http://schemas.openxmlformats.org/package/2006/'
+                    'relationships')
 _TEST_STEPS_QUERY = '''.//NodeArgs[
     (@eType='User' and (
         @status='Warning' or @status='Passed' or @status='Failed'
@@ -43,108 +52,348 @@ def parse(filename, options=None):
      * 12.52
      * 12.53
     """
+    # the whole list is checked before it is returned
+    return list(_iter_diters(filename, options))
+
+
+def iter_parse(filename, options=None):
+    """
+    Parse the UFT run results incrementally. Results.xml is read with
+    iterparse; each DIter is joined to its DataTable row by iterID, yielded
+    and freed, so memory does not grow with the length of the run.
+
+    A first pass reads only the iterIDs and the DataTable, so that a
+    DataTable row without an iteration fails the file before any test is
+    yielded, and imported.
+    """
     options = options or {}
+    xls_path, iter_ids = _scan(filename)
+    xls_rows = _load_datatable(xls_path, _columns(options))
+    _check_iterations(xls_rows, iter_ids)
+    for test in _iter_diters(filename, options, xls_rows):
+        yield test
+
+
+def _iter_diters(filename, options=None, xls_rows=None):
+    """
+    Yields the tests of the DIters, reading the DataTable from the Table
+    node unless xls_rows are given. Raises ParserError after the last if a
+    DataTable row had no DIter.
+    """
+    options = options or {}
+    columns = _columns(options)
+    filters = options.get('filters')
+    step_policy = options.get('step_policy')
+    filter_columns = columns[4:]
+    seen = set()
     try:
-        parsed_xml = etree.parse(filename)
+        for _, elem in etree.iterparse(
+                filename, events=('end',), tag=('NodeArgs', 'DIter')):
+            if elem.tag == 'NodeArgs':
+                if xls_rows is None and elem.get('eType') == 'Table':
+                    xls_path = _table_path(filename, elem)
+                    if xls_path:
+                        xls_rows = _load_datatable(xls_path, columns)
+                continue
+            if xls_rows is None:
+                raise importer.ParserError('did not find xls_filename_node')
+            row = _iter_id(elem)
+            if 0 < row <= len(xls_rows):
+                seen.add(row)
+                xls_row = xls_rows[row - 1]
+                if filters is None or _diter_selected(
+                        elem, xls_row, filter_columns, filters):
+                    yield _parse_diter(elem, xls_row, step_policy)
+            _free(elem)
     except etree.XMLSyntaxError:
         raise importer.ParserError('invalid XML syntax')
 
-    xls_filename = _get_xls_filename(parsed_xml)
-    if not xls_filename:
+    if xls_rows is None:
         raise importer.ParserError('did not find xls_filename_node')
+    _check_iterations(xls_rows, seen)
+
+
+def _columns(options):
+    columns = (
+        options.get('test_column', 'test'),
+        options.get('subject_column', 'subject'),
+        options.get('suite_column', 'suite'),
+        options.get('description_column', 'description')
+    )
+    filters = options.get('filters')
+    # the DataTable columns the filters match, read after the others
+    if filters is not None:
+        columns += tuple(sorted(filters.columns))
+    return columns
+
+
+def _scan(filename):
+    """
+    Returns the DataTable path and the iterIDs of the DIters of Results.xml,
+    read without building the iterations.
+    """
+    xls_path = None
+    iter_ids = set()
+    try:
+        for event, elem in etree.iterparse(
+                filename, events=('start', 'end'), tag=('NodeArgs', 'DIter')):
+            if event == 'start':
+                if elem.tag == 'DIter':
+                    iter_ids.add(_iter_id(elem))
+                continue
+            if (xls_path is None and elem.tag == 'NodeArgs' and
+                    elem.get('eType') == 'Table'):
+                xls_path = _table_path(filename, elem)
+            _free(elem)
+    except etree.XMLSyntaxError:
+        raise importer.ParserError('invalid XML syntax')
+    if xls_path is None:
+        raise importer.ParserError('did not find xls_filename_node')
+    return xls_path, iter_ids
+
+
+def _table_path(filename, node):
+    xls_filename = node.findtext('.//Path')
+    if not xls_filename:
+        return None
+    return os.path.join(os.path.dirname(filename), xls_filename)
+
+
+def _iter_id(diter):
+    try:
+        return int(diter.get('iterID'))
+    except (TypeError, ValueError):
+        raise importer.ParserError('invalid iterID: {}'.format(
+            diter.get('iterID')))
+
+
+def _check_iterations(xls_rows, iter_ids):
+    if any(row not in iter_ids for row in range(1, len(xls_rows) + 1)):
+        raise importer.ParserError('diter was null')
+
+
+def _diter_selected(diter, xls_row, filter_columns, filters):
+    test, subject, suite = xls_row[:3]
+    if not filters.row_selected(dict(zip(filter_columns, xls_row[4:]))):
+        return False
+    path = '/'.join(part for part in (subject, suite) if part)
+    return filters.test_selected(
+        test, _diter_status(diter), path=path or None)
+
+
+def _diter_status(diter):
+    result = diter.find('./NodeArgs[@eType="StartIteration"]')
+    status = result.attrib['status']
+    return status.replace('Warning', 'Passed')
 
-    xls_path = os.path.join(os.path.dirname(filename), xls_filename)
-    xls_sheet = _load_datatable(xls_path)
-    xls_rows = xls_sheet.nrows
-
-    _description = options.get('description_column', 'description')
-    _suite = options.get('suite_column', 'suite')
-    _subject = options.get('subject_column', 'subject')
-    _test = options.get('test_column', 'test')
-
-    def _parse_test_xls(row):
-        diter = parsed_xml.find("//DIter[@iterID='{}']".format(row))
-        if diter is None:
-            raise importer.ParserError('diter was null')
-
-        test = _get_col_value(xls_sheet, row, _test)
-        subject = _get_col_value(xls_sheet, row, _subject)
-        suite = _get_col_value(xls_sheet, row, _suite)
-        description = _get_col_value(xls_sheet, row, _description)
-
-        result = diter.find('./NodeArgs[@eType="StartIteration"]')
-        status = result.attrib['status']
-        status = status.replace('Warning', 'Passed')
-
-        # get run duration
-        summary = diter.find('.//Summary')
-        start_time = summary.attrib['sTime']
-        start_time = datetime.strptime(start_time, '%m/%d/%Y - %H:%M:%S')
-        end_time = summary.attrib['eTime']
-        end_time = datetime.strptime(end_time, '%m/%d/%Y - %H:%M:%S')
-        test_duration = (end_time - start_time).total_seconds()
-        test_duration = int(test_duration)
-
-        test_exec_date = start_time.strftime('%Y-%m-%d')
-        test_exec_time = start_time.strftime('%I:%M:%S %p')
-
-        step_results = []
-        steps = diter.xpath(_TEST_STEPS_QUERY)
-        step_results = [_parse_step(step) for step in steps]
-
-        return {
-            'name': test,
-            'subject': subject,
-            'status': status,
-            'suite': suite,
-            'steps': step_results,
-            'description': description,
-            'exec_date': test_exec_date,
-            'exec_time': test_exec_time,
-            'duration': test_duration
-        }
-
-    test_results = [_parse_test_xls(r) for r in range(1, xls_rows)]
-
-    return test_results
+
+def _parse_diter(diter, xls_row, step_policy=None):
+    test, subject, suite, description = xls_row[:4]
+
+    status = _diter_status(diter)
+
+    # get run duration
+    summary = diter.find('.//Summary')
+    test_exec_date, test_exec_time, start_time = decode_uft(
+        summary.attrib['sTime'])
+    _, _, end_time = decode_uft(summary.attrib['eTime'])
+    test_duration = int((end_time - start_time) / 1000000.0)
+
+    steps = diter.xpath(_TEST_STEPS_QUERY)
+    step_results = (_parse_step(step) for step in steps)
+    if step_policy is None:
+        step_results = list(step_results)
+    else:
+        step_results = step_policy.apply(step_results)
+
+    return TestResult(
+        name=test,
+        subject=subject,
+        status=status,
+        suite=suite,
+        steps=step_results,
+        description=description,
+        exec_date=test_exec_date,
+        exec_time=test_exec_time,
+        duration=test_duration)
 
 
 def _parse_step(step):
     step_node = step.getparent()
     step_status = step.attrib['status']
     step_text = step.find('./Disp').text
-    exec_date = step_node.find('./Time').text
-    exec_date = datetime.strptime(exec_date, '%m/%d/%Y - %H:%M:%S')
-    exec_time = exec_date.strftime('%I:%M:%S %p')
-    exec_date = exec_date.strftime('%Y-%m-%d')
+    exec_date, exec_time, _ = decode_uft(step_node.find('./Time').text)
     descr = step_node.find('./Details').text
-    return {
-        'name': step_text,
-        'status': step_status,
-        'description': descr,
-        'exec_date': exec_date,
-        'exec_time': exec_time
-    }
-
-
-def _get_xls_filename(parsed_xml):
-    xls_filename_node = parsed_xml.find('//NodeArgs[@eType="Table"]//Path')
-    if xls_filename_node is None:
-        return ''
-    return xls_filename_node.text
+    return StepResult(
+        name=step_text,
+        status=step_status,
+        description=descr,
+        exec_date=exec_date,
+        exec_time=exec_time)
 
 
-def _get_col_value(xls_sheet, row, col_name):
-    for col_index in range(xls_sheet.ncols):
-        if xls_sheet.cell(0, col_index).value == col_name:
-            return xls_sheet.cell(row, col_index).value
-    raise importer.ParserError('column not found: {}'.format(col_name))
+def _free(elem):
+    # drop the parsed iteration and everything read before it
+    elem.clear()
+    parent = elem.getparent()
+    if parent is not None:
+        while elem.getprevious() is not None:
+            del parent[0]
 
 
-def _load_datatable(xls_path):
+def _load_datatable(xls_path, columns):
+    """
+    Returns the rows of the Global DataTable sheet below the header, each a
+    tuple of the values in the named columns. Only that sheet and those
+    columns are read.
+    """
     if not os.path.isfile(xls_path):
-        raise importer.ParserError('xls file not found: %s', xls_path)
+        raise importer.ParserError('xls file not found: {}'.format(xls_path))
+
+    if xls_path.lower().endswith('.xlsx'):
+        return _load_xlsx(xls_path, columns)
+    try:
+        xls_book = xlrd.open_workbook(xls_path, on_demand=True)
+    except xlrd.XLRDError as ex:
+        raise importer.ParserError(ex)
+    try:
+        try:
+            xls_sheet = xls_book.sheet_by_name(_SHEET_NAME)
+        except xlrd.XLRDError as ex:
+            raise importer.ParserError(ex)
+        indexes = _column_indexes(xls_sheet.row_values(0), columns)
+        values = [xls_sheet.col_values(i, start_rowx=1) for i in indexes]
+        return list(zip(*values))
+    finally:
+        xls_book.release_resources()
+
+
+def _column_indexes(header, columns):
+    indexes = []
+    for col_name in columns:
+        try:
+            indexes.append(header.index(col_name))
+        except ValueError:
+            raise importer.ParserError('column not found: {}'.format(col_name))
+    return indexes
+
+
+def _load_xlsx(xlsx_path, columns):
+    """
+    Stream the Global sheet of an .xlsx workbook. The sheet is read twice,
+    once for the header and once for the needed columns, and only the
+    shared strings those cells refer to are kept.
+    """
+    try:
+        xlsx = zipfile.ZipFile(xlsx_path)
+    except (zipfile.BadZipfile, IOError) as ex:
+        raise importer.ParserError(ex)
+    with xlsx:
+        sheet_path = _xlsx_sheet_path(xlsx, _SHEET_NAME)
+
+        header = {}
+        for rowx, colx, cell in _iter_xlsx_cells(xlsx, sheet_path):
+            if rowx > 1:
+                break
+            header[colx] = cell
+        _resolve_strings(xlsx, list(header.values()))
+        header = {colx: _cell_value(cell) for colx, cell in header.items()}
+        names = [header.get(colx) for colx in range(max(header or [-1]) + 1)]
+        indexes = _column_indexes(names, columns)
+        # a column may be asked for twice, as by a filter
+        positions = {}
+        for pos, colx in enumerate(indexes):
+            positions.setdefault(colx, []).append(pos)
+
+        rows = []
+        for rowx, colx, cell in _iter_xlsx_cells(xlsx, sheet_path):
+            if rowx < 2 or colx not in positions:
+                continue
+            while len(rows) < rowx - 1:
+                rows.append([_EMPTY_CELL] * len(indexes))
+            for pos in positions[colx]:
+                rows[rowx - 2][pos] = cell
+        _resolve_strings(xlsx, [cell for row in rows for cell in row])
+    return [tuple(_cell_value(cell) for cell in row) for row in rows]
+
+
+def _xlsx_sheet_path(xlsx, sheet_name):
+    workbook = etree.fromstring(xlsx.read('xl/workbook.xml'))
+    rel_id = None
+    for sheet in workbook.iter('{%s}sheet' % _XLSX_NS):
+        if sheet.get('name') == sheet_name:
+            rel_id = sheet.get('{%s}id' % _XLSX_REL_NS)
+            break
+    if rel_id is None:
+        raise importer.ParserError('sheet not found: {}'.format(sheet_name))
+    rels = etree.fromstring(xlsx.read('xl/_rels/workbook.xml.rels'))
+    for rel in rels.iter('{%s}Relationship' % _XLSX_PKG_REL_NS):
+        if rel.get('Id') == rel_id:
+            target = rel.get('Target')
+            if target.startswith('/'):
+                return target[1:]
+            return posixpath.normpath(posixpath.join('xl', target))
+    raise importer.ParserError('sheet not found: {}'.format(sheet_name))
+
+
+def _iter_xlsx_cells(xlsx, sheet_path):
+    """
+    Yields (row, column index, cell) for the cells of a worksheet, rows
+    counting from 1. A cell is a [type, value] pair until resolved.
+    """
+    cell_tag = '{%s}c' % _XLSX_NS
+    with xlsx.open(sheet_path) as sheet:
+        for _, elem in etree.iterparse(sheet, events=('end',), tag=cell_tag):
+            ref = elem.get('r')
+            letters = ref.rstrip('0123456789')
+            colx = 0
+            for letter in letters:
+                colx = colx * 26 + ord(letter) - ord('A') + 1
+            cell_type = elem.get('t', 'n')
+            if cell_type == 'inlineStr':
+                value = ''.join(elem.itertext())
+                cell_type = 'str'
+            else:
+                value = elem.findtext('{%s}v' % _XLSX_NS)
+            yield int(ref[len(letters):]), colx - 1, [cell_type, value]
+            elem.clear()
+            row = elem.getparent()
+            while elem.getprevious() is not None:
+                del row[0]
+            if row.getprevious() is not None:
+                del row.getparent()[0]
+
+
+def _resolve_strings(xlsx, cells):
+    """
+    Replace shared string indexes in cells with their text, reading only
+    as far into the shared strings as needed.
+    """
+    wanted = {}
+    for cell in cells:
+        if cell[0] == 's' and cell[1] is not None:
+            wanted.setdefault(int(cell[1]), []).append(cell)
+    if not wanted:
+        return
+    last = max(wanted)
+    with xlsx.open('xl/sharedStrings.xml') as strings:
+        index = 0
+        for _, elem in etree.iterparse(
+                strings, events=('end',), tag='{%s}si' % _XLSX_NS):
+            for cell in wanted.get(index, ()):
+                cell[:] = ['str', ''.join(elem.itertext())]
+            elem.clear()
+            if index == last:
+                break
+            index += 1
 
-    xls_book = xlrd.open_workbook(xls_path)
-    xls_sheet = xls_book.sheet_by_name(_SHEET_NAME)
-    return xls_sheet
+
+def _cell_value(cell):
+    cell_type, value = cell
+    if value is None:
+        return ''
+    if cell_type == 'n':
+        return float(value)
+    if cell_type == 'b':
+        return int(value)
+    return value
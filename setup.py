@@ -24,12 +24,13 @@ setup(
         'Topic :: Software Development :: Testing'
     ],
     keywords='qualityassurance testing qualitycenter',
-    packages=find_packages(exclude=['docs', 'tests']),
+    packages=find_packages(exclude=['docs', 'tests', 'benchmarks']),
     install_requires=[
         'pypiwin32',
         'lxml',
         'xlrd',
-        'configparser'
+        'configparser',
+        'futures; python_version < "3"'
     ],
     entry_points={
         'console_scripts': [
@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+import unittest
+from qcri.application import archive
+from qcri.application import importer
+from qcri.application import qualitycenter
+from benchmarks import generators
+from benchmarks.fakeqc import FakeConnection
+
+
+def _touch(*parts):
+    path = os.path.join(*parts)
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, 'w') as filed:
+        filed.write(path)
+    return path
+
+
+class TestArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.report = os.path.join(self.tempdir, 'report')
+        _touch(self.report, 'output.xml')
+        _touch(self.report, 'log.html')
+        _touch(self.report, 'debug.txt')
+        _touch(self.report, 'shots', 'one.png')
+        _touch(self.report, 'Resources', 'deep', 'data.bin')
+
+    def tearDown(self):
+        qualitycenter.ATTACHMENT_DIR = None
+        shutil.rmtree(self.tempdir)
+
+    def test_find_files(self):
+        found = sorted(name for _, name in archive.find_files(
+            self.report, ['*.html', '*.png', 'Resources']))
+        self.assertEqual(found, [
+            os.path.join('Resources', 'deep', 'data.bin'),
+            'log.html', 'one.png'])
+
+    def test_import_attaches(self):
+        qualitycenter.ATTACHMENT_DIR = os.path.join(self.tempdir, 'spool')
+        os.mkdir(qualitycenter.ATTACHMENT_DIR)
+        results = generators.make_results(2)
+        results['filename'] = os.path.join(self.report, 'output.xml')
+        results['attach_list'] = ['*.html']
+        qcc = FakeConnection()
+        report = importer.import_results(qcc, 'attach', results,
+                                         attach_report=True)
+        self.assertIsNone(report['attachment'])
+        folder = qcc.TestSetTreeManager.NodeByPath('Root\\attach')
+        self.assertEqual(len(folder.Attachments.items), 1)
+        # the archive is gone once uploaded
+        self.assertEqual(os.listdir(qualitycenter.ATTACHMENT_DIR), [])
+
+    def test_unwritable_dir(self):
+        qualitycenter.ATTACHMENT_DIR = os.path.join(self.tempdir, 'missing')
+        results = generators.make_results(2)
+        results['filename'] = os.path.join(self.report, 'output.xml')
+        report = importer.import_results(FakeConnection(), 'attach', results,
+                                         attach_report=True)
+        # the tests are imported all the same
+        self.assertEqual(report['imported'], 2)
+        self.assertTrue(report['attachment'])
+
+    def test_unzippable_file(self):
+        # zip can't hold files dated before 1980
+        os.utime(os.path.join(self.report, 'log.html'), (0, 0))
+        results = generators.make_results(2)
+        results['filename'] = os.path.join(self.report, 'output.xml')
+        results['attach_list'] = ['*.html']
+        report = importer.import_results(FakeConnection(), 'attach', results,
+                                         attach_report=True)
+        self.assertEqual(report['imported'], 2)
+        self.assertIn('1980', report['attachment'])
+
+    def test_missing_report_folder(self):
+        # a result file parsed on another host
+        results = generators.make_results(2)
+        results['filename'] = os.path.join(self.tempdir, 'gone', 'out.xml')
+        qcc = FakeConnection()
+        report = importer.import_results(qcc, 'attach', results,
+                                         attach_report=True)
+        self.assertEqual(report['imported'], 2)
+        self.assertIn('report folder not found', report['attachment'])
+        folder = qcc.TestSetTreeManager.NodeByPath('Root\\attach')
+        self.assertEqual(len(folder.Attachments.items), 0)
+
+    def test_parse_error(self):
+        # a streamed parse failing after two tests
+        def tests():
+            for test in generators.make_results(2)['tests']:
+                yield test
+            raise importer.ParserError('invalid XML syntax')
+        results = generators.make_results(0)
+        results['filename'] = os.path.join(self.report, 'output.xml')
+        results['tests'] = tests()
+        qcc = FakeConnection()
+        report = importer.import_results(qcc, 'attach', results,
+                                         attach_report=True)
+        self.assertEqual(report['imported'], 2)
+        self.assertEqual(report['parse_error'], 'invalid XML syntax')
+        self.assertIn('partial', importer.format_report(report))
+        folder = qcc.TestSetTreeManager.NodeByPath('Root\\attach')
+        self.assertEqual(len(folder.Attachments.items), 0)
@@ -0,0 +1,47 @@
+import shutil
+import tempfile
+import unittest
+from qcri.application import importer
+from qcri.parsers import robotframework
+from qcri.parsers import seleniumtestresults
+from qcri.parsers import uftrunreport
+from benchmarks import generators
+from benchmarks.fakeqc import FakeConnection
+
+
+class TestGenerators(unittest.TestCase):
+    """
+    The synthetic results must parse and import like real ones.
+    """
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def _check(self, parser, filename, tests=7, steps=3):
+        res = parser.parse(filename)
+        self.assertEqual(len(res), tests)
+        self.assertEqual([len(t['steps']) for t in res], [steps] * tests)
+        self.assertEqual(
+            [t['status'] for t in res].count('Failed'), tests // 5)
+        qcc = FakeConnection()
+        importer.import_results(qcc, 'bench', {
+            'filename': filename, 'attach_list': [], 'tests': res})
+        self.assertEqual(len(qcc.runs), tests)
+        self.assertEqual(
+            sum(len(run.StepFactory.items) for run in qcc.runs),
+            tests * steps)
+
+    def test_robot(self):
+        self._check(robotframework,
+                    generators.write_robot(self.tempdir, 7, 3, depth=3))
+
+    def test_uft(self):
+        self._check(uftrunreport,
+                    generators.write_uft(self.tempdir, 7, 3, depth=2))
+
+    def test_selenium(self):
+        self._check(seleniumtestresults,
+                    generators.write_selenium(self.tempdir, 7, 3, suites=2))
@@ -0,0 +1,135 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from argparse import Namespace
+from qcri import main
+from qcri.application import executor
+from qcri.application import importer
+from qcri.application import qualitycenter
+from qcri.parsers import robotframework
+from benchmarks import generators
+from benchmarks.fakeqc import FakeConnection
+
+
+class TestExecutor(unittest.TestCase):
+
+    def setUp(self):
+        self.executor = executor.ComExecutor('qcri-test')
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_one_thread(self):
+        futures = [self.executor.submit(threading.current_thread)
+                   for _ in range(10)]
+        threads = set(future.result(5) for future in futures)
+        self.assertEqual(len(threads), 1)
+        self.assertEqual(threads.pop().name, 'qcri-test')
+
+    def test_in_order(self):
+        done = []
+        futures = [self.executor.submit(done.append, idx)
+                   for idx in range(50)]
+        futures[-1].result(5)
+        self.assertEqual(done, list(range(50)))
+
+    def test_error(self):
+        future = self.executor.submit(int, 'not a number')
+        with self.assertRaises(ValueError):
+            future.result(5)
+        # the thread survives the error
+        self.assertEqual(self.executor.call(int, '3'), 3)
+
+    def test_call_on_thread(self):
+        # work calling the executor again runs right away instead of
+        # waiting for itself
+        self.assertEqual(
+            self.executor.call(self.executor.call, len, 'abc'), 3)
+
+    def test_restart(self):
+        self.executor.call(len, '')
+        self.executor.shutdown()
+        self.assertTrue(self.executor.call(self.executor.on_thread))
+
+    def test_import(self):
+        qcc = FakeConnection()
+        tempdir = tempfile.mkdtemp()
+        try:
+            filename = generators.write_robot(tempdir, 4, 3)
+            results = importer.parse_results(robotframework, filename)
+            report = self.executor.call(
+                importer.import_results, qcc, 'bench', results)
+        finally:
+            shutil.rmtree(tempdir)
+        self.assertEqual(report['imported'], 4)
+
+
+class TestConsole(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.connect = qualitycenter.connect
+        self.get_parser = main._get_parser
+
+    def tearDown(self):
+        qualitycenter.connect = self.connect
+        main._get_parser = self.get_parser
+        shutil.rmtree(self.tempdir)
+
+    def test_connect_while_parsing(self):
+        parsing = threading.Event()
+        connections = []
+
+        def connect(*args):
+            # only returns if the source is parsed meanwhile
+            connections.append(parsing.wait(5))
+            return FakeConnection()
+
+        def get_parser(source, cfg):
+            parsing.set()
+            return robotframework
+
+        qualitycenter.connect = connect
+        main._get_parser = get_parser
+        cfg = importer.load_config('no such file')
+        cfg.set('main', 'history', 'false')
+        cfg.set('qualitycenter', 'id_cache_ttl', '0')
+        args = Namespace(
+            url='http://qc', domain='QA', project='WEB', username='tester',
+            password='secret', destination='bench', attach_report='no',
+            source=generators.write_robot(self.tempdir, 4, 3), out=None,
+            upsert=None, plan=False)
+        main._run_console(args, (), cfg)
+        self.assertEqual(connections, [True])
+
+    def test_truncated_junit(self):
+        # a crashed job's report, cut after its second testcase
+        filename = os.path.join(self.tempdir, 'junit.xml')
+        with open(filename, 'w') as filed:
+            filed.write(
+                '<?xml version="1.0" encoding="utf-8"?>\n<testsuites>\n'
+                '<testsuite name="suite" tests="3">\n' + ''.join(
+                    '<testcase classname="a.b" name="test {}" time="1">'
+                    '</testcase>\n'.format(idx) for idx in range(2)) +
+                '<testcase classname="a.b" name="test 2" ti')
+        qcc = FakeConnection()
+        qualitycenter.connect = lambda *args: qcc
+        cfg = importer.load_config('no such file')
+        cfg.set('main', 'history', 'false')
+        cfg.set('qualitycenter', 'id_cache_ttl', '0')
+        args = Namespace(
+            url='http://qc', domain='QA', project='WEB', username='tester',
+            password='secret', destination='junit', attach_report='yes',
+            source=filename, out=None, upsert=None, plan=False)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            main._run_console(args, (), cfg)
+        # the tests read before the break are imported and reported
+        self.assertEqual(len(qcc.runs), 2)
+        self.assertIn('Imported 2 of 2 test results.', out.getvalue())
+        self.assertIn('the import is partial', out.getvalue())
+        self.assertIn('Import incomplete.', out.getvalue())
@@ -0,0 +1,115 @@
+import configparser
+import os
+import shutil
+import tempfile
+import unittest
+from qcri.application import filters
+from qcri.application import importer
+from qcri.application.filters import TestFilter
+from qcri.parsers import robotframework
+from qcri.parsers import uftrunreport
+from benchmarks import generators
+
+
+SAMPLES = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'samples')
+rffile = os.path.join(SAMPLES, 'robotframework', 'output.xml')
+uftfile = os.path.join(SAMPLES, 'uftrunresults', 'Results.xml')
+
+
+class TestTestFilter(unittest.TestCase):
+
+    def test_suites(self):
+        test_filter = TestFilter(suites=['SuiteA/SuiteB'])
+        self.assertTrue(test_filter.may_contain('SuiteA'))
+        self.assertFalse(test_filter.may_contain('SuiteA/Other'))
+        self.assertTrue(test_filter.suite_selected('suitea/suiteb/Leaf'))
+        self.assertFalse(test_filter.suite_selected('SuiteA'))
+        test_filter = TestFilter(suites=['Leaf*'])
+        self.assertTrue(test_filter.may_contain('Top'))
+        self.assertTrue(test_filter.suite_selected('Top/LeafOne'))
+        self.assertFalse(test_filter.suite_selected('Top'))
+
+    def test_tests(self):
+        test_filter = TestFilter(include_tags=['smoke'],
+                                 exclude_names=['*slow*'],
+                                 statuses=['failed'])
+        self.assertTrue(test_filter.test_selected(
+            'Login', 'Failed', ['Smoke', 'ui']))
+        self.assertFalse(test_filter.test_selected(
+            'Login', 'Passed', ['smoke']))
+        self.assertFalse(test_filter.test_selected(
+            'Login', 'Failed', ['regression']))
+        self.assertFalse(test_filter.test_selected(
+            'A slow test', 'Failed', ['smoke']))
+
+    def test_from_config(self):
+        cfg = configparser.ConfigParser()
+        cfg.read_string(importer.DEFAULT_CFG)
+        self.assertIsNone(filters.from_config(cfg))
+        cfg.set('filters', 'statuses', 'Failed, Not Completed')
+        cfg.set('filters', 'columns', 'suite=suiteB')
+        test_filter = filters.from_config(cfg)
+        self.assertEqual(test_filter.statuses, ['failed', 'not completed'])
+        self.assertEqual(test_filter.columns, {'suite': 'suiteb'})
+
+
+class TestParseFilters(unittest.TestCase):
+
+    def test_robot_suites(self):
+        options = {'filters': TestFilter(suites=['SuiteA/SuiteB'])}
+        names = [t['name'] for t in robotframework.parse(rffile, options)]
+        self.assertEqual(sorted(names), ['Negative Test', 'Sample Test Child'])
+
+    def test_robot_tags(self):
+        tempdir = tempfile.mkdtemp()
+        try:
+            filename = generators.write_robot(tempdir, 6, 2)
+            cfg = importer.load_config('no such file')
+            results = importer.parse_results(
+                robotframework, filename, cfg,
+                filters=TestFilter(include_tags=['smoke']))
+            self.assertEqual([t['name'] for t in results['tests']],
+                             ['Test 1', 'Test 3', 'Test 5'])
+        finally:
+            shutil.rmtree(tempdir)
+
+    def test_uft_columns(self):
+        options = {'filters': TestFilter(columns={'suite': 'suiteB'})}
+        res = uftrunreport.parse(uftfile, options)
+        self.assertEqual([t['name'] for t in res], ['second test'])
+
+    def test_uft_columns_xlsx(self):
+        tempdir = tempfile.mkdtemp()
+        try:
+            with open(uftfile, 'rb') as filed:
+                xml = filed.read()
+            results = os.path.join(tempdir, 'Results.xml')
+            with open(results, 'wb') as filed:
+                filed.write(xml.replace(b'Default.xls', b'Default.xlsx'))
+            generators.write_xlsx(os.path.join(tempdir, 'Default.xlsx'), {
+                'Global': [
+                    ['test', 'subject', 'description', 'suite'],
+                    ['first test', 'main/subA', 'one', 'suiteA'],
+                    ['second test', 'main/subB', 'two', 'suiteB']
+                ]
+            })
+            # suite is both a configured and a filtered column
+            options = {'filters': TestFilter(columns={'suite': 'suiteB'})}
+            res = uftrunreport.parse(results, options)
+            self.assertEqual([(t['name'], t['suite']) for t in res],
+                             [('second test', 'suiteB')])
+        finally:
+            shutil.rmtree(tempdir)
+
+    def test_post_filter(self):
+        cfg = importer.load_config('no such file')
+        cfg.set('filters', 'exclude_names', 'first*')
+        results = importer.parse_results(uftrunreport, uftfile, cfg,
+                                         stream=True)
+        self.assertEqual([t['name'] for t in results['tests']],
+                         ['second test'])
+
+
+if __name__ == '__main__':
+    unittest.main()
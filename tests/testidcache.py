@@ -0,0 +1,97 @@
+import os
+import shutil
+import tempfile
+import unittest
+from qcri.application import idcache
+from qcri.application import importer
+from qcri.application import qualitycenter
+from benchmarks import generators
+from benchmarks.fakeqc import FakeConnection
+
+
+class TestIdCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.cache = idcache.open_cache(folder=self.tempdir)
+        qualitycenter.ID_CACHE = self.cache
+        self.qcc = FakeConnection()
+        qualitycenter._LOGINS[id(self.qcc)] = qualitycenter._Login(
+            'http://qc/qcbin/', 'QA', 'WEB', 'tester', 'secret')
+
+    def tearDown(self):
+        qualitycenter._LOGINS.pop(id(self.qcc), None)
+        qualitycenter.ID_CACHE = None
+        self.cache.close()
+        shutil.rmtree(self.tempdir)
+
+    def test_ttl(self):
+        self.cache.put('scope', 'test', ('a', 'b'), 12)
+        self.assertEqual(self.cache.get('scope', 'test', ('a', 'b')), '12')
+        self.assertIsNone(self.cache.get('other', 'test', ('a', 'b')))
+        self.cache.ttl = -1
+        self.assertIsNone(self.cache.get('scope', 'test', ('a', 'b')))
+        self.assertEqual(self.cache.purge(), 1)
+        self.assertTrue(os.path.isfile(idcache.get_cache_path(self.tempdir)))
+
+    def test_warm_import(self):
+        importer.import_results(self.qcc, 'ids', generators.make_results(3))
+        self.qcc.calls.clear()
+        # a later run starts with a new session
+        report = importer.import_results(
+            self.qcc, 'ids', generators.make_results(3))
+        self.assertEqual(report['imported'], 3)
+        # the test set and each instance fetched by id, nothing looked up
+        self.assertEqual(self.qcc.calls['Item'], 1 + 3)
+        self.assertEqual(self.qcc.calls['NodeByPath'], 0)
+        self.assertEqual(self.qcc.calls['NewList'], 0)
+
+    def test_stale_id(self):
+        importer.import_results(self.qcc, 'ids', generators.make_results(1))
+        testset = [e for e in self.qcc.entities.values()
+                   if e.Field('CY_CYCLE') == 'suite'][0]
+        testset.Name = 'renamed'
+        report = importer.import_results(
+            self.qcc, 'ids', generators.make_results(1))
+        self.assertEqual(report['imported'], 1)
+        test_sets = [e for e in self.qcc.entities.values()
+                     if e.Field('CY_CYCLE') == 'suite']
+        # looked up again, created anew and cached
+        self.assertEqual(len(test_sets), 1)
+        self.assertNotEqual(test_sets[0].ID, testset.ID)
+        scope = idcache.scope_key('http://qc/qcbin', 'qa', 'web')
+        self.assertEqual(
+            self.cache.get(scope, 'test_set', ('root\\ids\\subject', 'suite')),
+            '{}/{}'.format(test_sets[0].ID,
+                           test_sets[0].Field('CY_FOLDER_ID')))
+
+    def test_moved_test_set(self):
+        importer.import_results(self.qcc, 'ids', generators.make_results(1))
+        source = self.qcc.TestSetTreeManager.NodeByPath('Root\\ids\\subject')
+        target = source.AddNode('elsewhere')
+        testset = source.TestSetFactory.items.pop()
+        target.TestSetFactory.items.append(testset)
+        testset.SetField('CY_FOLDER_ID', target.NodeID)
+        report = importer.import_results(
+            self.qcc, 'ids', generators.make_results(1))
+        self.assertEqual(report['imported'], 1)
+        # a new test set in the folder imported to, the moved one untouched
+        self.assertEqual(len(source.TestSetFactory.items), 1)
+        self.assertNotEqual(source.TestSetFactory.items[0].ID, testset.ID)
+        self.assertEqual(
+            [len(i.RunFactory.items) for i in testset.TsTestFactory.items],
+            [1])
+
+    def test_moved_test(self):
+        test = qualitycenter.make_test_plan(
+            self.qcc, 'ids', 'subject', 'suite', 'test')
+        source = test.Field('TS_SUBJECT')
+        target = source.AddNode('elsewhere')
+        source.TestFactory.items.remove(test)
+        target.TestFactory.items.append(test)
+        test.SetField('TS_SUBJECT', target)
+        # a later run, the test is only found through the cache
+        again = qualitycenter.make_test_plan(
+            self.qcc, 'ids', 'subject', 'suite', 'test')
+        self.assertNotEqual(again.ID, test.ID)
+        self.assertIs(again.Field('TS_SUBJECT'), source)
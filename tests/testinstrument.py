@@ -0,0 +1,91 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from qcri.application import importer
+from qcri.application import instrument
+from qcri.parsers import robotframework
+from benchmarks import generators
+from benchmarks.fakeqc import FakeConnection
+
+
+class TestInstrument(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        instrument.reset()
+
+    def tearDown(self):
+        instrument.enable(False)
+        instrument.reset()
+        shutil.rmtree(self.tempdir)
+
+    def _import(self):
+        filename = generators.write_robot(self.tempdir, 4, 3)
+        results = importer.parse_results(robotframework, filename)
+        importer.import_results(FakeConnection(), 'bench', results)
+
+    def test_disabled(self):
+        self._import()
+        self.assertEqual(instrument.get_stats(), {})
+
+    def test_import_stats(self):
+        instrument.enable()
+        self._import()
+        stats = instrument.get_stats()
+        self.assertEqual(stats['parse.parse']['count'], 1)
+        self.assertEqual(stats['parse.read_test']['count'], 4)
+        self.assertEqual(stats['qc.import_test_result']['count'], 4)
+        self.assertEqual(stats['qc.make_test_run']['count'], 4)
+        self.assertEqual(stats['qc.post_step']['count'], 12)
+        self.assertIn('qc.post_step', instrument.summary_table())
+
+        filename = os.path.join(self.tempdir, 'stats.json')
+        instrument.write_json(filename)
+        with open(filename) as filed:
+            self.assertEqual(json.load(filed), stats)
+
+    def test_hook(self):
+        spans = []
+
+        def hook(name, start, duration, error):
+            spans.append((name, error))
+
+        instrument.add_hook(hook)
+        try:
+            with self.assertRaises(ValueError):
+                with instrument.span('failing'):
+                    raise ValueError('boom')
+        finally:
+            instrument.remove_hook(hook)
+        self.assertEqual(len(spans), 1)
+        self.assertEqual(spans[0][0], 'failing')
+        self.assertIsInstance(spans[0][1], ValueError)
+        self.assertEqual(instrument.get_stats()['failing']['errors'], 1)
+
+    def test_trace(self):
+        recorder = instrument.TraceRecorder()
+        instrument.add_hook(recorder)
+        try:
+            worker = threading.Thread(target=self._import, name='worker')
+            worker.start()
+            worker.join()
+        finally:
+            instrument.remove_hook(recorder)
+
+        filename = os.path.join(self.tempdir, 'trace.json')
+        recorder.write(filename)
+        with open(filename) as filed:
+            trace = json.load(filed)
+        events = trace['traceEvents']
+        spans = [e for e in events if e['ph'] == 'X']
+        self.assertEqual(
+            len([e for e in spans if e['name'] == 'qc.post_steps']), 4)
+        self.assertEqual(set(e['tid'] for e in spans), set([worker.ident]))
+        self.assertIn({'name': 'worker'},
+                      [e['args'] for e in events if e['ph'] == 'M'])
+        for event in spans:
+            self.assertGreaterEqual(event['ts'], 0)
+            self.assertGreaterEqual(event['dur'], 0)
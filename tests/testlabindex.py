@@ -0,0 +1,75 @@
+import shutil
+import tempfile
+import time
+import unittest
+from qcri.application import labindex
+from benchmarks.fakeqc import FakeConnection
+
+
+def _make_lab(qcc, names=('alpha', 'beta', 'gamma'), depth=3):
+    root = qcc.TestSetTreeManager.Root
+    pending = [root]
+    for _ in range(depth):
+        pending = [node.AddNode('{} {}'.format(name, node.NodeID))
+                   for node in pending for name in names]
+    return root
+
+
+class TestLabIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_snapshot(self):
+        qcc = FakeConnection()
+        _make_lab(qcc)
+        index = labindex.snapshot(qcc, 'key')
+        # root and 3 + 9 + 27 folders
+        self.assertEqual(len(index.folders), 40)
+        self.assertTrue(index.complete)
+        self.assertFalse(index.is_stale())
+        top = index.children('Root')
+        self.assertEqual([f['name'][:5] for f in top],
+                         ['alpha', 'beta ', 'gamma'])
+        self.assertTrue(index.has_children(top[0]['path']))
+
+    def test_search(self):
+        qcc = FakeConnection()
+        _make_lab(qcc)
+        index = labindex.snapshot(qcc, 'key')
+        found = index.search('gamma beta')
+        self.assertTrue(found)
+        for path in found:
+            self.assertIn('gamma', path.lower())
+            self.assertIn('beta', path.lower())
+        # names starting with the last word come first
+        self.assertTrue(found[0].rsplit('\\', 1)[-1].startswith('beta'))
+        self.assertEqual(index.search('  '), [])
+
+    def test_persist_and_refresh_branch(self):
+        qcc = FakeConnection()
+        root = _make_lab(qcc, depth=2)
+        index = labindex.snapshot(qcc, 'key')
+        labindex.save_index(index, self.tempdir)
+        loaded = labindex.load_index('key', self.tempdir)
+        self.assertEqual(loaded.folders, index.folders)
+        self.assertEqual(loaded.updated, index.updated)
+        self.assertEqual(
+            labindex.load_index('other', self.tempdir).folders, {})
+
+        # a branch is updated in place, removed folders go with their
+        # subfolders
+        first = root.children[0]
+        root.children.pop(1)
+        first.AddNode('delta')
+        labindex.refresh_children(loaded, root.NodeID, root.children)
+        labindex.refresh_children(loaded, first.NodeID, first.children)
+        self.assertEqual(len(loaded.children('Root')), 2)
+        self.assertIsNotNone(loaded.get(first.Path + '\\delta'))
+        self.assertEqual(len(loaded.folders), 1 + 2 + 3 + 3 + 1)
+
+        loaded.updated = time.time() - labindex.MAX_AGE - 1
+        self.assertTrue(loaded.is_stale())
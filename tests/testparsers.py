@@ -1,11 +1,21 @@
+import os
+import shutil
+import tempfile
 import unittest
 from qcri.parsers import robotframework
 from qcri.parsers import uftrunreport
+from qcri.parsers import seleniumtestresults
+from qcri.parsers import junit
 from qcri.application.importer import ParserError
+from benchmarks.generators import write_xlsx
 
 
-rffile = '../samples/robotframework/output.xml'
-uftfile = '../samples/uftrunresults/Results.xml'
+SAMPLES = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'samples')
+rffile = os.path.join(SAMPLES, 'robotframework', 'output.xml')
+uftfile = os.path.join(SAMPLES, 'uftrunresults', 'Results.xml')
+selfile = os.path.join(SAMPLES, 'seleniumtestresults', 'results.html')
+junitfile = os.path.join(SAMPLES, 'junit', 'junit.xml')
 
 
 class TestRobotFramework(unittest.TestCase):
@@ -22,6 +32,115 @@ class TestQtpUftRunResults(unittest.TestCase):
 
     def test_parse(self):
         res = uftrunreport.parse(uftfile)
+        self.assertEqual([t['name'] for t in res],
+                         ['first test', 'second test'])
+        self.assertEqual(res[1]['subject'], 'main/subB')
+
+    def test_iter_parse(self):
+        res = uftrunreport.iter_parse(uftfile)
+        self.assertEqual(next(res)['name'], 'first test')
+        self.assertEqual(next(res)['name'], 'second test')
+        self.assertRaises(StopIteration, lambda: next(res))
+
+    def test_parse_xlsx(self):
+        tempdir = tempfile.mkdtemp()
+        try:
+            with open(uftfile, 'rb') as filed:
+                xml = filed.read()
+            results = os.path.join(tempdir, 'Results.xml')
+            with open(results, 'wb') as filed:
+                filed.write(xml.replace(b'Default.xls', b'Default.xlsx'))
+            write_xlsx(os.path.join(tempdir, 'Default.xlsx'), {
+                'Action1': [['unused']],
+                'Global': [
+                    ['unused', 'test', 'subject', 'description', 'suite'],
+                    ['x', 'first test', 'main/subA', 'description one',
+                     'suiteA'],
+                    ['y', 'second test', 'main/subB', 'description two',
+                     'suiteB']
+                ]
+            })
+            self.assertEqual(uftrunreport.parse(results),
+                             uftrunreport.parse(uftfile))
+        finally:
+            shutil.rmtree(tempdir)
+
+    def test_iter_parse_missing_iteration(self):
+        tempdir = tempfile.mkdtemp()
+        try:
+            with open(uftfile, 'rb') as filed:
+                xml = filed.read()
+            results = os.path.join(tempdir, 'Results.xml')
+            with open(results, 'wb') as filed:
+                filed.write(xml.replace(b'Default.xls', b'Default.xlsx'))
+            write_xlsx(os.path.join(tempdir, 'Default.xlsx'), {
+                'Global': [
+                    ['test', 'subject', 'description', 'suite'],
+                    ['first test', 'main/subA', 'one', 'suiteA'],
+                    ['second test', 'main/subB', 'two', 'suiteB'],
+                    ['third test', 'main/subC', 'three', 'suiteC']
+                ]
+            })
+            res = uftrunreport.iter_parse(results)
+            # fails before the first test is yielded
+            self.assertRaises(ParserError, lambda: next(res))
+        finally:
+            shutil.rmtree(tempdir)
+
+    def test_invalid_iter_id(self):
+        tempdir = tempfile.mkdtemp()
+        try:
+            with open(uftfile, 'rb') as filed:
+                xml = filed.read()
+            shutil.copy(os.path.join(os.path.dirname(uftfile), 'Default.xls'),
+                        tempdir)
+            results = os.path.join(tempdir, 'Results.xml')
+            for bad in (b'iterID="x"', b''):
+                with open(results, 'wb') as filed:
+                    filed.write(xml.replace(b'iterID="1"', bad, 1))
+                self.assertRaises(ParserError,
+                                  lambda: uftrunreport.parse(results))
+                self.assertRaises(ParserError, lambda: next(
+                    uftrunreport.iter_parse(results)))
+        finally:
+            shutil.rmtree(tempdir)
 
     def test_parse_neg(self):
         self.assertRaises(ParserError, lambda: uftrunreport.parse(rffile))
+
+
+class TestSeleniumTestResults(unittest.TestCase):
+
+    def test_parse(self):
+        res = seleniumtestresults.parse(selfile)
+        self.assertEqual([t['status'] for t in res], ['Passed', 'Failed'])
+        self.assertEqual(res[1]['suite'], 'Sample Selenium Suite')
+        self.assertEqual(len(res[1]['steps']), 3)
+
+    def test_iter_parse(self):
+        res = seleniumtestresults.iter_parse(selfile)
+        self.assertEqual(next(res)['name'], 'Login')
+
+    def test_parse_neg(self):
+        self.assertRaises(ParserError,
+                          lambda: seleniumtestresults.parse(rffile))
+
+
+class TestJUnit(unittest.TestCase):
+
+    def test_parse(self):
+        res = junit.parse(junitfile)
+        self.assertEqual([(t['name'], t['status']) for t in res],
+                         [('test_login', 'Passed'), ('test_logout', 'Failed'),
+                          ('test_search', 'No Run')])
+        self.assertEqual(res[1]['subject'], 'tests/test_login')
+        self.assertEqual(res[1]['suite'], 'pytest')
+        self.assertEqual(res[1]['duration'], 1)
+        self.assertEqual(res[1]['exec_date'], '2017-01-12')
+        self.assertEqual(res[1]['steps'][0]['name'], 'AssertionError')
+        self.assertEqual(res[0]['steps'][0]['description'],
+                         'logged in as tester')
+
+    def test_parse_neg(self):
+        self.assertRaises(ParserError, lambda: junit.parse(rffile))
+        self.assertRaises(ParserError, lambda: junit.parse(uftfile))
@@ -0,0 +1,57 @@
+import copy
+import unittest
+from qcri.application import importer
+from qcri.application import planner
+from benchmarks import generators
+from benchmarks.fakeqc import FakeConnection
+
+
+class TestPlanner(unittest.TestCase):
+
+    def test_new_destination(self):
+        qcc = FakeConnection()
+        results = generators.make_dated_results(3)
+        plan = planner.make_plan(qcc, 'plan\\new', results['tests'])
+        counts = plan['counts']
+        # Root\plan, Root\plan\new, Root\plan\new\subject and the same
+        # three under Subject, with Subject\...\subject\suite
+        self.assertEqual(counts['folders'], {'new': 7, 'existing': 0})
+        self.assertEqual(counts['tests'], {'new': 3, 'existing': 0})
+        self.assertEqual(counts['test_sets'], {'new': 1, 'existing': 0})
+        self.assertEqual(counts['instances'], {'new': 3, 'existing': 0})
+        self.assertEqual(counts['runs']['new'], 3)
+        self.assertEqual(counts['steps']['new'], 6)
+        self.assertIn('+ test set  Root\\plan\\new\\subject: suite',
+                      planner.format_plan(plan))
+
+    def test_plan_drives_import(self):
+        qcc = FakeConnection()
+        results = generators.make_dated_results(3)
+        importer.import_results(
+            qcc, 'plan', copy.deepcopy(results), upsert='skip')
+        results['tests'][0]['status'] = 'Failed'
+        results['tests'].append(dict(results['tests'][1], name='test new'))
+
+        plan = planner.make_plan(qcc, 'plan', results['tests'], 'skip')
+        counts = plan['counts']
+        self.assertEqual(counts['folders'], {'new': 0, 'existing': 2})
+        self.assertEqual(counts['tests'], {'new': 1, 'existing': 3})
+        self.assertEqual(counts['test_sets'], {'new': 0, 'existing': 1})
+        self.assertEqual(counts['instances'], {'new': 1, 'existing': 3})
+        self.assertEqual(counts['runs'],
+                         {'new': 2, 'updated': 0, 'skipped': 2})
+        self.assertIsNotNone(plan['seconds'])
+
+        calls = qcc.round_trips
+        report = importer.import_results(qcc, 'plan', results, plan=plan)
+        self.assertEqual(report['imported'], 2)
+        self.assertEqual(report['skipped'], 2)
+        # nothing the plan found was looked up again
+        self.assertEqual(qcc.round_trips - calls, plan['calls'])
+
+    def test_other_destination(self):
+        qcc = FakeConnection()
+        results = generators.make_dated_results(1)
+        plan = planner.make_plan(qcc, 'plan', results['tests'])
+        with self.assertRaises(ValueError):
+            importer.import_results(qcc, 'other', results, plan=plan)
@@ -0,0 +1,41 @@
+import unittest
+from qcri.application import qualitycenter
+from benchmarks.fakeqc import FakeConnection
+
+
+class TestGetQcFolder(unittest.TestCase):
+
+    def test_creates_missing_tail(self):
+        qcc = FakeConnection()
+        session = {}
+        path = 'Subject\\' + '\\'.join('f{}'.format(i) for i in range(16))
+        node = qualitycenter.get_qc_folder(qcc, path, session=session)
+        self.assertEqual(node.Path, path)
+        self.assertEqual(qcc.calls['AddNode'], 16)
+        # the full path, a bisection of 16 levels and a check before
+        # creating, instead of a lookup or two per level
+        self.assertLessEqual(qcc.calls['NodeByPath'], 8)
+
+        # a sibling of a folder in the cache bisects below it
+        lookups = qcc.calls['NodeByPath']
+        sibling = path.rsplit('\\', 1)[0] + '\\other'
+        node = qualitycenter.get_qc_folder(qcc, sibling, session=session)
+        self.assertEqual(node.Path, sibling)
+        self.assertEqual(qcc.calls['AddNode'], 17)
+        self.assertLessEqual(qcc.calls['NodeByPath'] - lookups, 2)
+
+        # found folders are served from the session
+        lookups = qcc.calls['NodeByPath']
+        self.assertIs(
+            qualitycenter.get_qc_folder(qcc, path, session=session),
+            qcc.nodes[path.lower()])
+        self.assertEqual(qcc.calls['NodeByPath'], lookups)
+
+    def test_partly_existing(self):
+        qcc = FakeConnection()
+        qualitycenter.get_qc_folder(qcc, 'Root\\a\\b\\c')
+        node = qualitycenter.get_qc_folder(qcc, 'Root\\a\\b\\c\\d\\e')
+        self.assertEqual(node.Path, 'Root\\a\\b\\c\\d\\e')
+        self.assertEqual(qcc.calls['AddNode'], 5)
+        self.assertIsNone(
+            qualitycenter.get_qc_folder(qcc, 'Root\\x\\y', create=False))
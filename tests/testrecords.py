@@ -0,0 +1,43 @@
+import pickle
+import unittest
+from qcri.application.records import StepResult, TestResult
+
+
+class TestRecords(unittest.TestCase):
+
+    def test_mapping_access(self):
+        step = StepResult(name='step', status='Passed', description='')
+        test = TestResult(name='test', subject='a/b', steps=[step])
+        self.assertEqual(test['name'], 'test')
+        self.assertEqual(test.get('bug', '-'), '-')
+        self.assertRaises(KeyError, lambda: test['suite'])
+        self.assertNotIn('suite', test)
+        test['bug'] = '12'
+        test['custom'] = 'value'
+        self.assertEqual(dict(test), {
+            'name': 'test',
+            'subject': 'a/b',
+            'steps': [step],
+            'bug': '12',
+            'custom': 'value'
+        })
+        self.assertEqual(step, {
+            'name': 'step', 'status': 'Passed', 'description': ''})
+
+    def test_status_interned(self):
+        one = StepResult(status=''.join(['Pass', 'ed']))
+        two = StepResult(status=''.join(['Pas', 'sed']))
+        self.assertIs(one['status'], two['status'])
+
+    def test_from_dict_and_pickle(self):
+        test = TestResult.from_dict({
+            'name': 'test', 'steps': [{'name': 'step', 'status': 'Failed'}]})
+        self.assertIsInstance(test['steps'][0], StepResult)
+        copy = pickle.loads(pickle.dumps(test, pickle.HIGHEST_PROTOCOL))
+        self.assertEqual(copy, test)
+
+    def test_slots(self):
+        # the memory saving, see benchmarks.micro records
+        step = StepResult(name='step', status='Passed')
+        self.assertFalse(hasattr(step, '__dict__'))
+        self.assertFalse(hasattr(TestResult(name='test'), '__dict__'))
@@ -0,0 +1,47 @@
+import os
+import sys
+import unittest
+from qcri.application import importer
+from qcri.application import registry
+
+
+SAMPLES = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'samples')
+rffile = os.path.join(SAMPLES, 'robotframework', 'output.xml')
+uftfile = os.path.join(SAMPLES, 'uftrunresults', 'Results.xml')
+selfile = os.path.join(SAMPLES, 'seleniumtestresults', 'results.html')
+junitfile = os.path.join(SAMPLES, 'junit', 'junit.xml')
+
+
+class TestRegistry(unittest.TestCase):
+
+    def _candidates(self, filename, disabled=()):
+        return [info.name for info in
+                registry.get_candidates(filename, disabled)
+                if info.module.startswith('qcri.parsers.')]
+
+    def test_candidates(self):
+        self.assertEqual(self._candidates(rffile), ['robotframework'])
+        self.assertEqual(self._candidates(uftfile), ['uftrunreport'])
+        self.assertEqual(self._candidates(selfile), ['seleniumtestresults'])
+        self.assertEqual(self._candidates(junitfile), ['junit'])
+        self.assertEqual(
+            self._candidates(rffile, disabled=['robotframework']), [])
+
+    def test_candidates_not_imported(self):
+        for name in ('robotframework', 'uftrunreport', 'seleniumtestresults'):
+            sys.modules.pop('qcri.parsers.' + name, None)
+        registry.get_candidates(rffile)
+        self.assertNotIn('qcri.parsers.uftrunreport', sys.modules)
+        self.assertNotIn('qcri.parsers.seleniumtestresults', sys.modules)
+
+    def test_get_parsers(self):
+        cfg = importer.load_config('no-such-qcri.cfg')
+        for filename, name in ((rffile, 'robotframework'),
+                               (uftfile, 'uftrunreport'),
+                               (selfile, 'seleniumtestresults'),
+                               (junitfile, 'junit')):
+            parsers = importer.get_parsers(filename, cfg)
+            self.assertEqual([p.__name__ for p in parsers],
+                             ['qcri.parsers.' + name])
+            self.assertTrue(importer.is_parser(parsers[0]))
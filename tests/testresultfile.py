@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+import types
+import unittest
+from qcri.application import resultfile
+
+
+def _results():
+    return {
+        'filename': 'c:/results/output.xml',
+        'attach_list': ['log.html'],
+        'tests': (t for t in [
+            {'name': 'first', 'subject': 'a/b', 'status': 'Passed',
+             'steps': [{'name': 'step', 'status': 'Passed'}]},
+            {'name': 'second', 'subject': 'a/c', 'status': 'Failed',
+             'steps': []}
+        ])
+    }
+
+
+class TestResultFile(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def _roundtrip(self, name):
+        filename = os.path.join(self.tempdir, name)
+        count = resultfile.dump_results(_results(), filename)
+        self.assertEqual(count, 2)
+        self.assertTrue(resultfile.is_result_file(filename))
+        results = resultfile.load_results(filename)
+        self.assertEqual(results['filename'], 'c:/results/output.xml')
+        self.assertEqual(results['attach_list'], ['log.html'])
+        self.assertIsInstance(results['tests'], types.GeneratorType)
+        tests = list(results['tests'])
+        self.assertEqual([t['name'] for t in tests], ['first', 'second'])
+        self.assertEqual(tests[0]['steps'][0]['name'], 'step')
+
+    def test_roundtrip(self):
+        self._roundtrip('results.jsonl')
+
+    def test_roundtrip_gzip(self):
+        self._roundtrip('results.jsonl.gz')
+
+    def test_dump_parse_error(self):
+        def tests():
+            yield {'name': 'first', 'steps': []}
+            raise ValueError('truncated')
+        results = _results()
+        results['tests'] = tests()
+        filename = os.path.join(self.tempdir, 'results.jsonl')
+        self.assertRaises(ValueError,
+                          lambda: resultfile.dump_results(results, filename))
+        self.assertFalse(os.path.exists(filename))
+
+    def test_is_result_file_neg(self):
+        filename = os.path.join(self.tempdir, 'other.jsonl')
+        with open(filename, 'w') as filed:
+            filed.write('[1, 2, 3]\n')
+        self.assertFalse(resultfile.is_result_file(filename))
+        self.assertRaises(ValueError,
+                          lambda: resultfile.load_results(filename))
@@ -0,0 +1,84 @@
+import unittest
+from qcri.application import importer
+from qcri.application import qualitycenter
+from benchmarks import generators
+from benchmarks.fakeqc import FakeConnection
+
+
+class TestRetry(unittest.TestCase):
+
+    def setUp(self):
+        self._backoff = qualitycenter.BACKOFF
+        qualitycenter.BACKOFF = 0
+
+    def tearDown(self):
+        qualitycenter.BACKOFF = self._backoff
+
+    def test_transient_error_is_retried(self):
+        qcc = FakeConnection()
+        # the second test's run and one of the steps fail once
+        qcc.inject('Post', after=8)
+        qcc.inject('AddItem', after=12)
+        report = importer.import_results(
+            qcc, 'retry', generators.make_results())
+        self.assertEqual(report['imported'], 3)
+        self.assertEqual(report['failed'], [])
+        # nothing was left behind by the failed attempts
+        self.assertEqual(len(qcc.runs), 3)
+        self.assertEqual(
+            [len(run.StepFactory.items) for run in qcc.runs], [2, 2, 2])
+
+    def test_failed_test_is_isolated(self):
+        qcc = FakeConnection()
+        qcc.inject('Post', after=8, count=qualitycenter.RETRIES)
+        report = importer.import_results(
+            qcc, 'retry', generators.make_results())
+        self.assertEqual(report['tests'], 3)
+        self.assertEqual(report['imported'], 2)
+        self.assertEqual(len(report['failed']), 1)
+        self.assertIn('transient failure', report['failed'][0]['error'])
+        self.assertIn('Imported 2 of 3', importer.format_report(report))
+
+    def test_session_expiry_reconnects(self):
+        qcc = FakeConnection()
+        qualitycenter._LOGINS[id(qcc)] = qualitycenter._Login(
+            'url', 'd', 'p', 'u', 'pw')
+        try:
+            qcc.inject('NewList', 'Session timed out', after=4)
+            report = importer.import_results(
+                qcc, 'retry', generators.make_results())
+        finally:
+            qualitycenter.disconnect(qcc)
+        self.assertEqual(report['imported'], 3)
+        self.assertEqual(report['reconnects'], 1)
+        self.assertEqual(qcc.calls['Login'], 1)
+
+    def test_session_errors(self):
+        is_session_error = qualitycenter.is_session_error
+        com_error = qualitycenter.com_error
+        self.assertTrue(is_session_error(com_error('Session timed out')))
+        self.assertTrue(is_session_error(com_error(
+            -2147352567, 'Exception occurred.',
+            (0, 'TDApiOle80.TDConnection.1', 'Failed', None, 0,
+             -2147417848), None)))
+        self.assertFalse(is_session_error(com_error(
+            'Failed to post the test set session field')))
+        self.assertFalse(is_session_error(com_error('Invalid login name')))
+
+    def test_session_expiry_while_posting_steps(self):
+        for after in range(9, 13):
+            qcc = FakeConnection()
+            qualitycenter._LOGINS[id(qcc)] = qualitycenter._Login(
+                'url', 'd', 'p', 'u', 'pw')
+            try:
+                # the run is posted, then its steps
+                qcc.inject('Post', 'Session timed out', after=after)
+                report = importer.import_results(
+                    qcc, 'retry', generators.make_results(1))
+            finally:
+                qualitycenter.disconnect(qcc)
+            self.assertEqual(report['imported'], 1)
+            self.assertEqual(report['reconnects'], 1)
+            # the incomplete run was removed, not left beside the new one
+            self.assertEqual(
+                [len(run.StepFactory.items) for run in qcc.runs], [2])
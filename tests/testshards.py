@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+import unittest
+from qcri.application import importer
+from qcri.application.records import TestResult
+from qcri.parsers import robotframework
+from benchmarks import generators
+
+
+def _test(name, status, suite='suite'):
+    return TestResult(name=name, status=status, subject='top', suite=suite,
+                      description=name)
+
+
+class TestMergeShards(unittest.TestCase):
+
+    def test_last_wins(self):
+        tests = importer.merge_shards([
+            [_test('a', 'Failed'), _test('b', 'Passed')],
+            [_test('c', 'Passed'), _test('a', 'Passed')]])
+        self.assertEqual([(t['name'], t['status']) for t in tests],
+                         [('a', 'Passed'), ('b', 'Passed'), ('c', 'Passed')])
+
+    def test_merge(self):
+        tests = importer.merge_shards([
+            [_test('a', 'Failed')],
+            [_test('a', 'Passed'), _test('a', 'Passed', suite='other')]],
+            merge='merge')
+        self.assertEqual(len(tests), 2)
+        self.assertEqual(
+            tests[0]['description'],
+            'a\n\nRe-executed test has been merged.\n'
+            'New status: Passed\nOld status: Failed')
+        self.assertEqual(tests[1]['description'], 'a')
+
+
+class TestParseShards(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def _write(self, name, tests):
+        folder = os.path.join(self.tempdir, name)
+        os.mkdir(folder)
+        filename = os.path.join(self.tempdir, name + '.xml')
+        os.rename(generators.write_robot(folder, tests, 2), filename)
+        return filename
+
+    def test_parse_shards(self):
+        shards = [self._write('output1', 4), self._write('output2', 6)]
+        cfg = importer.load_config('no such file')
+        results = importer.parse_shards(robotframework, shards, cfg,
+                                        processes=2)
+        self.assertEqual(len(results['tests']), 6)
+        self.assertEqual(results['filename'], shards[0])
+        self.assertIn('output2.xml', results['attach_list'])
+        self.assertRaises(ValueError, importer.parse_shards, robotframework,
+                          shards, cfg, merge='first')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+import unittest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules that only the GUI, a QC connection or a chosen parser need
+HEAVY_MODULES = ('tkinter', 'win32com', 'pythoncom', 'pywintypes', 'xlrd',
+                 'multiprocessing', 'concurrent',
+                 'qcri.application.gui', 'qcri.application.qualitycenter',
+                 'qcri.parsers.robotframework', 'qcri.parsers.uftrunreport',
+                 'qcri.parsers.seleniumtestresults', 'qcri.parsers.junit')
+
+
+def _import_times(statement):
+    """
+    Returns {module: cumulative microseconds} from python -X importtime.
+    """
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    proc = subprocess.Popen(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+    out, err = proc.communicate()
+    if proc.returncode:
+        raise AssertionError(err.decode())
+    times = {}
+    for line in err.decode().splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        times[module.strip()] = int(cumulative)
+    return times, out.decode()
+
+
+@unittest.skipIf(sys.version_info < (3, 7), '-X importtime needs 3.7')
+class TestStartup(unittest.TestCase):
+
+    def _assert_light(self, statement, module):
+        times, out = _import_times(statement)
+        heavy = [m for m in times if m.split('.')[0] in HEAVY_MODULES or
+                 m in HEAVY_MODULES]
+        self.assertEqual(heavy, [])
+        self.assertIn(module, times)
+        return out
+
+    def test_import_qcri(self):
+        out = self._assert_light(
+            'import logging, qcri; print(logging.getLogger().handlers)',
+            'qcri')
+        # importing the package must not configure logging
+        self.assertEqual(out.strip(), '[]')
+
+    def test_import_main(self):
+        self._assert_light('import qcri.main', 'qcri.main')
@@ -0,0 +1,61 @@
+import configparser
+import os
+import unittest
+from qcri.application import importer
+from qcri.application import steppolicy
+from qcri.application.records import StepResult
+from qcri.application.steppolicy import StepPolicy
+from qcri.parsers import robotframework
+
+
+rffile = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'samples', 'robotframework', 'output.xml')
+
+
+def _steps(*statuses):
+    return [StepResult(name='step {}'.format(i), status=status,
+                       description='x' * 20)
+            for i, status in enumerate(statuses)]
+
+
+class TestStepPolicy(unittest.TestCase):
+
+    def test_failed(self):
+        policy = StepPolicy('failed')
+        steps = policy.apply(_steps('Passed', 'Failed', 'Passed'))
+        self.assertEqual([s['name'] for s in steps], ['step 1', 'Summary'])
+        self.assertEqual(steps[1]['description'],
+                         '2 of 3 steps passed and are not listed')
+        self.assertEqual(policy.apply(steps), steps)
+
+    def test_collapse(self):
+        policy = StepPolicy('collapse')
+        steps = policy.apply(_steps('Passed', 'Passed', 'Failed', 'Passed'))
+        self.assertEqual([s['name'] for s in steps],
+                         ['2 passed steps', 'step 2', 'step 3'])
+        self.assertEqual(steps[0]['description'], 'step 0\nstep 1')
+        self.assertEqual(policy.apply(steps), steps)
+
+    def test_max_length(self):
+        steps = StepPolicy(max_length=10).apply(_steps('Passed'))
+        self.assertEqual(steps[0]['description'], 'xxxxxxx...')
+
+    def test_from_config(self):
+        cfg = configparser.ConfigParser()
+        cfg.read_string(importer.DEFAULT_CFG)
+        self.assertIsNone(steppolicy.from_config(cfg))
+        cfg.set('steps', 'policy', 'sometimes')
+        self.assertRaises(ValueError, steppolicy.from_config, cfg)
+
+    def test_parse_results(self):
+        cfg = importer.load_config('no such file')
+        cfg.set('steps', 'policy', 'failed')
+        results = importer.parse_results(robotframework, rffile, cfg)
+        for test in results['tests']:
+            statuses = [step['status'] for step in test['steps']]
+            self.assertNotIn('Passed', statuses)
+
+
+if __name__ == '__main__':
+    unittest.main()
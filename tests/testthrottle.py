@@ -0,0 +1,71 @@
+import time
+import unittest
+from qcri.application import importer
+from qcri.application import qualitycenter
+from qcri.application.throttle import AdaptiveLimiter
+from benchmarks import generators
+from benchmarks.fakeqc import FakeConnection
+
+
+class TestAdaptiveLimiter(unittest.TestCase):
+
+    def test_aimd(self):
+        limiter = AdaptiveLimiter(max_concurrency=4)
+        for _ in range(20):
+            limiter.release(limiter.acquire())
+        self.assertEqual(limiter.limit, 4)
+        limiter.release(limiter.acquire(), error=True)
+        self.assertEqual(limiter.limit, 2)
+        # concurrent failures of the same window halve once
+        limiter.release(limiter.acquire(), error=True)
+        self.assertEqual(limiter.limit, 2)
+
+    def test_slow_operation_is_congestion(self):
+        limiter = AdaptiveLimiter(max_concurrency=4)
+        for _ in range(20):
+            limiter.release(limiter.acquire())
+        limiter.release(time.time() - 1)
+        self.assertEqual(limiter.limit, 2)
+
+    def test_baseline_per_operation(self):
+        limiter = AdaptiveLimiter(max_concurrency=4)
+        for _ in range(20):
+            limiter.release(limiter.acquire(), key='lookup')
+        # a slower kind of operation is not congestion
+        for _ in range(5):
+            limiter.release(time.time() - 1, key='create')
+        self.assertEqual(limiter.limit, 4)
+        limiter.release(time.time() - 1, key='lookup')
+        self.assertEqual(limiter.limit, 2)
+
+    def test_max_rate(self):
+        limiter = AdaptiveLimiter(max_rate=100)
+        start = time.time()
+        for _ in range(11):
+            limiter.release(limiter.acquire())
+        self.assertGreaterEqual(time.time() - start, 0.09)
+
+
+class TestParallelImport(unittest.TestCase):
+
+    def setUp(self):
+        self._clone = qualitycenter.clone
+        # the fake is shared by the workers, like sessions of one server
+        qualitycenter.clone = lambda qcc: qcc
+
+    def tearDown(self):
+        qualitycenter.clone = self._clone
+
+    def test_connections(self):
+        qcc = FakeConnection(latency=0.0005)
+        report = importer.import_results(
+            qcc, 'parallel', generators.make_results(count=12), connections=3)
+        self.assertEqual(report['imported'], 12)
+        self.assertEqual(len(qcc.runs), 12)
+        # no test, test set or folder was created twice
+        folder = qcc.nodes['subject\\parallel\\subject\\suite']
+        self.assertEqual(len(folder.TestFactory.items), 12)
+        lab = qcc.nodes['root\\parallel\\subject']
+        self.assertEqual(len(lab.TestSetFactory.items), 1)
+        self.assertEqual(
+            len(lab.TestSetFactory.items[0].TsTestFactory.items), 12)
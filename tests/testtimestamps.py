@@ -0,0 +1,47 @@
+import unittest
+from datetime import datetime
+from qcri.application import timestamps
+from benchmarks import micro
+
+
+ROBOT_FORMAT = '%Y%m%d %H:%M:%S.%f'
+UFT_FORMAT = '%m/%d/%Y - %H:%M:%S'
+
+
+class TestTimestamps(unittest.TestCase):
+
+    def test_decode_robot(self):
+        for stamp in ['20161205 14:32:01.123', '20161231 23:59:59.999',
+                      '20160229 00:00:00.000', '20161205 14:32:01']:
+            fmt = ROBOT_FORMAT if '.' in stamp else ROBOT_FORMAT[:-3]
+            expected = datetime.strptime(stamp, fmt)
+            exec_date, exec_time, micros = timestamps.decode_robot(stamp)
+            self.assertEqual(exec_date, expected.strftime('%Y-%m-%d'))
+            self.assertEqual(exec_time, expected.strftime('%H:%M:%S'))
+            self.assertEqual(
+                micros - timestamps.decode_robot('20161205 14:32:01.000')[2],
+                int((expected - datetime(2016, 12, 5, 14, 32, 1))
+                    .total_seconds() * 1000000))
+
+    def test_decode_robot_series(self):
+        # the stamps of a run, repeating within a second
+        for stamp in micro.robot_stamps(2000):
+            expected = datetime.strptime(stamp, ROBOT_FORMAT)
+            self.assertEqual(timestamps.decode_robot(stamp)[:2], (
+                expected.strftime('%Y-%m-%d'), expected.strftime('%H:%M:%S')))
+
+    def test_decode_robot_neg(self):
+        for stamp in ['N/A', '20161205-14:32:01.123', '20161305 14:32:01.1',
+                      '20161205 14:32:01.12x']:
+            self.assertRaises(ValueError,
+                              lambda: timestamps.decode_robot(stamp))
+
+    def test_decode_uft(self):
+        for stamp in ['12/5/2016 - 11:35:27', '01/05/2016 - 00:05:07',
+                      '7/14/2016 - 12:00:00', '7/14/2016 - 23:59:59']:
+            expected = datetime.strptime(stamp, UFT_FORMAT)
+            exec_date, exec_time, _ = timestamps.decode_uft(stamp)
+            self.assertEqual(exec_date, expected.strftime('%Y-%m-%d'))
+            self.assertEqual(exec_time, expected.strftime('%I:%M:%S %p'))
+        self.assertRaises(ValueError,
+                          lambda: timestamps.decode_uft('12/5/2016 11:35'))
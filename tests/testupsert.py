@@ -0,0 +1,76 @@
+import copy
+import unittest
+from qcri.application import importer
+from qcri.application import planner
+from qcri.application import qualitycenter
+from benchmarks import generators
+from benchmarks.fakeqc import FakeConnection
+
+
+class TestUpsert(unittest.TestCase):
+
+    def _import(self, qcc, results, upsert):
+        return importer.import_results(
+            qcc, 'upsert', copy.deepcopy(results), upsert=upsert)
+
+    def test_off(self):
+        qcc = FakeConnection()
+        self._import(qcc, generators.make_dated_results(), 'off')
+        self._import(qcc, generators.make_dated_results(), 'off')
+        self.assertEqual(len(qcc.runs), 6)
+
+    def test_skip(self):
+        qcc = FakeConnection()
+        results = generators.make_dated_results()
+        self._import(qcc, results, 'skip')
+        calls = qcc.calls['NewList']
+        report = self._import(qcc, results, 'skip')
+        self.assertEqual(report['skipped'], 3)
+        self.assertEqual(report['imported'], 0)
+        self.assertEqual(len(qcc.runs), 3)
+        # a test and an instance lookup per test; the test set was looked
+        # up and its runs listed once, not once per test
+        self.assertEqual(qcc.calls['NewList'] - calls, 3 * 2 + 1 + 1)
+
+        results['tests'][0]['status'] = 'Failed'
+        report = self._import(qcc, results, 'skip')
+        self.assertEqual(report['imported'], 1)
+        self.assertEqual(len(qcc.runs), 4)
+
+    def test_defaults(self):
+        qcc = FakeConnection()
+        results = generators.make_dated_results()
+        for test in results['tests']:
+            del test['status']
+        self._import(qcc, results, 'skip')
+        run = qcc.runs[0]
+        self.assertEqual(run.Status, qualitycenter.DEFAULT_STATUS)
+        self.assertTrue(run.Name.endswith('[{}]'.format(
+            qualitycenter.test_fingerprint(results['tests'][0]))))
+        report = self._import(qcc, results, 'skip')
+        self.assertEqual(report['skipped'], 3)
+
+    def test_undated(self):
+        qcc = FakeConnection()
+        results = generators.make_results()
+        for upsert in ('skip', 'update'):
+            report = self._import(qcc, results, upsert)
+            self.assertEqual(report['imported'], 3)
+            plan = planner.make_plan(qcc, 'upsert', results['tests'], upsert)
+            self.assertEqual(plan['counts']['runs']['new'], 3)
+        # every execution is kept
+        self.assertEqual(len(qcc.runs), 6)
+
+    def test_update(self):
+        qcc = FakeConnection()
+        results = generators.make_dated_results()
+        self._import(qcc, results, 'update')
+        results['tests'][1]['status'] = 'Failed'
+        results['tests'][1]['steps'] = results['tests'][1]['steps'][:1]
+        report = self._import(qcc, results, 'update')
+        self.assertEqual(report['updated'], 1)
+        self.assertEqual(report['skipped'], 2)
+        self.assertEqual(len(qcc.runs), 3)
+        run = [r for r in qcc.runs if r.Status == 'Failed']
+        self.assertEqual(len(run), 1)
+        self.assertEqual(len(run[0].StepFactory.items), 1)